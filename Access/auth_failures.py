@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""Aggregated auditing and per-IP throttling of failed authentication."""
+
+import datetime as dt
+import threading
+import time
+from collections import OrderedDict
+
+from loguru import logger
+
+from Engines.background import PeriodicWorker, on_shutdown
+
+
+class AuthFailures:
+    """Summarize failures per ``(ip, reason, minute)`` and throttle by IP.
+
+    ``record`` only touches memory; ``flush`` writes one ``auth.fail`` audit
+    event per closed minute bucket with the number of failures it saw. An IP
+    with ``throttle_limit`` failures inside ``window_seconds`` is reported
+    as throttled until the window rolls over; ``admit`` refuses it before
+    credentials are checked unless they are cached as valid. Behind
+    a reverse proxy the IP must come from a trusted ``X-Forwarded-For``
+    (``TRUSTED_PROXY_COUNT``), or every client shares the proxy's address.
+    """
+
+    FLUSH_SECONDS = 60
+    WINDOW_SECONDS = 60
+    THROTTLE_LIMIT = 30
+    MAX_TRACKED_IPS = 10000
+    MAX_SAMPLE_PATHS = 5
+
+    def __init__(
+        self,
+        write_event,
+        flush_interval_seconds=FLUSH_SECONDS,
+        window_seconds=WINDOW_SECONDS,
+        throttle_limit=THROTTLE_LIMIT,
+        clock=None,
+    ):
+        self._write_event = write_event
+        self._window = max(1.0, float(window_seconds))
+        self._limit = max(0, int(throttle_limit))
+        self._clock = clock or time.time
+        self._buckets = {}
+        self._ips = OrderedDict()
+        self._lock = threading.Lock()
+        self._worker = PeriodicWorker(
+            "ssm-auth-failures", flush_interval_seconds, self.flush_closed
+        )
+        self._write_through = float(flush_interval_seconds) <= 0
+        # The worker only flushes closed minutes; write the rest on exit,
+        # before the audit writer stops.
+        on_shutdown(self.flush)
+        self.recorded = 0
+        self.throttled = 0
+        self.events_written = 0
+
+    def is_throttled(self, ip):
+        if self._limit == 0:
+            return False
+        with self._lock:
+            entry = self._ips.get(ip)
+            if entry is None:
+                return False
+            window_start, count = entry
+            if self._clock() - window_start >= self._window:
+                del self._ips[ip]
+                return False
+            return count >= self._limit
+
+    def admit(self, ip, is_cached, **details):
+        """Return whether to check credentials from ``ip`` at all.
+
+        Called before any token lookup or password hash. A throttled IP
+        is refused unless ``is_cached()`` vouches for its credentials from
+        memory, so repeat offenders cost no database or hashing work while
+        recently verified clients behind the same address keep working.
+        """
+        if not self.is_throttled(ip) or is_cached():
+            return True
+        self.record(ip, "throttled", **details)
+        return False
+
+    def _count_ip(self, ip, now):
+        entry = self._ips.get(ip)
+        if entry is None or now - entry[0] >= self._window:
+            entry = (now, 0)
+        self._ips[ip] = (entry[0], entry[1] + 1)
+        self._ips.move_to_end(ip)
+        while len(self._ips) > self.MAX_TRACKED_IPS:
+            self._ips.popitem(last=False)
+
+    def record(self, ip, reason, method=None, path=None, user_agent=None):
+        now = self._clock()
+        minute = int(now // 60) * 60
+        key = (ip, reason, minute)
+        with self._lock:
+            if reason == "throttled":
+                self.throttled += 1
+            else:
+                self._count_ip(ip, now)
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = {
+                    "count": 0,
+                    "methods": set(),
+                    "paths": set(),
+                    "user_agent": user_agent,
+                }
+            bucket["count"] += 1
+            if method:
+                bucket["methods"].add(method)
+            if path and len(bucket["paths"]) < self.MAX_SAMPLE_PATHS:
+                bucket["paths"].add(path)
+            self.recorded += 1
+        if self._write_through:
+            self.flush()
+        else:
+            self._worker.start()
+
+    @staticmethod
+    def _to_event(key, bucket):
+        ip, reason, minute = key
+        window_start = dt.datetime.fromtimestamp(minute, dt.timezone.utc)
+        return {
+            "actor_type": "user" if reason.startswith("userpass") else "token",
+            "actor_id": None,
+            "token_id": None,
+            "action": "auth.fail",
+            "status_code": 429 if reason == "throttled" else 401,
+            "reason": reason,
+            "ip": ip,
+            "user_agent": bucket["user_agent"],
+            "method": ",".join(sorted(bucket["methods"])) or None,
+            "path": ",".join(sorted(bucket["paths"])) or None,
+            "count": bucket["count"],
+            "window_start": window_start,
+            "window_end": window_start + dt.timedelta(seconds=60),
+        }
+
+    def flush(self, closed_only=False):
+        """Write one audit event per bucket and return how many were written.
+
+        With ``closed_only`` the bucket for the current minute is kept open.
+        """
+        current_minute = int(self._clock() // 60) * 60
+        with self._lock:
+            keys = [
+                key
+                for key in self._buckets
+                if not closed_only or key[2] < current_minute
+            ]
+            ready = [(key, self._buckets.pop(key)) for key in keys]
+        written = 0
+        for key, bucket in ready:
+            try:
+                self._write_event(self._to_event(key, bucket))
+                written += 1
+            except Exception:
+                logger.exception("Failed to write auth failure summary")
+        self.events_written += written
+        return written
+
+    def flush_closed(self):
+        return self.flush(closed_only=True)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "openBuckets": len(self._buckets),
+                "trackedIps": len(self._ips),
+                "recorded": self.recorded,
+                "throttled": self.throttled,
+                "eventsWritten": self.events_written,
+                "throttleLimit": self._limit,
+                "windowSeconds": self._window,
+            }
@@ -23,6 +23,9 @@ def _audit_request(event):
         {
             "method": request.method,
             "path": request.path,
+            "route": (
+                request.url_rule.rule if request.url_rule else request.path
+            ),
             "ip": request.remote_addr,
             "user_agent": request.user_agent.string,
             "status_code": event.get("status_code", 200),
@@ -35,24 +38,39 @@ def _audit_request(event):
     conn.audit.write_event(event)
 
 
+def _failure_details():
+    return {
+        "method": request.method,
+        "path": request.path,
+        "user_agent": request.user_agent.string,
+    }
+
+
+def _admit(is_cached):
+    # Runs before any token lookup or password hash; cached credentials
+    # still get through, so a valid client is not turned away.
+    if not conn.auth_failures.admit(
+        request.remote_addr, is_cached, **_failure_details()
+    ):
+        api.abort(429, "Too many failed authentication attempts")
+
+
+def _reject(reason, message):
+    conn.auth_failures.record(
+        request.remote_addr, reason, **_failure_details()
+    )
+    api.abort(401, message)
+
+
 def require_token():
     token_to_check = _extract_token()
     if not token_to_check:
         api.abort(401, "Missing API token")
+    _admit(lambda: conn.tokens.is_cached(token_to_check))
     actor, err = conn.tokens.authenticate(token_to_check)
     if err:
-        _audit_request(
-            {
-                "actor_type": "token",
-                "actor_id": None,
-                "token_id": None,
-                "action": "auth.fail",
-                "status_code": 401,
-                "reason": err,
-            }
-        )
-        api.abort(
-            401, f"Not Authorized to access the requested resource ({err})"
+        _reject(
+            err, f"Not Authorized to access the requested resource ({err})"
         )
     g.actor = actor
     return actor
@@ -84,6 +102,8 @@ def audit_event(action, **kwargs):
 
 @userpass.verify_password
 def verify_userpass(username, password):
+    if username:
+        _admit(lambda: conn.userpass.is_cached(username, password))
     if conn.userpass.is_authorized(username, password):
         g.actor = {
             "type": "userpass",
@@ -91,7 +111,10 @@ def verify_userpass(username, password):
             "id": username,
         }
         return username
-    api.abort(401, "Not Authorized to access the requested resource")
+    message = "Not Authorized to access the requested resource"
+    if username:
+        _reject("userpass_invalid", message)
+    api.abort(401, message)
     return None
 
 
@@ -1,42 +1,93 @@
 #!/usr/bin/env python3
 """Scope based authorization checks."""
 
+_SCOPE_INDEX_KEY = "_scope_index"
 
-def _has_scope(scopes, action, project_id=None, config_id=None):
+
+def _compile_scopes(scopes):
+    """Index scopes as ``action -> (global, project ids, config ids)``."""
+    index = {}
     for scope in scopes or []:
-        actions = scope.get("actions") or []
-        if action not in actions:
-            continue
-        scope_project = (
-            str(scope.get("project_id")) if scope.get("project_id") else None
-        )
-        scope_config = (
-            str(scope.get("config_id")) if scope.get("config_id") else None
-        )
-        req_project = str(project_id) if project_id else None
-        req_config = str(config_id) if config_id else None
-        if scope_config:
-            if req_config and req_config == scope_config:
-                return True
-            continue
-        if scope_project:
-            if req_project and req_project == scope_project:
-                return True
-            continue
+        project_id = scope.get("project_id")
+        config_id = scope.get("config_id")
+        for action in scope.get("actions") or []:
+            entry = index.get(action)
+            if entry is None:
+                entry = index[action] = [False, set(), set()]
+            if config_id:
+                entry[2].add(str(config_id))
+            elif project_id:
+                entry[1].add(str(project_id))
+            else:
+                entry[0] = True
+    return index
+
+
+def _index_allows(index, action, project_id=None, config_id=None):
+    entry = index.get(action)
+    if entry is None:
+        return False
+    is_global, project_ids, config_ids = entry
+    if is_global:
+        return True
+    if config_id and str(config_id) in config_ids:
         return True
-    return False
+    return bool(project_id) and str(project_id) in project_ids
+
+
+def _has_scope(scopes, action, project_id=None, config_id=None):
+    return _index_allows(
+        _compile_scopes(scopes),
+        action,
+        project_id=project_id,
+        config_id=config_id,
+    )
+
+
+def _actor_scope_index(actor):
+    """Compile the actor's scopes once and memoize them on the actor.
+
+    The memo is keyed on the scope list objects, so replacing
+    ``scopes`` or ``token_scopes`` on the actor recompiles it.
+    """
+    scopes = actor.get("scopes")
+    token_scopes = actor.get("token_scopes")
+    memo = actor.get(_SCOPE_INDEX_KEY)
+    if memo is not None and memo[0] is scopes and memo[1] is token_scopes:
+        return memo[2], memo[3]
+    scope_index = _compile_scopes(scopes)
+    token_index = (
+        None if token_scopes is None else _compile_scopes(token_scopes)
+    )
+    actor[_SCOPE_INDEX_KEY] = (scopes, token_scopes, scope_index, token_index)
+    return scope_index, token_index
+
+
+def _allowed(scope_index, token_index, action, project_id, config_id):
+    if not _index_allows(scope_index, action, project_id, config_id):
+        return False
+    if token_index is None:
+        return True
+    return _index_allows(token_index, action, project_id, config_id)
 
 
 def authorize(actor, action, project_id=None, config_id=None):
     if not actor:
         return False
-    if not _has_scope(
-        actor.get("scopes"), action, project_id=project_id, config_id=config_id
-    ):
-        return False
-    token_scopes = actor.get("token_scopes")
-    if token_scopes is None:
-        return True
-    return _has_scope(
-        token_scopes, action, project_id=project_id, config_id=config_id
-    )
+    scope_index, token_index = _actor_scope_index(actor)
+    return _allowed(scope_index, token_index, action, project_id, config_id)
+
+
+def authorize_many(actor, action, targets):
+    """Authorize ``action`` against many ``(project_id, config_id)`` pairs.
+
+    Returns a list of booleans in the same order as ``targets``.
+    """
+    targets = list(targets)
+    if not actor:
+        return [False] * len(targets)
+    scope_index, token_index = _actor_scope_index(actor)
+    return [
+        _allowed(scope_index, token_index, action, project_id, config_id)
+        for project_id, config_id in targets
+    ]
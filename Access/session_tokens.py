@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""Signed session tokens and the revocation set that guards them.
+
+A signed session token looks like ``ssm1.<payload>.<signature>`` where the
+payload is base64url JSON holding the subject, expiry and token id (the
+``_id`` of the matching tokens document) and the signature is an
+HMAC-SHA256 over ``ssm1.<payload>``. Verification needs no database read;
+revocation is enforced through ``RevocationSet``.
+"""
+
+import base64
+import datetime as dt
+import hashlib
+import hmac
+import json
+import secrets
+import threading
+
+from loguru import logger
+
+from Engines.background import PeriodicWorker
+
+SIGNED_TOKEN_PREFIX = "ssm1."
+
+
+def _b64encode(raw):
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(text):
+    padding = "=" * (-len(text) % 4)
+    return base64.urlsafe_b64decode(text + padding)
+
+
+class SessionTokenSigner:
+    def __init__(self, signing_key=None):
+        if not signing_key:
+            logger.warning(
+                "SESSION_TOKEN_SIGNING_KEY is not set; signed session "
+                "tokens will not survive a restart"
+            )
+            signing_key = secrets.token_hex(32)
+        self._key = str(signing_key).encode()
+
+    @staticmethod
+    def is_signed(token):
+        return isinstance(token, str) and token.startswith(SIGNED_TOKEN_PREFIX)
+
+    def _signature(self, message):
+        digest = hmac.new(self._key, message.encode(), hashlib.sha256)
+        return _b64encode(digest.digest())
+
+    def sign(self, subject, token_id, expires_at):
+        payload = {
+            "sub": subject,
+            "jti": str(token_id),
+            "exp": int(expires_at.replace(tzinfo=dt.timezone.utc).timestamp()),
+        }
+        body = _b64encode(json.dumps(payload, separators=(",", ":")).encode())
+        message = f"{SIGNED_TOKEN_PREFIX}{body}"
+        return f"{message}.{self._signature(message)}"
+
+    def verify(self, token):
+        """Return ``(claims, error)`` for a signed token."""
+        try:
+            message, signature = token.rsplit(".", 1)
+            body = message[len(SIGNED_TOKEN_PREFIX) :]
+            if not hmac.compare_digest(signature, self._signature(message)):
+                return None, "invalid"
+            claims = json.loads(_b64decode(body))
+            expires_at = dt.datetime.utcfromtimestamp(int(claims["exp"]))
+            claims = {
+                "sub": str(claims["sub"]),
+                "jti": str(claims["jti"]),
+                "exp": expires_at,
+            }
+        except Exception:
+            return None, "invalid"
+        if expires_at <= dt.datetime.utcnow():
+            return None, "expired"
+        return claims, None
+
+
+class RevocationSet:
+    """In-memory set of revoked, unexpired session token ids.
+
+    Refreshes re-read revocations from ``skew_seconds`` before the newest
+    ``revoked_at`` seen so far, so a revocation committed late with an
+    older timestamp is still picked up; ids are deduplicated. The
+    watermark only moves to timestamps actually read, and the whole set
+    is reloaded every ``full_reload_seconds`` to catch anything older.
+    """
+
+    SKEW_SECONDS = 60
+    FULL_RELOAD_SECONDS = 600
+
+    def __init__(
+        self,
+        tokens_col,
+        refresh_interval_seconds=10,
+        skew_seconds=SKEW_SECONDS,
+        full_reload_seconds=FULL_RELOAD_SECONDS,
+    ):
+        self._tokens = tokens_col
+        self._revoked = {}
+        self._watermark = None
+        self._loaded_at = None
+        self._skew = dt.timedelta(seconds=max(0.0, float(skew_seconds)))
+        self._full_reload = dt.timedelta(
+            seconds=max(0.0, float(full_reload_seconds))
+        )
+        self._lock = threading.Lock()
+        self._worker = PeriodicWorker(
+            "ssm-session-revocations", refresh_interval_seconds, self.refresh
+        )
+        self.refreshes = 0
+        self.full_reloads = 0
+
+    def __contains__(self, token_id):
+        if self._loaded_at is None:
+            self.refresh()
+        self._worker.start()
+        return token_id in self._revoked
+
+    def _revoked_since(self, full):
+        if full or self._watermark is None:
+            return {"$ne": None}
+        return {"$gte": self._watermark - self._skew}
+
+    def refresh(self):
+        now = dt.datetime.utcnow()
+        full = (
+            self._loaded_at is None
+            or now - self._loaded_at >= self._full_reload
+        )
+        query = {
+            "purpose": "session",
+            "revoked_at": self._revoked_since(full),
+            "expires_at": {"$gt": now},
+        }
+        docs = list(
+            self._tokens.find(
+                query, {"_id": 1, "revoked_at": 1, "expires_at": 1}
+            )
+        )
+        read = [doc["revoked_at"] for doc in docs if doc.get("revoked_at")]
+        with self._lock:
+            revoked = {} if full else dict(self._revoked)
+            for doc in docs:
+                revoked[str(doc["_id"])] = doc.get("expires_at")
+            self._revoked = {
+                token_id: expires_at
+                for token_id, expires_at in revoked.items()
+                if expires_at is None or expires_at > now
+            }
+            if read and (
+                self._watermark is None or max(read) > self._watermark
+            ):
+                self._watermark = max(read)
+            if full:
+                self._loaded_at = now
+                self.full_reloads += 1
+            self.refreshes += 1
+        return len(docs)
+
+    def stats(self):
+        return {
+            "size": len(self._revoked),
+            "refreshes": self.refreshes,
+            "fullReloads": self.full_reloads,
+        }
@@ -5,27 +5,363 @@ import datetime as dt
 import hashlib
 import os
 import secrets
+import threading
 
 from bson import ObjectId
+from loguru import logger
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
 
 from Api.serialization import oid_to_str, sanitize_doc, to_iso
 from Access.scopes import global_scopes
+from Access.session_tokens import RevocationSet, SessionTokenSigner
+from Engines.background import PeriodicWorker
+from Engines.caching import TTLCache
+
+
+class _LastUsedBuffer:
+    """Coalesce ``last_used_at`` writes and flush them with one bulk write.
+
+    ``last_used_at`` is advisory, so at most one pending timestamp per token
+    is kept and written every ``flush_interval_seconds``. An interval of
+    zero keeps the historical write-through behaviour.
+    """
+
+    def __init__(self, tokens_col, flush_interval_seconds):
+        self._tokens = tokens_col
+        self._interval = max(0.0, float(flush_interval_seconds))
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._worker = PeriodicWorker(
+            "ssm-token-last-used", self._interval, self.flush, final_run=True
+        )
+        self.flushes = 0
+        self.written = 0
+
+    def record(self, token_id, used_at):
+        if self._interval <= 0:
+            self._tokens.update_one(
+                {"_id": token_id}, {"$set": {"last_used_at": used_at}}
+            )
+            return
+        with self._lock:
+            self._pending[token_id] = used_at
+        self._worker.start()
+
+    def _requeue(self, pending):
+        with self._lock:
+            for token_id, used_at in pending.items():
+                current = self._pending.get(token_id)
+                if current is None or current < used_at:
+                    self._pending[token_id] = used_at
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        try:
+            bulk_write = getattr(self._tokens, "bulk_write", None)
+            if callable(bulk_write):
+                bulk_write(
+                    [
+                        UpdateOne(
+                            {"_id": token_id},
+                            {"$max": {"last_used_at": used_at}},
+                        )
+                        for token_id, used_at in pending.items()
+                    ],
+                    ordered=False,
+                )
+            else:
+                for token_id, used_at in pending.items():
+                    self._tokens.update_one(
+                        {"_id": token_id},
+                        {"$set": {"last_used_at": used_at}},
+                    )
+        except Exception:
+            self._requeue(pending)
+            logger.exception("Failed to flush token last_used_at updates")
+            return 0
+        self.flushes += 1
+        self.written += len(pending)
+        return len(pending)
+
+    def stats(self):
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            "flushIntervalSeconds": self._interval,
+            "pending": pending,
+            "flushes": self.flushes,
+            "written": self.written,
+        }
+
+
+class _TokenRetention:
+    """Purge or archive tokens that are long past revocation or expiry.
+
+    A token is eligible once it has been revoked or expired for longer than
+    the grace period. ``mode`` is ``delete``, ``archive`` (move metadata,
+    without ``token_hash``, to the archive collection) or ``off``.
+    """
+
+    MODES = ("delete", "archive", "off")
+
+    def __init__(
+        self,
+        tokens_col,
+        archive_col=None,
+        grace_days=30,
+        mode="delete",
+        batch_size=500,
+        max_batches=20,
+        sweep_interval_seconds=3600,
+    ):
+        self._tokens = tokens_col
+        self._archive = archive_col
+        self._grace = dt.timedelta(days=max(0.0, float(grace_days)))
+        mode = str(mode or "").strip().lower()
+        if mode not in self.MODES:
+            logger.warning(f"Unknown token retention mode {mode!r}; using off")
+            mode = "off"
+        if mode == "archive" and archive_col is None:
+            mode = "off"
+        self._mode = mode
+        self._batch_size = max(1, int(batch_size))
+        self._max_batches = max(1, int(max_batches))
+        self._worker = PeriodicWorker(
+            "ssm-token-retention", sweep_interval_seconds, self.sweep
+        )
+        self.sweeps = 0
+        self.reclaimed = 0
+        self.archived = 0
+        self.last_sweep_at = None
+
+    def start(self):
+        if self._mode != "off":
+            self._worker.start()
+
+    def stop(self):
+        self._worker.stop(flush=False)
+
+    def _eligible_query(self, now):
+        cutoff = now - self._grace
+        return {
+            "$or": [
+                {"revoked_at": {"$ne": None, "$lt": cutoff}},
+                {"expires_at": {"$ne": None, "$lt": cutoff}},
+            ]
+        }
+
+    def _purge_batch(self, query):
+        projection = None if self._mode == "archive" else {"_id": 1}
+        docs = list(
+            self._tokens.find(query, projection).limit(self._batch_size)
+        )
+        if not docs:
+            return 0
+        if self._mode == "archive":
+            archived_at = dt.datetime.utcnow()
+            try:
+                self._archive.insert_many(
+                    [
+                        {
+                            **{
+                                k: v
+                                for k, v in doc.items()
+                                if k != "token_hash"
+                            },
+                            "archived_at": archived_at,
+                        }
+                        for doc in docs
+                    ],
+                    ordered=False,
+                )
+            except BulkWriteError as exc:
+                # Documents archived by an interrupted sweep are fine to
+                # delete; anything else must keep the originals in place.
+                errors = exc.details.get("writeErrors", [])
+                if any(err.get("code") != 11000 for err in errors):
+                    raise
+            self.archived += len(docs)
+        result = self._tokens.delete_many(
+            {"_id": {"$in": [doc["_id"] for doc in docs]}}
+        )
+        deleted = getattr(result, "deleted_count", len(docs))
+        self.reclaimed += deleted
+        return len(docs)
+
+    def sweep(self, now=None):
+        """Reclaim up to ``batch_size * max_batches`` tokens."""
+        if self._mode == "off":
+            return 0
+        query = self._eligible_query(now or dt.datetime.utcnow())
+        total = 0
+        for _ in range(self._max_batches):
+            count = self._purge_batch(query)
+            total += count
+            if count < self._batch_size:
+                break
+        self.sweeps += 1
+        self.last_sweep_at = dt.datetime.utcnow()
+        if total:
+            logger.info(f"Token retention reclaimed {total} tokens")
+        return total
+
+    def stats(self):
+        return {
+            "mode": self._mode,
+            "graceDays": self._grace.total_seconds() / 86400,
+            "sweeps": self.sweeps,
+            "reclaimed": self.reclaimed,
+            "archived": self.archived,
+            "lastSweepAt": to_iso(self.last_sweep_at),
+        }
 
 
 class Tokens:
     SESSION_TOKEN_TTL_SECONDS = 24 * 60 * 60
+    AUTH_CACHE_TTL_SECONDS = 30
+    AUTH_CACHE_MAX_ENTRIES = 4096
+    LAST_USED_FLUSH_SECONDS = 30
+    RETENTION_GRACE_DAYS = 30
+    RETENTION_MODE = "delete"
+    RETENTION_SWEEP_SECONDS = 3600
+    BULK_REVOKE_FIELDS = ("subject_user", "subject_service_name", "created_by")
+    SESSION_TOKEN_FORMAT = "opaque"
+    SESSION_REVOCATION_REFRESH_SECONDS = 10
 
-    def __init__(self, token_auth_col, personal_actor_resolver=None):
+    def __init__(
+        self,
+        token_auth_col,
+        personal_actor_resolver=None,
+        archive_col=None,
+    ):
         self._tokens = token_auth_col
         self._tokens.create_index("token_hash", unique=True)
         self._tokens.create_index("expires_at")
         self._tokens.create_index("revoked_at")
+        # Session rotation filters on type/subject_user/revoked_at and then
+        # on purpose. Bulk revocation filters on one subject field plus
+        # revoked_at without type, which the index above cannot serve since
+        # type is its leading key, so every field gets its own index.
+        self._tokens.create_index(
+            [
+                ("type", 1),
+                ("subject_user", 1),
+                ("revoked_at", 1),
+                ("purpose", 1),
+            ]
+        )
+        for field in self.BULK_REVOKE_FIELDS:
+            self._tokens.create_index([(field, 1), ("revoked_at", 1)])
         self._salt = os.getenv("TOKEN_SALT", "")
         self._personal_actor_resolver = personal_actor_resolver
+        # token_hash -> token document. Only live tokens are cached and
+        # every revocation path below evicts the affected entries.
+        self._auth_cache = TTLCache(
+            max_entries=os.getenv(
+                "TOKEN_CACHE_MAX_ENTRIES", self.AUTH_CACHE_MAX_ENTRIES
+            ),
+            ttl_seconds=os.getenv(
+                "TOKEN_CACHE_TTL_SECONDS", self.AUTH_CACHE_TTL_SECONDS
+            ),
+        )
+        self._last_used = _LastUsedBuffer(
+            self._tokens,
+            os.getenv(
+                "TOKEN_LAST_USED_FLUSH_SECONDS", self.LAST_USED_FLUSH_SECONDS
+            ),
+        )
+        # Signed session tokens verify without a database read. A signer
+        # exists whenever the format is "signed" or a key is configured, so
+        # switching back to opaque tokens keeps issued sessions valid.
+        self._session_format = (
+            os.getenv("SESSION_TOKEN_FORMAT", self.SESSION_TOKEN_FORMAT)
+            .strip()
+            .lower()
+        )
+        signing_key = os.getenv("SESSION_TOKEN_SIGNING_KEY")
+        self._signer = None
+        self._revocations = None
+        if self._session_format == "signed" or signing_key:
+            self._signer = SessionTokenSigner(signing_key)
+            self._revocations = RevocationSet(
+                self._tokens,
+                os.getenv(
+                    "SESSION_REVOCATION_REFRESH_SECONDS",
+                    self.SESSION_REVOCATION_REFRESH_SECONDS,
+                ),
+            )
+        self._retention = _TokenRetention(
+            self._tokens,
+            archive_col=archive_col,
+            grace_days=os.getenv(
+                "TOKEN_RETENTION_DAYS", self.RETENTION_GRACE_DAYS
+            ),
+            mode=os.getenv("TOKEN_RETENTION_MODE", self.RETENTION_MODE),
+            sweep_interval_seconds=os.getenv(
+                "TOKEN_RETENTION_SWEEP_SECONDS", self.RETENTION_SWEEP_SECONDS
+            ),
+        )
 
     def _hash_token(self, token):
         return hashlib.sha256(f"{self._salt}{token}".encode()).hexdigest()
 
+    @staticmethod
+    def _seconds_until(moment):
+        if moment is None:
+            return None
+        now = (
+            dt.datetime.now(dt.timezone.utc)
+            if moment.tzinfo is not None
+            else dt.datetime.utcnow()
+        )
+        return (moment - now).total_seconds()
+
+    def is_cached(self, token):
+        """Whether ``token`` checks out without a database read.
+
+        True for signed session tokens with a valid signature and for live
+        tokens already in the auth cache.
+        """
+        if self._signer is not None and self._signer.is_signed(token):
+            return self._signer.verify(token)[1] is None
+        return self._auth_cache.get(self._hash_token(token)) is not None
+
+    def cache_stats(self):
+        return self._auth_cache.stats()
+
+    def stats(self):
+        return {
+            "cache": self.cache_stats(),
+            "lastUsed": self._last_used.stats(),
+            "retention": self._retention.stats(),
+            "sessionTokens": {
+                "format": self._session_format,
+                "revocations": (
+                    self._revocations.stats()
+                    if self._revocations is not None
+                    else None
+                ),
+            },
+        }
+
+    def flush_last_used(self):
+        return self._last_used.flush()
+
+    def _refresh_revocations(self):
+        if self._revocations is not None:
+            self._revocations.refresh()
+
+    def start_retention_sweeper(self):
+        self._retention.start()
+
+    def purge_expired_tokens(self, now=None):
+        """Run one retention sweep and return how many tokens it reclaimed."""
+        return self._retention.sweep(now=now)
+
     def _bounded_session_ttl(self, max_ttl):
         try:
             ttl_seconds = int(max_ttl)
@@ -38,19 +374,33 @@ class Tokens:
     def _update_many(self, query, update):
         update_many = getattr(self._tokens, "update_many", None)
         if callable(update_many):
-            update_many(query, update)
-            return
+            result = update_many(query, update)
+            return getattr(result, "modified_count", 0)
 
         finder = getattr(self._tokens, "find", None)
         if not callable(finder):
-            return
-        for doc in finder(query):
+            return 0
+        updated = 0
+        for doc in list(finder(query)):
             token_id = doc.get("_id")
             if token_id is None:
                 continue
             self._tokens.update_one({"_id": token_id}, update)
+            updated += 1
+        return updated
+
+    @staticmethod
+    def _is_session_doc(doc):
+        return doc.get("purpose") == "session" or (
+            doc.get("scopes") == global_scopes()
+        )
 
     def _rotate_session_tokens(self, username, now):
+        self._auth_cache.pop_where(
+            lambda _hash, doc: doc.get("type") == "personal"
+            and doc.get("subject_user") == username
+            and self._is_session_doc(doc)
+        )
         self._update_many(
             {
                 "type": "personal",
@@ -63,12 +413,17 @@ class Tokens:
             },
             {"$set": {"revoked_at": now}},
         )
+        self._refresh_revocations()
 
     def generate(self, username, max_ttl=SESSION_TOKEN_TTL_SECONDS):
         now = dt.datetime.utcnow()
         self._rotate_session_tokens(username, now)
         ttl_seconds = self._bounded_session_ttl(max_ttl)
         expires_at = now + dt.timedelta(seconds=ttl_seconds)
+        token_id = plain = None
+        if self._session_format == "signed" and self._signer is not None:
+            token_id = ObjectId()
+            plain = self._signer.sign(username, token_id, expires_at)
         return self.create_token(
             token_type="personal",
             created_by=username,
@@ -76,6 +431,8 @@ class Tokens:
             scopes=global_scopes(),
             expires_at=expires_at,
             purpose="session",
+            token_id=token_id,
+            plain=plain,
         )
 
     def create_token(
@@ -87,8 +444,10 @@ class Tokens:
         subject_service_name=None,
         expires_at=None,
         purpose="api",
+        token_id=None,
+        plain=None,
     ):
-        plain = secrets.token_hex(32)
+        plain = plain or secrets.token_hex(32)
         now = dt.datetime.utcnow()
         doc = {
             "token_hash": self._hash_token(plain),
@@ -103,6 +462,8 @@ class Tokens:
             "revoked_at": None,
             "purpose": purpose,
         }
+        if token_id is not None:
+            doc["_id"] = token_id
         self._tokens.insert_one(doc)
         return {
             "token": plain,
@@ -137,8 +498,41 @@ class Tokens:
             {"_id": finder["_id"]},
             {"$set": {"revoked_at": dt.datetime.utcnow()}},
         )
+        if finder.get("token_hash"):
+            self._auth_cache.pop(finder["token_hash"])
+        self._refresh_revocations()
         return {"status": "OK"}, 200
 
+    def revoke_many(
+        self, subject_user=None, subject_service_name=None, created_by=None
+    ):
+        """Revoke every live token matching all of the given fields."""
+        filters = {
+            field: value
+            for field, value in (
+                ("subject_user", subject_user),
+                ("subject_service_name", subject_service_name),
+                ("created_by", created_by),
+            )
+            if value
+        }
+        if not filters:
+            return {
+                "status": "subject_user, subject_service_name or "
+                "created_by is required"
+            }, 400
+        self._auth_cache.pop_where(
+            lambda _hash, doc: all(
+                doc.get(field) == value for field, value in filters.items()
+            )
+        )
+        revoked = self._update_many(
+            {**filters, "revoked_at": None},
+            {"$set": {"revoked_at": dt.datetime.utcnow()}},
+        )
+        self._refresh_revocations()
+        return {"status": "OK", "revoked": revoked}, 200
+
     @staticmethod
     def _serialize_token_metadata(doc):
         return {
@@ -156,6 +550,9 @@ class Tokens:
         }
 
     def list_tokens(self, include_revoked=False):
+        # Buffered last_used_at values are written first so the listing is
+        # never older than the flush interval.
+        self.flush_last_used()
         query = {}
         if not include_revoked:
             query = {
@@ -168,20 +565,56 @@ class Tokens:
         cursor = self._tokens.find(query).sort("created_at", -1)
         return [self._serialize_token_metadata(doc) for doc in cursor]
 
-    def authenticate(self, token):
-        token_hash = self._hash_token(token)
+    def _lookup_token_doc(self, token_hash):
+        doc = self._auth_cache.get(token_hash)
+        if doc is not None:
+            return doc
         doc = self._tokens.find_one({"token_hash": token_hash})
+        if doc and doc.get("revoked_at") is None:
+            remaining = self._seconds_until(doc.get("expires_at"))
+            if remaining is None or remaining > 0:
+                self._auth_cache.set(token_hash, doc, ttl_seconds=remaining)
+        return doc
+
+    def _signed_session_doc(self, token):
+        claims, err = self._signer.verify(token)
+        if err:
+            return None, err
+        if claims["jti"] in self._revocations:
+            return None, "revoked"
+        try:
+            token_id = ObjectId(claims["jti"])
+        except Exception:
+            return None, "invalid"
+        return {
+            "_id": token_id,
+            "type": "personal",
+            "subject_user": claims["sub"],
+            "scopes": global_scopes(),
+            "expires_at": claims["exp"],
+            "purpose": "session",
+        }, None
+
+    def _load_auth_doc(self, token):
+        if self._signer is not None and self._signer.is_signed(token):
+            return self._signed_session_doc(token)
+        token_hash = self._hash_token(token)
+        doc = self._lookup_token_doc(token_hash)
         if not doc:
             return None, "invalid"
         if doc.get("revoked_at") is not None:
             return None, "revoked"
         expires_at = doc.get("expires_at")
-        if expires_at is not None and expires_at < dt.datetime.utcnow():
+        if expires_at is not None and self._seconds_until(expires_at) < 0:
+            self._auth_cache.pop(token_hash)
             return None, "expired"
-        self._tokens.update_one(
-            {"_id": doc["_id"]},
-            {"$set": {"last_used_at": dt.datetime.utcnow()}},
-        )
+        return doc, None
+
+    def authenticate(self, token):
+        doc, err = self._load_auth_doc(token)
+        if err:
+            return None, err
+        self._last_used.record(doc["_id"], dt.datetime.utcnow())
         token_scopes = doc.get("scopes", [])
         effective_scopes = token_scopes
         workspace_role = None
@@ -3,10 +3,17 @@
 
 from werkzeug.security import generate_password_hash, check_password_hash
 from bson.timestamp import Timestamp
+from concurrent.futures import ThreadPoolExecutor
 from textwrap import dedent
 import datetime as dt
+import hashlib
+import hmac
 import re
 import os
+import secrets
+import threading
+
+from Engines.caching import TTLCache
 
 
 class _password_policy:
@@ -54,6 +61,10 @@ class _password_policy:
 
 
 class User_Pass:
+    VERIFIED_CACHE_TTL_SECONDS = 60
+    VERIFIED_CACHE_MAX_ENTRIES = 1024
+    HASH_WORKERS = 2
+
     def __init__(self, userpass_auth_col):
         """Userpass operations
         Args:
@@ -63,6 +74,53 @@ class User_Pass:
         # * db.userpass.createIndex( { "username": 1 }, { unique: true } )
         self._userpass = userpass_auth_col
         self.p_pol = _password_policy()
+        # HMAC(key, username + password) -> username. The key never leaves
+        # the process, so cache keys cannot be reversed or replayed.
+        self._cache_key = secrets.token_bytes(32)
+        self._verified = TTLCache(
+            max_entries=os.getenv(
+                "USERPASS_CACHE_MAX_ENTRIES", self.VERIFIED_CACHE_MAX_ENTRIES
+            ),
+            ttl_seconds=os.getenv(
+                "USERPASS_CACHE_TTL_SECONDS", self.VERIFIED_CACHE_TTL_SECONDS
+            ),
+        )
+        self._hash_workers = max(
+            0, int(os.getenv("USERPASS_HASH_WORKERS", self.HASH_WORKERS))
+        )
+        self._hash_pool = None
+        self._hash_pool_lock = threading.Lock()
+        self._credentials_generation = 0
+
+    def _credential_key(self, username, password):
+        message = f"{username}\0{password}".encode()
+        return hmac.new(self._cache_key, message, hashlib.sha256).digest()
+
+    def _forget_credentials(self, username):
+        # Bumped first so an in-flight check cannot re-cache stale creds.
+        self._credentials_generation += 1
+        self._verified.pop_where(lambda _, cached: cached == username)
+
+    def _check_password(self, password_hash, password):
+        """Verify a password hash on the bounded hashing pool.
+
+        With ``USERPASS_HASH_WORKERS=0`` the hash is checked inline.
+        """
+        if self._hash_workers == 0:
+            return check_password_hash(password_hash, password)
+        if self._hash_pool is None:
+            with self._hash_pool_lock:
+                if self._hash_pool is None:
+                    self._hash_pool = ThreadPoolExecutor(
+                        max_workers=self._hash_workers,
+                        thread_name_prefix="userpass-hash",
+                    )
+        return self._hash_pool.submit(
+            check_password_hash, password_hash, password
+        ).result()
+
+    def cache_stats(self):
+        return {**self._verified.stats(), "hashWorkers": self._hash_workers}
 
     def register(self, username, password):
         """Register a new user
@@ -87,6 +145,7 @@ class User_Pass:
                 "added_on": Timestamp(int(dt.datetime.today().timestamp()), 1),
             }
             _ = self._userpass.insert_one(data)
+            self._forget_credentials(username)
             status = {"status": "OK"}
             return status, 200
         return "User already exist", 400
@@ -102,9 +161,15 @@ class User_Pass:
         if not finder:
             return "User does not exist", 400
         _ = self._userpass.delete_one({"username": username})
+        self._forget_credentials(username)
         result = {"status": "OK"}
         return result, 200
 
+    def is_cached(self, username, password):
+        """Whether the credentials were verified recently, without hashing."""
+        cache_key = self._credential_key(username, password)
+        return self._verified.get(cache_key) == username
+
     def is_authorized(self, username, password):
         """Check if a userpass is valid
         Args:
@@ -113,9 +178,17 @@ class User_Pass:
         Returns:
             bool: True for valid userpass and False otherwise.
         """
+        cache_key = self._credential_key(username, password)
+        if self._verified.get(cache_key) == username:
+            return True
+        generation = self._credentials_generation
         finder = self._userpass.find_one({"username": username})
         # Return False, if username is not found
         if not finder:
             return False
         # Return True, if userpass is valid
-        return check_password_hash(finder["password"], password)
+        if not self._check_password(finder["password"], password):
+            return False
+        if generation == self._credentials_generation:
+            self._verified.set(cache_key, username)
+        return True
@@ -2,6 +2,7 @@
 import os
 
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
 
 from Api.core import app
 from Api.resources.secrets.kv_resource import Engine_KV  # noqa: F401
@@ -11,6 +12,7 @@ from Api.resources.auth.tokens_v2_resource import (  # noqa: F401
     PersonalTokenResource,
     RevokeTokenResource,
     ServiceTokenResource,
+    TokenStatsResource,
 )
 from Api.resources.auth.onboarding_resource import (  # noqa: F401
     OnboardingBootstrapResource,
@@ -59,3 +61,13 @@ CORS(
     resources={r"/api/*": {"origins": cors_origins or "*"}},
     allow_headers=["Authorization", "Content-Type", "X-API-KEY"],
 )
+
+# Number of reverse proxies in front of the API (the bundled nginx is one).
+# Their X-Forwarded-For/-Proto entries set the client address used for
+# audit events and per-IP auth failure throttling; without this every
+# proxied request appears to come from the proxy itself.
+trusted_proxies = int(os.getenv("TRUSTED_PROXY_COUNT", "0") or 0)
+if trusted_proxies > 0:
+    app.wsgi_app = ProxyFix(  # type: ignore[method-assign]
+        app.wsgi_app, x_for=trusted_proxies, x_proto=trusted_proxies
+    )
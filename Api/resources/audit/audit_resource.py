@@ -1,11 +1,14 @@
 #!/usr/bin/env python3
-from datetime import datetime, timezone
+import json
+import zlib
+from datetime import datetime, timedelta, timezone
 
-from flask_restx import Resource
+from flask import Response
+from flask_restx import Resource, inputs
 
 from Api.core import api, conn
 from Api.resources.helpers import resolve_project_config
-from Api.serialization import oid_to_str
+from Api.serialization import oid_to_str, sanitize_doc
 from Access.is_auth import with_token, require_scope
 
 audit_ns = api.namespace("audit", description="Audit event access")
@@ -19,6 +22,128 @@ audit_parser.add_argument(
 audit_parser.add_argument(
     "page", type=int, required=False, default=1, location="args"
 )
+audit_parser.add_argument("cursor", type=str, required=False, location="args")
+
+rollups_parser = api.parser()
+rollups_parser.add_argument(
+    "project", type=str, required=False, location="args"
+)
+rollups_parser.add_argument(
+    "config", type=str, required=False, location="args"
+)
+rollups_parser.add_argument(
+    "action", type=str, required=False, location="args"
+)
+rollups_parser.add_argument("since", type=str, required=False, location="args")
+rollups_parser.add_argument("until", type=str, required=False, location="args")
+rollups_parser.add_argument(
+    "granularity",
+    type=str,
+    required=False,
+    default="hour",
+    choices=("hour", "day"),
+    location="args",
+)
+
+export_parser = api.parser()
+export_parser.add_argument(
+    "project", type=str, required=False, location="args"
+)
+export_parser.add_argument("config", type=str, required=False, location="args")
+export_parser.add_argument("since", type=str, required=False, location="args")
+export_parser.add_argument("until", type=str, required=False, location="args")
+export_parser.add_argument("cursor", type=str, required=False, location="args")
+export_parser.add_argument(
+    "gzip", type=inputs.boolean, default=False, location="args"
+)
+
+for _parser in (audit_parser, export_parser):
+    _parser.add_argument("token_id", type=str, required=False, location="args")
+    _parser.add_argument("actor_id", type=str, required=False, location="args")
+    _parser.add_argument("action", type=str, required=False, location="args")
+    _parser.add_argument(
+        "status_min", type=int, required=False, location="args"
+    )
+    _parser.add_argument(
+        "status_max", type=int, required=False, location="args"
+    )
+
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+stats_parser = api.parser()
+stats_parser.add_argument("project", type=str, required=False, location="args")
+stats_parser.add_argument("since", type=str, required=False, location="args")
+stats_parser.add_argument("until", type=str, required=False, location="args")
+stats_parser.add_argument(
+    "limit", type=int, required=False, default=50, location="args"
+)
+
+STATS_DEFAULT_WINDOW = timedelta(hours=1)
+
+
+def _ndjson_chunks(events, compress):
+    """Encode ``events`` as NDJSON in roughly fixed-size chunks."""
+    encoder = zlib.compressobj(wbits=31) if compress else None
+    buffer = []
+    size = 0
+    for event in events:
+        line = json.dumps(event, separators=(",", ":")).encode() + b"\n"
+        buffer.append(line)
+        size += len(line)
+        if size < EXPORT_CHUNK_BYTES:
+            continue
+        chunk = b"".join(buffer)
+        buffer, size = [], 0
+        yield encoder.compress(chunk) if encoder else chunk
+    chunk = b"".join(buffer)
+    if encoder:
+        chunk = encoder.compress(chunk) + encoder.flush()
+    if chunk:
+        yield chunk
+
+
+ATTRIBUTE_FILTERS = (
+    "token_id",
+    "actor_id",
+    "action",
+    "status_min",
+    "status_max",
+)
+
+
+def _attribute_filters(args):
+    return {
+        name: args[name]
+        for name in ATTRIBUTE_FILTERS
+        if args.get(name) not in (None, "")
+    }
+
+
+def _parse_iso_arg(args, name):
+    if not args.get(name):
+        return None
+    try:
+        value = datetime.fromisoformat(args[name].replace("Z", "+00:00"))
+    except ValueError:
+        api.abort(400, f"Invalid {name} format. Use ISO-8601 format.")
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def _require_audit_scope(project_slug, config_slug):
+    project_id = None
+    config_id = None
+    if config_slug and not project_slug:
+        api.abort(
+            400, "project query param is required when config is provided"
+        )
+    if project_slug:
+        project, config = resolve_project_config(project_slug, config_slug)
+        project_id = project["_id"]
+        config_id = config["_id"] if config else None
+    require_scope("audit:read", project_id=project_id, config_id=config_id)
+    return project_id, config_id
 
 
 @audit_ns.route("/events")
@@ -32,36 +157,113 @@ class AuditEventsResource(Resource):
         if args["page"] < 1:
             api.abort(400, "page must be >= 1")
 
-        project_id = None
-        config_id = None
         project_slug = args.get("project")
         config_slug = args.get("config")
-        if config_slug and not project_slug:
-            api.abort(
-                400, "project query param is required when config is provided"
+        project_id, config_id = _require_audit_scope(project_slug, config_slug)
+        since = _parse_iso_arg(args, "since")
+        try:
+            page_result = conn.audit.query_events_page(
+                project_slug=project_slug,
+                config_slug=config_slug,
+                since=since,
+                limit=args["limit"],
+                page=args["page"],
+                project_id=oid_to_str(project_id),
+                config_id=oid_to_str(config_id),
+                cursor=args.get("cursor"),
+                **_attribute_filters(args),
             )
-        if project_slug:
-            project, config = resolve_project_config(project_slug, config_slug)
-            project_id = project["_id"]
-            config_id = config["_id"] if config else None
-        require_scope("audit:read", project_id=project_id, config_id=config_id)
-        since = None
-        if args.get("since"):
-            try:
-                since = datetime.fromisoformat(
-                    args["since"].replace("Z", "+00:00")
-                )
-                if since.tzinfo is None:
-                    since = since.replace(tzinfo=timezone.utc)
-            except ValueError:
-                api.abort(400, "Invalid since format. Use ISO-8601 format.")
-        page_result = conn.audit.query_events_page(
+        except ValueError as exc:
+            api.abort(400, str(exc))
+        return {**page_result, "status": "OK"}
+
+
+@audit_ns.route("/rollups")
+class AuditRollupsResource(Resource):
+    @api.doc(security=["Bearer", "Token"], parser=rollups_parser)
+    @with_token
+    def get(self):
+        args = rollups_parser.parse_args()
+        project_slug = args.get("project")
+        config_slug = args.get("config")
+        _require_audit_scope(project_slug, config_slug)
+        try:
+            buckets = conn.audit.query_rollups(
+                project_slug=project_slug,
+                config_slug=config_slug,
+                action=args.get("action"),
+                since=_parse_iso_arg(args, "since"),
+                until=_parse_iso_arg(args, "until"),
+                granularity=args["granularity"],
+            )
+        except ValueError as exc:
+            api.abort(400, str(exc))
+        return {
+            "buckets": buckets,
+            "granularity": args["granularity"],
+            "status": "OK",
+        }
+
+
+@audit_ns.route("/export")
+class AuditExportResource(Resource):
+    @api.doc(security=["Bearer", "Token"], parser=export_parser)
+    @with_token
+    def get(self):
+        args = export_parser.parse_args()
+        project_slug = args.get("project")
+        config_slug = args.get("config")
+        project_id, config_id = _require_audit_scope(project_slug, config_slug)
+        try:
+            events = conn.audit.export_events(
+                project_slug=project_slug,
+                config_slug=config_slug,
+                since=_parse_iso_arg(args, "since"),
+                until=_parse_iso_arg(args, "until"),
+                project_id=oid_to_str(project_id),
+                config_id=oid_to_str(config_id),
+                cursor=args.get("cursor"),
+                **_attribute_filters(args),
+            )
+        except ValueError as exc:
+            api.abort(400, str(exc))
+        headers = {"Cache-Control": "no-store"}
+        if args["gzip"]:
+            headers["Content-Encoding"] = "gzip"
+        return Response(
+            _ndjson_chunks(events, args["gzip"]),
+            status=200,
+            mimetype="application/x-ndjson",
+            headers=headers,
+        )
+
+
+@audit_ns.route("/stats")
+class AuditStatsResource(Resource):
+    @api.doc(security=["Bearer", "Token"], parser=stats_parser)
+    @with_token
+    def get(self):
+        args = stats_parser.parse_args()
+        if args["limit"] < 1:
+            api.abort(400, "limit must be >= 1")
+        project_slug = args.get("project")
+        project_id, _ = _require_audit_scope(project_slug, None)
+        until = _parse_iso_arg(args, "until") or datetime.now(timezone.utc)
+        since = _parse_iso_arg(args, "since") or until - STATS_DEFAULT_WINDOW
+        if since >= until:
+            api.abort(400, "since must be before until")
+        stats = conn.audit.route_stats(
+            since,
+            until,
             project_slug=project_slug,
-            config_slug=config_slug,
-            since=since,
-            limit=args["limit"],
-            page=args["page"],
             project_id=oid_to_str(project_id),
-            config_id=oid_to_str(config_id),
+            limit=args["limit"],
         )
-        return {**page_result, "status": "OK"}
+        return {
+            **sanitize_doc(stats),
+            "writer": conn.audit.writer_stats(),
+            "identity": conn.audit.identity_stats(),
+            "storage": conn.audit.storage_stats(),
+            "policies": conn.audit.policy_stats(),
+            "status": "OK",
+        }
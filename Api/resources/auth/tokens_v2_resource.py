@@ -49,6 +49,17 @@ revoke_parser.add_argument(
 )
 revoke_parser.add_argument("token", type=str, required=False, location="json")
 
+revoke_bulk_parser = api.parser()
+revoke_bulk_parser.add_argument(
+    "subject_user", type=str, required=False, location="json"
+)
+revoke_bulk_parser.add_argument(
+    "subject_service_name", type=str, required=False, location="json"
+)
+revoke_bulk_parser.add_argument(
+    "created_by", type=str, required=False, location="json"
+)
+
 list_parser = api.parser()
 list_parser.add_argument(
     "include_revoked",
@@ -151,3 +162,37 @@ class RevokeTokenResource(Resource):
         if code >= 400:
             api.abort(code, result.get("status"))
         return result, code
+
+
+@tokens_v2_ns.route("/revoke-bulk")
+class RevokeTokensBulkResource(Resource):
+    @api.doc(security=["Bearer", "Token"], parser=revoke_bulk_parser)
+    @with_token
+    def post(self):
+        require_scope("tokens:manage")
+        args = revoke_bulk_parser.parse_args()
+        result, code = conn.tokens.revoke_many(
+            subject_user=args.get("subject_user"),
+            subject_service_name=args.get("subject_service_name"),
+            created_by=args.get("created_by"),
+        )
+        audit_event("tokens.revoke_bulk", status_code=code)
+        if code >= 400:
+            api.abort(code, result.get("status"))
+        return result, code
+
+
+@tokens_v2_ns.route("/stats")
+class TokenStatsResource(Resource):
+    @api.doc(security=["Bearer", "Token"])
+    @with_token
+    def get(self):
+        require_scope("tokens:manage")
+        return {
+            **conn.tokens.stats(),
+            "actorCache": conn.rbac.cache_stats(),
+            "userpassCache": conn.userpass.cache_stats(),
+            "exportCache": conn.secrets_v2.cache_stats(),
+            "authFailures": conn.auth_failures.stats(),
+            "status": "OK",
+        }, 200
@@ -9,7 +9,7 @@ from Api.resources.secrets.references import (
     SecretReferenceResolver,
 )
 from Access.is_auth import with_token
-from Access.policy import authorize
+from Access.policy import authorize, authorize_many
 from Engines.common import is_valid_env_key
 from Engines.compare_issues import (
     ISSUE_BROKEN_REFERENCE_UNRESOLVED,
@@ -93,18 +93,13 @@ def _parse_compare_args():
 def _authorized_configs_for_actor(
     actor, project_id, all_configs, limit_configs
 ):
-    authorized = []
-    for cfg in all_configs:
-        if authorize(
-            actor,
-            "secrets:export",
-            project_id=project_id,
-            config_id=cfg.get("_id"),
-        ):
-            authorized.append(cfg)
-        if len(authorized) >= limit_configs:
-            break
-    return authorized
+    allowed = authorize_many(
+        actor,
+        "secrets:export",
+        [(project_id, cfg.get("_id")) for cfg in all_configs],
+    )
+    authorized = [cfg for cfg, ok in zip(all_configs, allowed) if ok]
+    return authorized[:limit_configs]
 
 
 def _load_exported_config(config_id, include_parent, exported_cache):
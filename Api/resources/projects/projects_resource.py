@@ -4,7 +4,7 @@ from flask import g
 
 from Api.core import api, conn
 from Access.is_auth import with_token, require_scope
-from Access.policy import authorize
+from Access.policy import authorize_many
 
 projects_ns = api.namespace("projects", description="Project management")
 project_model = api.model(
@@ -82,11 +82,20 @@ class ProjectsResource(Resource):
                     if doc.get("workspace_id") in (None, workspace_id)
                 ]
 
-        authorized_project_ids = [
-            str(doc.get("_id"))
+        candidate_ids = [
+            doc.get("_id")
             for doc in candidate_docs
             if doc.get("_id") is not None
-            and authorize(actor, "projects:read", project_id=doc.get("_id"))
+        ]
+        allowed = authorize_many(
+            actor,
+            "projects:read",
+            [(project_id, None) for project_id in candidate_ids],
+        )
+        authorized_project_ids = [
+            str(project_id)
+            for project_id, ok in zip(candidate_ids, allowed)
+            if ok
         ]
         if not authorized_project_ids:
             return {"projects": []}
@@ -58,9 +58,22 @@ class SecretReferenceResolver:
         self._context_cache: dict[_Context, dict[str, str]] = {}
         self._resolved_cache: dict[_Node, str] = {}
         self._validated_cache: set[_Node] = set()
+        self._dependencies: dict[_Context, object] = {}
         if root_data is not None:
             self._context_cache[self._root] = dict(root_data)
 
+    def dependencies(self) -> tuple[tuple[str, str, object], ...]:
+        """Contexts loaded besides the root, with their config id or None."""
+        return tuple(
+            sorted(
+                (
+                    (context.project_slug, context.config_slug, config_id)
+                    for context, config_id in self._dependencies.items()
+                ),
+                key=lambda item: (item[0], item[1]),
+            )
+        )
+
     def resolve_map(self, data: dict[str, str]) -> dict[str, str]:
         self._context_cache[self._root] = dict(data)
         resolved: dict[str, str] = {}
@@ -215,6 +228,7 @@ class SecretReferenceResolver:
         if cached is not None:
             return cached
 
+        self._dependencies[context] = None
         project = self._get_project_by_slug(context.project_slug)
         if project is None:
             self._context_cache[context] = {}
@@ -223,6 +237,7 @@ class SecretReferenceResolver:
         if config is None:
             self._context_cache[context] = {}
             return self._context_cache[context]
+        self._dependencies[context] = config["_id"]
         if self._require_scope is not None:
             self._require_scope("secrets:read", project["_id"], config["_id"])
 
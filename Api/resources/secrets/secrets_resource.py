@@ -1,4 +1,5 @@
 #!/usr/bin/env python3
+import json
 from typing import Optional
 
 from flask import Response, g, request
@@ -56,48 +57,213 @@ export_parser.add_argument(
 )
 
 
-def _resolve_reference_map(
-    *,
-    project_slug: str,
-    config_slug: str,
-    data: dict[str, str],
-    enabled: bool,
-    max_depth: int,
-) -> dict[str, str]:
-    if not enabled:
-        return data
-    resolver = _build_reference_resolver(
-        project_slug=project_slug,
-        config_slug=config_slug,
-        max_depth=max_depth,
-        root_data=data,
-    )
-    return resolver.resolve_map(data)
-
-
 def _build_reference_resolver(
     *,
     project_slug: str,
     config_slug: str,
     max_depth: int,
     root_data: Optional[dict[str, str]] = None,
+    export_config=None,
 ) -> SecretReferenceResolver:
+    if export_config is None:
+
+        def export_config(cfg_id):
+            return conn.secrets_v2.export_config(
+                cfg_id,
+                include_parent=True,
+                include_metadata=False,
+            )
+
     return SecretReferenceResolver(
         project_slug=project_slug,
         config_slug=config_slug,
         get_project_by_slug=conn.projects.get_by_slug,
         get_config_by_slug=conn.configs.get_by_slug,
-        export_config=lambda cfg_id: conn.secrets_v2.export_config(
-            cfg_id,
-            include_parent=True,
-            include_metadata=False,
-        ),
+        export_config=export_config,
         require_scope=require_scope,
         max_depth=max_depth,
         root_data=root_data,
     )
 
 
+def _dependency_states(dependencies):
+    """Export states of recorded reference targets, re-resolved by slug.
+
+    Returns ``None`` when a slug now names a different config, or one that
+    was missing now exists, so the caller has to resolve again. Read scopes
+    are checked as in a full resolution. Only reads.
+    """
+    states = []
+    for project_slug, config_slug, config_id in dependencies:
+        project = conn.projects.get_by_slug(project_slug)
+        config = (
+            conn.configs.get_by_slug(project["_id"], config_slug)
+            if project is not None
+            else None
+        )
+        if (config["_id"] if config is not None else None) != config_id:
+            return None
+        if config is not None:
+            require_scope("secrets:read", project["_id"], config["_id"])
+            states.append(conn.secrets_v2.export_state(config))
+    return states
+
+
+def _resolved_etag(config, include_parent, variant):
+    """Revision ETag of a resolving export, from recorded dependencies."""
+    dependencies = conn.secrets_v2.reference_dependencies(
+        config["_id"], include_parent
+    )
+    if dependencies is None:
+        return None
+    states = _dependency_states(dependencies)
+    if states is None:
+        return None
+    root_state = conn.secrets_v2.export_state(config, include_parent)
+    return conn.secrets_v2.state_etag([root_state, *states], variant)
+
+
+def _resolved_export(project_slug, config_slug, config, args, variant):
+    """Export ``config`` with references resolved.
+
+    Returns ``(data, meta, etag, msg, code)``. Each config is read at a
+    stored state captured just before, and the ETag is built from those
+    states, so it never describes a newer state than the body. The
+    configs read are recorded for ``_resolved_etag``. Raises
+    ``SecretReferenceError``.
+    """
+    include_parent = args.get("include_parent", True)
+    root_state = conn.secrets_v2.export_state(config, include_parent)
+    data, meta, msg, code = conn.secrets_v2.export_config(
+        config["_id"],
+        include_parent=include_parent,
+        include_metadata=args.get("include_meta", False),
+        state=root_state,
+    )
+    if code >= 400 or data is None:
+        return None, None, None, msg, code
+    states = {}
+
+    def export_dependency(cfg_id):
+        dependency = conn.configs.get_by_id(cfg_id)
+        state = (
+            conn.secrets_v2.export_state(dependency) if dependency else None
+        )
+        states[cfg_id] = state
+        return conn.secrets_v2.export_config(
+            cfg_id, include_parent=True, include_metadata=False, state=state
+        )
+
+    resolver = _build_reference_resolver(
+        project_slug=project_slug,
+        config_slug=config_slug,
+        max_depth=args["placeholder_max_depth"],
+        root_data=data,
+        export_config=export_dependency,
+    )
+    data = resolver.resolve_map(data)
+    dependencies = resolver.dependencies()
+    conn.secrets_v2.record_reference_dependencies(
+        config["_id"], include_parent, dependencies
+    )
+    etag = conn.secrets_v2.state_etag(
+        [
+            root_state,
+            *(
+                states.get(cfg_id)
+                for _, _, cfg_id in dependencies
+                if cfg_id is not None
+            ),
+        ],
+        variant,
+    )
+    return data, meta, etag, "OK", 200
+
+
+def _bulk_reference_errors(project_slug, config_slug, config, items):
+    """Validate references in a bulk payload against one staged export."""
+    referencing = {
+        key: value
+        for key, value in items.items()
+        if isinstance(value, str) and "${" in value
+    }
+    if not referencing:
+        return {}
+    exported, _, msg, code = conn.secrets_v2.export_config(
+        config["_id"],
+        include_parent=True,
+        include_metadata=False,
+    )
+    if code >= 400 or exported is None:
+        api.abort(code, msg)
+    staged = dict(exported)
+    staged.update(
+        (key, value) for key, value in items.items() if isinstance(value, str)
+    )
+    resolver = _build_reference_resolver(
+        project_slug=project_slug,
+        config_slug=config_slug,
+        max_depth=8,
+        root_data=staged,
+    )
+    errors = {}
+    for key, value in referencing.items():
+        try:
+            key_errors = resolver.validate_value_references(
+                key=key, value=value
+            )
+        except SecretReferenceError as exc:
+            key_errors = [exc.message]
+        if key_errors:
+            errors[key] = "; ".join(key_errors)
+    return errors
+
+
+def _not_modified(etag):
+    response = Response(status=304)
+    response.set_etag(etag)
+    return response
+
+
+def _tagged_response(body, etag, content_type="application/json"):
+    """Return ``body`` with ``etag``, or with a content ETag without one.
+
+    The content hash is only a fallback for configs without stored
+    revisions; it saves the transfer, not the load.
+    """
+    response = Response(body, status=200, content_type=content_type)
+    if etag is not None:
+        response.set_etag(etag)
+        return response
+    response.add_etag()
+    return response.make_conditional(request)
+
+
+def _audit_read(project_slug, config_slug, key, status_code):
+    audit_event(
+        "secrets.read",
+        project_slug=project_slug,
+        config_slug=config_slug,
+        key=key,
+        status_code=status_code,
+    )
+
+
+def _resolved_item(project_slug, config_slug, config, key, args, variant):
+    """Resolve ``key`` through a full export; returns ``(value, etag)``."""
+    try:
+        resolved, _, etag, msg, code = _resolved_export(
+            project_slug, config_slug, config, args, variant
+        )
+    except SecretReferenceError as exc:
+        _audit_read(project_slug, config_slug, key, exc.status_code)
+        api.abort(exc.status_code, exc.message)
+    if code >= 400:
+        _audit_read(project_slug, config_slug, key, code)
+        api.abort(code, msg)
+    return resolved.get(key), etag
+
+
 @secrets_ns.route("/<string:key>")
 class SecretItemResource(Resource):
     @api.doc(security=["Bearer", "Token"], parser=secret_parser)
@@ -173,59 +339,31 @@ class SecretItemResource(Resource):
         resolve_references = bool(args["resolve_references"]) and not bool(
             args["raw"]
         )
+        if resolve_references:
+            variant = ("item", key, "resolved", args["placeholder_max_depth"])
+            etag = _resolved_etag(config, True, variant)
+        else:
+            etag = conn.secrets_v2.export_etag(
+                config, include_parent=False, variant=("item", key)
+            )
+        if etag is not None and request.if_none_match.contains(etag):
+            _audit_read(project_slug, config_slug, key, 304)
+            return _not_modified(etag)
 
         result, code = conn.secrets_v2.get(config["_id"], key)
         if code >= 400:
-            audit_event(
-                "secrets.read",
-                project_slug=project_slug,
-                config_slug=config_slug,
-                key=key,
-                status_code=code,
-            )
+            _audit_read(project_slug, config_slug, key, code)
             api.abort(code, result)
         if resolve_references:
-            exported, _, msg, export_code = conn.secrets_v2.export_config(
-                config["_id"],
-                include_parent=True,
-                include_metadata=False,
+            value, etag = _resolved_item(
+                project_slug, config_slug, config, key, args, variant
             )
-            if export_code >= 400 or exported is None:
-                audit_event(
-                    "secrets.read",
-                    project_slug=project_slug,
-                    config_slug=config_slug,
-                    key=key,
-                    status_code=export_code,
-                )
-                api.abort(export_code, msg)
-            try:
-                resolved = _resolve_reference_map(
-                    project_slug=project_slug,
-                    config_slug=config_slug,
-                    data=exported,
-                    enabled=True,
-                    max_depth=args["placeholder_max_depth"],
-                )
-            except SecretReferenceError as exc:
-                audit_event(
-                    "secrets.read",
-                    project_slug=project_slug,
-                    config_slug=config_slug,
-                    key=key,
-                    status_code=exc.status_code,
-                )
-                api.abort(exc.status_code, exc.message)
-            if key in resolved:
-                result = {"key": key, "value": resolved[key], "status": "OK"}
-        audit_event(
-            "secrets.read",
-            project_slug=project_slug,
-            config_slug=config_slug,
-            key=key,
-            status_code=200,
-        )
-        return result, code
+            if value is not None:
+                result = {"key": key, "value": value, "status": "OK"}
+        _audit_read(project_slug, config_slug, key, 200)
+        if etag is None and not resolve_references:
+            return result, code
+        return _tagged_response(json.dumps(result) + "\n", etag)
 
     @api.doc(security=["Bearer", "Token"])
     @with_token
@@ -249,6 +387,79 @@ class SecretItemResource(Resource):
         return result, code
 
 
+@secrets_ns.route("/bulk")
+class SecretBulkResource(Resource):
+    @api.doc(security=["Bearer", "Token"])
+    @with_token
+    def post(self, project_slug, config_slug):
+        """Upsert many secrets: ``{"secrets": {"KEY": "value", ...}}``."""
+        project, config = resolve_project_config(project_slug, config_slug)
+        require_scope(
+            "secrets:write", project_id=project["_id"], config_id=config["_id"]
+        )
+        payload = request.get_json(silent=True)
+        items = payload.get("secrets") if isinstance(payload, dict) else None
+        if not isinstance(items, dict):
+            api.abort(400, "secrets must be an object of key/value pairs")
+        errors = _bulk_reference_errors(
+            project_slug, config_slug, config, items
+        )
+        if errors:
+            api.abort(400, "Invalid secret references", errors=errors)
+
+        result, code = conn.secrets_v2.put_many(
+            config["_id"], items, g.actor.get("id")
+        )
+        audit_event(
+            "secrets.bulk_write",
+            project_slug=project_slug,
+            config_slug=config_slug,
+            number_of_keys=len(items),
+            status_code=code,
+        )
+        if code >= 400:
+            api.abort(code, result["status"], errors=result.get("errors", {}))
+        return result, code
+
+
+def _rendered_export(project_slug, config_slug, config, args):
+    state = conn.secrets_v2.export_state(config, args["include_parent"])
+    etag = conn.secrets_v2.state_etag(
+        [state], ("export", args["format"], bool(args["include_meta"]))
+    )
+    if etag is not None and request.if_none_match.contains(etag):
+        audit_event(
+            "secrets.export",
+            project_slug=project_slug,
+            config_slug=config_slug,
+            status_code=304,
+        )
+        return _not_modified(etag)
+    body, number_of_keys, msg, code = conn.secrets_v2.export_rendered(
+        config["_id"],
+        fmt=args["format"],
+        include_parent=args["include_parent"],
+        include_metadata=args["include_meta"],
+        state=state,
+    )
+    if code >= 400:
+        api.abort(code, msg)
+    audit_event(
+        "secrets.export",
+        project_slug=project_slug,
+        config_slug=config_slug,
+        number_of_keys=number_of_keys,
+        status_code=200,
+    )
+    content_type = (
+        "text/plain" if args["format"] == "env" else "application/json"
+    )
+    response = Response(body, status=200, content_type=content_type)
+    if etag is not None:
+        response.set_etag(etag)
+    return response
+
+
 @secrets_ns.route("")
 class SecretExportResource(Resource):
     @api.doc(security=["Bearer", "Token"], parser=export_parser)
@@ -264,23 +475,32 @@ class SecretExportResource(Resource):
         resolve_references = bool(args["resolve_references"]) and not bool(
             args["raw"]
         )
-        data, meta, msg, code = conn.secrets_v2.export_config(
-            config["_id"],
-            include_parent=args["include_parent"],
-            include_metadata=args["include_meta"],
+        if not resolve_references:
+            return _rendered_export(project_slug, config_slug, config, args)
+        variant = (
+            "export",
+            args["format"],
+            bool(args["include_meta"]),
+            "resolved",
+            args["placeholder_max_depth"],
         )
-        if code >= 400:
-            api.abort(code, msg)
-        try:
-            data = _resolve_reference_map(
+        etag = _resolved_etag(config, args["include_parent"], variant)
+        if etag is not None and request.if_none_match.contains(etag):
+            audit_event(
+                "secrets.export",
                 project_slug=project_slug,
                 config_slug=config_slug,
-                data=data,
-                enabled=resolve_references,
-                max_depth=args["placeholder_max_depth"],
+                status_code=304,
+            )
+            return _not_modified(etag)
+        try:
+            data, meta, etag, msg, code = _resolved_export(
+                project_slug, config_slug, config, args, variant
             )
         except SecretReferenceError as exc:
             api.abort(exc.status_code, exc.message)
+        if code >= 400:
+            api.abort(code, msg)
         audit_event(
             "secrets.export",
             project_slug=project_slug,
@@ -292,8 +512,8 @@ class SecretExportResource(Resource):
             env_blob, env_msg, env_code = conn.secrets_v2.to_env(data)
             if env_code >= 400:
                 api.abort(env_code, env_msg)
-            return Response(env_blob, status=200, content_type="text/plain")
+            return _tagged_response(env_blob, etag, "text/plain")
         response = {"data": data, "status": "OK"}
         if args["include_meta"]:
             response["meta"] = meta
-        return response, 200
+        return _tagged_response(json.dumps(response) + "\n", etag)
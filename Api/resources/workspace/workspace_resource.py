@@ -337,6 +337,7 @@ class WorkspaceMemberItemResource(Resource):
         _, msg, code = conn.users.set_disabled(username, True)
         if code >= 400:
             api.abort(code, msg)
+        conn.tokens.revoke_many(subject_user=username)
 
         membership = conn.memberships.get_workspace_membership(
             workspace_id, username
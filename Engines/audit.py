@@ -1,68 +1,720 @@
 #!/usr/bin/env python3
+import base64
+import heapq
+import itertools
+import json
+import os
+import queue
+import threading
 from datetime import datetime, timezone
 
+from bson import ObjectId
+from loguru import logger
+from pymongo.errors import OperationFailure
+
 from Api.serialization import sanitize_doc
+from Engines.audit_archive import AuditArchive
+from Engines.audit_identity import AuditIdentity
+from Engines.audit_policy import AuditPolicies
+from Engines.audit_rollups import AuditRollups
+from Engines.audit_stats import route_latency_pipeline, summarize_routes
+from Engines.audit_storage import (
+    STORAGE_MODES,
+    AuditDictionary,
+    StandardLayout,
+    TimeSeriesLayout,
+    TimeSeriesMigration,
+    ensure_timeseries_collection,
+    supports_timeseries_deletes,
+)
+from Engines.background import SHUTDOWN_WRITERS, on_shutdown
+
+_WAKE = object()
+
+
+class _AuditWriter:
+    """Bounded queue of audit events drained by a background writer.
+
+    The writer thread takes whatever has queued up, at most ``batch_size``
+    events, and writes it with one ``insert_many``; under load batches fill
+    up while the previous write is in flight. ``flush_interval_seconds``
+    bounds how long the writer sleeps when idle. When the queue is full the
+    ``block`` policy waits up to ``block_seconds`` for room and the ``drop``
+    policy discards the event immediately; either way a discarded event is
+    counted in ``dropped``. A flush interval of zero writes synchronously.
+    """
+
+    POLICIES = ("block", "drop")
+
+    def __init__(
+        self,
+        events_col,
+        batch_size=100,
+        flush_interval_seconds=1.0,
+        max_queue=10000,
+        full_policy="block",
+        block_seconds=5.0,
+        on_written=None,
+        prepare=None,
+        encode=None,
+    ):
+        self._events = events_col
+        self._on_written = on_written
+        self._prepare = prepare
+        self._encode = encode
+        self._batch_size = max(1, int(batch_size))
+        self._interval = max(0.0, float(flush_interval_seconds))
+        self._queue = queue.Queue(maxsize=max(1, int(max_queue)))
+        policy = str(full_policy or "").strip().lower()
+        self._policy = policy if policy in self.POLICIES else "block"
+        self._block_seconds = max(0.0, float(block_seconds))
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        if self._interval > 0:
+            # Stop after producers (collapse windows, auth failure
+            # summaries) have flushed what they hold into the queue.
+            on_shutdown(self.stop, stage=SHUTDOWN_WRITERS)
+        self.queued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+
+    def _start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="ssm-audit-writer", daemon=True
+            )
+            self._thread.start()
+
+    def submit(self, event):
+        if self._interval <= 0:
+            self._insert([event])
+            return True
+        self._start()
+        try:
+            if self._policy == "drop":
+                self._queue.put_nowait(event)
+            else:
+                self._queue.put(event, timeout=self._block_seconds)
+        except queue.Full:
+            self.dropped += 1
+            return False
+        self.queued += 1
+        return True
+
+    def _insert(self, batch):
+        if self._prepare is not None:
+            try:
+                self._prepare(batch)
+            except Exception:
+                logger.exception("Failed to prepare audit events")
+        try:
+            docs = batch
+            if self._encode is not None:
+                docs = [self._encode(event) for event in batch]
+            insert_many = getattr(self._events, "insert_many", None)
+            if callable(insert_many):
+                insert_many(docs, ordered=False)
+            else:
+                for doc in docs:
+                    self._events.insert_one(doc)
+        except Exception:
+            self.failed += len(batch)
+            logger.exception(f"Failed to write {len(batch)} audit events")
+            return 0
+        self.batches += 1
+        self.written += len(batch)
+        if self._on_written is not None:
+            try:
+                self._on_written(batch)
+            except Exception:
+                logger.exception("Failed to update audit rollups")
+        return len(batch)
+
+    def _take_batch(self, timeout=None):
+        batch = []
+        try:
+            item = (
+                self._queue.get_nowait()
+                if timeout is None
+                else self._queue.get(timeout=timeout)
+            )
+            while True:
+                if item is not _WAKE:
+                    batch.append(item)
+                if len(batch) >= self._batch_size:
+                    break
+                item = self._queue.get_nowait()
+        except queue.Empty:
+            pass
+        return batch
+
+    def _run(self):
+        while not self._stopping.is_set():
+            batch = self._take_batch(timeout=self._interval)
+            if batch:
+                self._insert(batch)
+
+    def flush(self):
+        """Write everything queued so far from the calling thread."""
+        written = 0
+        while True:
+            batch = self._take_batch()
+            if not batch:
+                return written
+            written += self._insert(batch)
+
+    def stop(self):
+        self._stopping.set()
+        try:
+            self._queue.put_nowait(_WAKE)
+        except queue.Full:
+            pass
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=max(1.0, self._interval * 2))
+        self._thread = None
+        self.flush()
+
+    def stats(self):
+        return {
+            "policy": self._policy,
+            "batchSize": self._batch_size,
+            "flushIntervalSeconds": self._interval,
+            "pending": self._queue.qsize(),
+            "queued": self.queued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "batches": self.batches,
+        }
 
 
 class AuditEvents:
-    def __init__(self, events_col):
+    BATCH_SIZE = 100
+    FLUSH_SECONDS = 1.0
+    MAX_QUEUE = 10000
+    QUEUE_FULL_POLICY = "block"
+    QUEUE_BLOCK_SECONDS = 5.0
+    RETENTION_DAYS = 0
+    TTL_INDEX_NAME = "ts_ttl"
+    EXPORT_BATCH_SIZE = 1000
+    STORAGE = "standard"
+    INDEXED_FIELDS = (
+        "project_slug",
+        "config_slug",
+        "project_id",
+        "config_id",
+        "token_id",
+        "actor_id",
+        "action",
+    )
+    # Fields that had a (field, ts) index before pages sorted on (ts, _id).
+    LEGACY_INDEXED_FIELDS = (
+        "project_slug",
+        "config_slug",
+        "project_id",
+        "config_id",
+        "token_id",
+    )
+    # Equality filters in the order their indexes narrow a query most.
+    HINT_PRIORITY = (
+        "token_id",
+        "actor_id",
+        "config_id",
+        "project_id",
+        "action",
+    )
+
+    def __init__(
+        self,
+        events_col,
+        rollups_col=None,
+        projects_engine=None,
+        configs_engine=None,
+    ):
+        retention_days = float(
+            os.getenv("AUDIT_RETENTION_DAYS", self.RETENTION_DAYS)
+        )
+        legacy_col = events_col
+        events_col = self._open_storage(events_col, retention_days)
         self._events = events_col
-        self._events.create_index([("project_slug", 1), ("ts", -1)])
-        self._events.create_index([("config_slug", 1), ("ts", -1)])
-        # Keep legacy indexes for existing deployments.
-        self._events.create_index([("project_id", 1), ("ts", -1)])
-        self._events.create_index([("config_id", 1), ("ts", -1)])
-        self._events.create_index([("token_id", 1), ("ts", -1)])
+        self._rollups = (
+            AuditRollups(rollups_col) if rollups_col is not None else None
+        )
+        self._identity = None
+        if projects_engine is not None and configs_engine is not None:
+            self._identity = AuditIdentity(
+                events_col,
+                projects_engine,
+                configs_engine,
+                batch_size=os.getenv(
+                    "AUDIT_BACKFILL_BATCH_SIZE",
+                    AuditIdentity.BACKFILL_BATCH_SIZE,
+                ),
+                interval_seconds=os.getenv(
+                    "AUDIT_BACKFILL_SECONDS",
+                    AuditIdentity.BACKFILL_INTERVAL_SECONDS,
+                ),
+            )
+        prepare = self._identity.annotate if self._identity else None
+        self._writer = _AuditWriter(
+            events_col,
+            batch_size=os.getenv("AUDIT_BATCH_SIZE", self.BATCH_SIZE),
+            flush_interval_seconds=os.getenv(
+                "AUDIT_FLUSH_SECONDS", self.FLUSH_SECONDS
+            ),
+            max_queue=os.getenv("AUDIT_QUEUE_MAX", self.MAX_QUEUE),
+            full_policy=os.getenv(
+                "AUDIT_QUEUE_FULL_POLICY", self.QUEUE_FULL_POLICY
+            ),
+            block_seconds=os.getenv(
+                "AUDIT_QUEUE_BLOCK_SECONDS", self.QUEUE_BLOCK_SECONDS
+            ),
+            on_written=self._rollups.record if self._rollups else None,
+            prepare=prepare,
+            encode=self._layout.to_doc,
+        )
+        self._policies = AuditPolicies(
+            os.getenv("AUDIT_POLICIES", ""), emit=self._writer.submit
+        )
+        self._create_indexes()
+        self._apply_retention(retention_days)
+        if self._identity is not None:
+            if self._layout.timeseries:
+                # Time-series events are always written with ids.
+                self._identity.complete = True
+            else:
+                self._identity.start_backfill()
+        self._migration = None
+        if self._layout.timeseries:
+            self._migration = TimeSeriesMigration(
+                legacy_col,
+                events_col,
+                self._layout,
+                prepare=prepare,
+                batch_size=os.getenv(
+                    "AUDIT_MIGRATION_BATCH_SIZE",
+                    TimeSeriesMigration.BATCH_SIZE,
+                ),
+            )
+            self._migration.start()
+        self._archive = None
+        archive_dir = os.getenv("AUDIT_ARCHIVE_DIR", "").strip()
+        if (
+            archive_dir
+            and self._layout.timeseries
+            and not supports_timeseries_deletes(events_col.database)
+        ):
+            logger.warning(
+                "Audit archiving of time-series storage needs MongoDB 7.0 "
+                "or newer; AUDIT_ARCHIVE_DIR is ignored"
+            )
+            archive_dir = ""
+        if archive_dir:
+            self._archive = AuditArchive(
+                events_col,
+                archive_dir,
+                self._layout,
+                after_days=os.getenv(
+                    "AUDIT_ARCHIVE_AFTER_DAYS", AuditArchive.AFTER_DAYS
+                ),
+                codec=os.getenv("AUDIT_ARCHIVE_CODEC", AuditArchive.CODEC),
+                batch_size=os.getenv(
+                    "AUDIT_ARCHIVE_BATCH_SIZE", AuditArchive.BATCH_SIZE
+                ),
+                interval_seconds=os.getenv(
+                    "AUDIT_ARCHIVE_SECONDS", AuditArchive.INTERVAL_SECONDS
+                ),
+            )
+            self._archive.start()
+
+    def _open_storage(self, events_col, retention_days):
+        """Pick the layout from ``AUDIT_STORAGE``; return the collection.
+
+        Time-series mode writes to ``<name>_ts`` because MongoDB cannot
+        convert an existing collection in place.
+        """
+        storage = str(os.getenv("AUDIT_STORAGE", self.STORAGE)).strip().lower()
+        self._layout = StandardLayout()
+        if storage not in STORAGE_MODES:
+            logger.warning(
+                f"Unknown AUDIT_STORAGE {storage!r}; using standard storage"
+            )
+        if storage != "timeseries":
+            return events_col
+        database = events_col.database
+        self._layout = TimeSeriesLayout(
+            AuditDictionary(database[f"{events_col.name}_dictionary"])
+        )
+        return ensure_timeseries_collection(
+            database,
+            f"{events_col.name}_ts",
+            expire_after_seconds=max(0, int(retention_days * 86400)),
+        )
+
+    def _index_keys(self, name=None):
+        # Every index ends in (ts, _id) so keyset pages seek and sort on
+        # the index alone. Time-series collections already keep buckets in
+        # time order and only need ts.
+        keys = [("ts", -1)]
+        if not self._layout.timeseries:
+            keys.append(("_id", -1))
+        if name is not None:
+            keys.insert(0, (self._layout.field(name), 1))
+        return keys
+
+    def _create_indexes(self):
+        self._events.create_index(self._index_keys())
+        for name in self.INDEXED_FIELDS:
+            self._events.create_index(self._index_keys(name))
+        if not self._layout.timeseries:
+            self._drop_legacy_indexes()
+
+    def _drop_legacy_indexes(self):
+        # Superseded by the (field, ts, _id) indexes above; dropped by the
+        # default names MongoDB gave them. The time-series collection
+        # reuses (field, ts) keys, so only standard storage is cleaned up.
+        for name in self.LEGACY_INDEXED_FIELDS:
+            try:
+                self._events.drop_index(f"{name}_1_ts_-1")
+            except Exception:
+                pass
+
+    def _choose_hint(self, query):
+        """Index for the most selective top-level equality in ``query``."""
+        for name in self.HINT_PRIORITY:
+            if self._layout.field(name) in query:
+                return self._index_keys(name)
+        return None
+
+    def _find(self, query, sort, events_col=None):
+        found = (events_col or self._events).find(query).sort(sort)
+        # Only the active collection is known to have the hinted indexes.
+        hint = self._choose_hint(query) if events_col is None else None
+        if hint is not None and callable(getattr(found, "hint", None)):
+            found = found.hint(hint)
+        return found
+
+    def _read_sources(self):
+        """``(collection, layout)`` pairs that hold live events.
+
+        Until the time-series migration completes, events it has not moved
+        yet are still in the standard collection and are read from there.
+        """
+        sources = [(self._events, self._layout)]
+        if self._migration is not None and not self._migration.complete:
+            sources.append((self._migration.source, StandardLayout()))
+        return sources
+
+    def _find_sources(self, sources, sort, query_args, cursor=None, **opts):
+        """Yield decoded events per source, each iterator in ``sort`` order.
+
+        ``opts`` takes ``skip``, ``limit`` and ``batch_size``.
+        """
+        for events_col, layout in sources:
+            query = self._build_query(layout=layout, **query_args)
+            if cursor:
+                operator = "$lt" if sort[0][1] < 0 else "$gt"
+                self._append_cursor_clause(query, cursor, operator)
+            found = self._find(
+                query, sort, None if events_col is self._events else events_col
+            )
+            for option in ("skip", "limit", "batch_size"):
+                value = opts.get(option)
+                if value and callable(getattr(found, option, None)):
+                    found = getattr(found, option)(int(value))
+            yield map(layout.from_doc, found)
+
+    @staticmethod
+    def _merge_sources(iterables, descending=False):
+        iterables = list(iterables)
+        if len(iterables) == 1:
+            return iterables[0]
+
+        def position(event):
+            return event["ts"], str(event.get("_id", ""))
+
+        def unique(events):
+            # A migration batch sits in both collections between its copy
+            # and its delete; the two copies are adjacent here.
+            last = None
+            for event in events:
+                if position(event) != last:
+                    yield event
+                last = position(event)
+
+        return unique(
+            heapq.merge(*iterables, key=position, reverse=descending)
+        )
+
+    def _apply_retention(self, retention_days):
+        """Keep expiry of raw events in line with ``retention_days``.
+
+        Zero disables expiry. Standard storage uses a TTL index on ``ts``
+        that is retuned in place with ``collMod`` instead of being rebuilt;
+        time-series collections carry the setting on the collection.
+        """
+        expire_after = int(retention_days * 86400)
+        if self._layout.timeseries:
+            try:
+                self._events.database.command(
+                    "collMod",
+                    self._events.name,
+                    expireAfterSeconds=expire_after if expire_after else "off",
+                )
+            except OperationFailure:
+                logger.exception("Failed to update audit retention")
+            return
+        if retention_days <= 0:
+            try:
+                self._events.drop_index(self.TTL_INDEX_NAME)
+            except Exception:
+                pass
+            return
+        try:
+            self._events.create_index(
+                [("ts", 1)],
+                name=self.TTL_INDEX_NAME,
+                expireAfterSeconds=expire_after,
+            )
+        except OperationFailure:
+            self._events.database.command(
+                "collMod",
+                self._events.name,
+                index={
+                    "name": self.TTL_INDEX_NAME,
+                    "expireAfterSeconds": expire_after,
+                },
+            )
 
     def write_event(self, event: dict):
         payload = {
             "ts": datetime.now(timezone.utc),
             **event,
         }
-        self._events.insert_one(payload)
+        admitted = self._policies.admit(payload)
+        if admitted is not None:
+            self._writer.submit(admitted)
+
+    def flush(self):
+        # Open collapse windows stay open; closed ones are written first.
+        self._policies.flush_closed()
+        return self._writer.flush()
+
+    def policy_stats(self):
+        return self._policies.stats()
+
+    def writer_stats(self):
+        return self._writer.stats()
+
+    def identity_stats(self):
+        return self._identity.stats() if self._identity else None
+
+    def storage_stats(self):
+        archive = self._archive.stats() if self._archive else None
+        if not self._layout.timeseries:
+            return {"mode": "standard", "archive": archive}
+        return {
+            "mode": "timeseries",
+            "dictionarySize": len(self._layout._dictionary),
+            "migration": self._migration.stats() if self._migration else None,
+            "archive": archive,
+        }
+
+    def archive_events(self, now=None):
+        """Run one archival pass now; returns the number of events moved."""
+        if self._archive is None:
+            return 0
+        self.flush()
+        return self._archive.run_once(now)
+
+    def _archived_events(self, filters, since=None, until=None, **bounds):
+        if self._archive is None:
+            return iter(())
+        return self._archive.iter_events(
+            filters, since=since, until=until, **bounds
+        )
+
+    def route_stats(
+        self,
+        since,
+        until,
+        project_slug=None,
+        project_id=None,
+        limit=50,
+    ):
+        """Latency percentiles, throughput and error rate per route."""
+        rows = []
+        for events_col, layout in self._read_sources():
+            query = self._build_query(
+                project_slug=project_slug,
+                since=since,
+                until=until,
+                project_id=project_id,
+                canonical=self._ids_are_canonical(),
+                layout=layout,
+            )
+            for row in events_col.aggregate(route_latency_pipeline(query)):
+                for name in ("action", "method"):
+                    row["_id"][name] = layout.decode_value(
+                        name, row["_id"].get(name)
+                    )
+                rows.append(row)
+        routes = summarize_routes(rows, (until - since).total_seconds())
+        return {
+            "since": since,
+            "until": until,
+            "routes": routes[: max(1, int(limit))],
+            "total_routes": len(routes),
+        }
+
+    def _ids_are_canonical(self):
+        return self._identity is not None and self._identity.complete
+
+    def query_rollups(self, **filters):
+        if self._rollups is None:
+            return []
+        return self._rollups.query(**filters)
+
+    @staticmethod
+    def encode_cursor(event):
+        """Encode the ``(ts, _id)`` position of ``event`` opaquely."""
+        event_id = event.get("_id")
+        is_oid = isinstance(event_id, ObjectId)
+        payload = {
+            "ts": event["ts"].isoformat(),
+            "id": str(event_id) if is_oid else event_id,
+            "oid": is_oid,
+        }
+        raw = json.dumps(payload, separators=(",", ":")).encode()
+        return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
 
     @staticmethod
+    def decode_cursor(cursor):
+        """Return ``(ts, _id)`` for a cursor; raises ``ValueError``."""
+        try:
+            padding = "=" * (-len(cursor) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(cursor + padding))
+            ts = datetime.fromisoformat(payload["ts"])
+            event_id = payload["id"]
+            if payload.get("oid"):
+                event_id = ObjectId(event_id)
+        except Exception as exc:
+            raise ValueError("Invalid cursor") from exc
+        return ts, event_id
+
+    @staticmethod
+    def _scope_clause(slug_field, slug, id_field, id_value, canonical=False):
+        if canonical and id_value is not None:
+            return {id_field: id_value}
+        if slug is not None and id_value is not None:
+            return {"$or": [{slug_field: slug}, {id_field: id_value}]}
+        if slug is not None:
+            return {slug_field: slug}
+        if id_value is not None:
+            return {id_field: id_value}
+        return None
+
     def _build_query(
+        self,
         project_slug=None,
         config_slug=None,
         since=None,
         project_id=None,
         config_id=None,
+        until=None,
+        canonical=False,
+        token_id=None,
+        actor_id=None,
+        action=None,
+        status_min=None,
+        status_max=None,
+        layout=None,
     ):
-        clauses = []
-        if project_slug is not None and project_id is not None:
-            clauses.append(
-                {
-                    "$or": [
-                        {"project_slug": project_slug},
-                        {"project_id": project_id},
-                    ]
-                }
-            )
-        elif project_slug is not None:
-            clauses.append({"project_slug": project_slug})
-        elif project_id is not None:
-            clauses.append({"project_id": project_id})
-        if config_slug is not None and config_id is not None:
-            clauses.append(
-                {
-                    "$or": [
-                        {"config_slug": config_slug},
-                        {"config_id": config_id},
-                    ]
-                }
+        """Build the event filter for a scope, attributes and window.
+
+        Until every event carries ids, a scope matches on slug or id. With
+        ``canonical`` a known id is the only predicate, which lets MongoDB
+        seek the ``(project_id, ts, _id)`` index and skip the sort.
+        """
+        layout = layout or self._layout
+        field = layout.field
+        clauses = [
+            clause
+            for clause in (
+                self._scope_clause(
+                    field("project_slug"),
+                    project_slug,
+                    field("project_id"),
+                    project_id,
+                    canonical,
+                ),
+                self._scope_clause(
+                    field("config_slug"),
+                    config_slug,
+                    field("config_id"),
+                    config_id,
+                    canonical,
+                ),
             )
-        elif config_slug is not None:
-            clauses.append({"config_slug": config_slug})
-        elif config_id is not None:
-            clauses.append({"config_id": config_id})
+            if clause is not None
+        ]
+        query = self._merge_clauses(clauses)
+        for name, value in (
+            ("token_id", token_id),
+            ("actor_id", actor_id),
+            ("action", action),
+        ):
+            if value is not None:
+                query[field(name)] = layout.filter_value(name, value)
+        for name, bounds in (
+            ("status_code", {"$gte": status_min, "$lte": status_max}),
+            ("ts", {"$gte": since, "$lt": until}),
+        ):
+            bounds = {op: v for op, v in bounds.items() if v is not None}
+            if bounds:
+                query[name] = bounds
+        return query
+
+    @staticmethod
+    def _merge_clauses(clauses):
+        # Plain equalities go top level where the hint planner sees them.
         query = {}
-        if clauses:
-            query["$and"] = clauses
-        if since is not None:
-            query["ts"] = {"$gte": since}
+        either = [clause for clause in clauses if "$or" in clause]
+        for clause in clauses:
+            if "$or" not in clause:
+                query.update(clause)
+        if len(either) == 1:
+            query.update(either[0])
+        elif either:
+            query["$and"] = either
         return query
 
+    @classmethod
+    def _append_cursor_clause(cls, query, cursor, operator):
+        """Restrict ``query`` to events on one side of ``cursor``."""
+        ts, event_id = cls.decode_cursor(cursor)
+        query.setdefault("$and", []).append(
+            {
+                "$or": [
+                    {"ts": {operator: ts}},
+                    {"ts": ts, "_id": {operator: event_id}},
+                ]
+            }
+        )
+
+    @staticmethod
+    def _public_event(event):
+        return sanitize_doc({k: v for k, v in event.items() if k != "_id"})
+
     def query_events(
         self,
         project_slug=None,
@@ -72,17 +724,25 @@ class AuditEvents:
         project_id=None,
         config_id=None,
     ):
-        query = self._build_query(
-            project_slug=project_slug,
-            config_slug=config_slug,
-            since=since,
-            project_id=project_id,
-            config_id=config_id,
-        )
-        events = list(
-            self._events.find(query, {"_id": 0}).sort("ts", -1).limit(limit)
+        query_args = {
+            "project_slug": project_slug,
+            "config_slug": config_slug,
+            "since": since,
+            "project_id": project_id,
+            "config_id": config_id,
+            "canonical": self._ids_are_canonical(),
+        }
+        found = self._find_sources(
+            self._read_sources(),
+            [("ts", -1), ("_id", -1)],
+            query_args,
+            limit=limit,
         )
-        return [sanitize_doc(event) for event in events]
+        events = self._merge_sources(found, descending=True)
+        return [
+            self._public_event(event)
+            for event in itertools.islice(events, limit)
+        ]
 
     def query_events_page(
         self,
@@ -93,30 +753,127 @@ class AuditEvents:
         page=1,
         project_id=None,
         config_id=None,
+        cursor=None,
+        **attribute_filters,
     ):
+        """Return one page of events, newest first.
+
+        With ``cursor`` (a ``next_cursor`` from a previous page) the page
+        starts right after that event using a ``(ts, _id)`` range seek, so
+        cost does not grow with depth; ``page`` is then ignored. Without
+        it the legacy ``page`` offset is used. ``token_id``, ``actor_id``,
+        ``action``, ``status_min`` and ``status_max`` narrow the result.
+
+        Once live events run out, cursor pages and the first page continue
+        into archived events; deeper offset pages only cover live events.
+        """
         normalized_limit = max(1, min(int(limit), 100))
         normalized_page = max(1, int(page))
-        skip = (normalized_page - 1) * normalized_limit
-
-        query = self._build_query(
-            project_slug=project_slug,
-            config_slug=config_slug,
-            since=since,
-            project_id=project_id,
-            config_id=config_id,
-        )
-        cursor = (
-            self._events.find(query, {"_id": 0})
-            .sort("ts", -1)
-            .skip(skip)
-            .limit(normalized_limit + 1)
-        )
-        docs = list(cursor)
+
+        filters = {
+            "project_slug": project_slug,
+            "config_slug": config_slug,
+            "project_id": project_id,
+            "config_id": config_id,
+            **attribute_filters,
+        }
+        skip = 0 if cursor else (normalized_page - 1) * normalized_limit
+        sources = self._read_sources()
+        # Offsets apply to the merged stream when more than one source is
+        # read, so each source then returns everything up to the page end.
+        source_skip = skip if len(sources) == 1 else 0
+        found = self._find_sources(
+            sources,
+            [("ts", -1), ("_id", -1)],
+            {
+                "since": since,
+                "canonical": self._ids_are_canonical(),
+                **filters,
+            },
+            cursor=cursor,
+            skip=source_skip,
+            limit=skip - source_skip + normalized_limit + 1,
+        )
+        docs = list(
+            itertools.islice(
+                self._merge_sources(found, descending=True),
+                skip - source_skip,
+                None,
+            )
+        )
+        wanted = normalized_limit + 1 - len(docs)
+        if self._archive is not None and wanted > 0 and not skip:
+            if docs:
+                before = (docs[-1]["ts"], docs[-1].get("_id"))
+            else:
+                before = self.decode_cursor(cursor) if cursor else None
+            archived = self._archived_events(
+                filters, since=since, before=before, descending=True
+            )
+            docs.extend(itertools.islice(archived, wanted))
         has_next = len(docs) > normalized_limit
         events = docs[:normalized_limit]
+        next_cursor = (
+            self.encode_cursor(events[-1]) if has_next and events else None
+        )
         return {
-            "events": [sanitize_doc(event) for event in events],
-            "page": normalized_page,
+            "events": [self._public_event(event) for event in events],
+            "page": None if cursor else normalized_page,
             "limit": normalized_limit,
             "has_next": has_next,
+            "next_cursor": next_cursor,
         }
+
+    def export_events(
+        self,
+        project_slug=None,
+        config_slug=None,
+        since=None,
+        until=None,
+        project_id=None,
+        config_id=None,
+        cursor=None,
+        batch_size=EXPORT_BATCH_SIZE,
+        **attribute_filters,
+    ):
+        """Yield matching events oldest first from a single cursor.
+
+        Each event carries a ``cursor`` marking its position; passing the
+        last one received resumes the export right after it. Raises
+        ``ValueError`` for a malformed cursor before anything is yielded.
+        Archived events in the window are streamed ahead of live ones.
+        """
+        filters = {
+            "project_slug": project_slug,
+            "config_slug": config_slug,
+            "project_id": project_id,
+            "config_id": config_id,
+            **attribute_filters,
+        }
+        after = self.decode_cursor(cursor) if cursor else None
+        found = self._find_sources(
+            self._read_sources(),
+            [("ts", 1), ("_id", 1)],
+            {
+                "since": since,
+                "until": until,
+                "canonical": self._ids_are_canonical(),
+                **filters,
+            },
+            cursor=cursor,
+            batch_size=max(1, int(batch_size)),
+        )
+        archived = self._archived_events(
+            filters, since=since, until=until, after=after
+        )
+        return itertools.chain(
+            self._iter_export(archived),
+            self._iter_export(self._merge_sources(found)),
+        )
+
+    def _iter_export(self, found):
+        for event in found:
+            yield {
+                **self._public_event(event),
+                "cursor": self.encode_cursor(event),
+            }
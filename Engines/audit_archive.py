@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""Archive old audit events to compressed NDJSON files on local disk.
+
+Events older than the threshold are written oldest first into
+``<root>/YYYY/MM/DD/part-NNNNN.ndjson.<ext>`` files, one file per day per
+batch, and deleted from MongoDB once the file and ``manifest.json`` are on
+disk. The manifest records each file's time range so readers only open
+files that overlap the requested window, and the ``(ts, _id)`` position of
+the last archived event so a batch whose delete did not finish is removed,
+not archived twice.
+"""
+
+import gzip
+import json
+import os
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+from loguru import logger
+
+from Api.serialization import sanitize_doc
+from Engines.background import PeriodicWorker
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+MANIFEST_NAME = "manifest.json"
+CODEC_EXTENSIONS = {"gzip": "gz", "zstd": "zst"}
+
+
+def _compress(codec, data):
+    if codec == "zstd":
+        return zstandard.ZstdCompressor().compress(data)
+    return gzip.compress(data)
+
+
+def _decompress(codec, data):
+    if codec == "zstd":
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+def _parse_ts(value):
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def _as_utc(value):
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def _position(event):
+    """Sort key for ``(ts, _id)`` that tolerates mixed id types."""
+    event_id = event.get("_id")
+    return (_as_utc(event["ts"]), str(event_id) if event_id else "")
+
+
+def _write_atomic(path, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as handle:
+        handle.write(data)
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(tmp_path, path)
+
+
+def archived_event_matches(event, filters):
+    """Apply the audit query filters to one archived event in memory."""
+    for slug_field, id_field in (
+        ("project_slug", "project_id"),
+        ("config_slug", "config_id"),
+    ):
+        wanted = {
+            filters.get(slug_field): slug_field,
+            filters.get(id_field): id_field,
+        }
+        wanted.pop(None, None)
+        if wanted and not any(
+            event.get(field) == value for value, field in wanted.items()
+        ):
+            return False
+    for name in ("token_id", "actor_id", "action"):
+        if filters.get(name) is not None and event.get(name) != filters[name]:
+            return False
+    status = event.get("status_code")
+    if filters.get("status_min") is not None and (
+        status is None or status < filters["status_min"]
+    ):
+        return False
+    if filters.get("status_max") is not None and (
+        status is None or status > filters["status_max"]
+    ):
+        return False
+    return True
+
+
+class AuditArchive:
+    AFTER_DAYS = 90
+    CODEC = "gzip"
+    BATCH_SIZE = 10000
+    INTERVAL_SECONDS = 3600
+
+    def __init__(
+        self,
+        events_col,
+        directory,
+        layout,
+        after_days=AFTER_DAYS,
+        codec=CODEC,
+        batch_size=BATCH_SIZE,
+        interval_seconds=INTERVAL_SECONDS,
+        max_batches=100,
+    ):
+        self._events = events_col
+        self._root = directory
+        self._layout = layout
+        self._after = timedelta(days=max(0.0, float(after_days)))
+        codec = str(codec or "").strip().lower()
+        if codec == "zstd" and zstandard is None:
+            logger.warning("zstandard is not installed; archiving with gzip")
+            codec = "gzip"
+        self._codec = codec if codec in CODEC_EXTENSIONS else "gzip"
+        self._batch_size = max(1, int(batch_size))
+        self._max_batches = max(1, int(max_batches))
+        self._lock = threading.Lock()
+        self._worker = PeriodicWorker(
+            "ssm-audit-archive", interval_seconds, self.run_once
+        )
+        os.makedirs(self._root, exist_ok=True)
+        self._manifest = self._load_manifest()
+        self.archived = 0
+
+    def _load_manifest(self):
+        path = os.path.join(self._root, MANIFEST_NAME)
+        if not os.path.exists(path):
+            return {"files": [], "archived_until": None}
+        with open(path, encoding="utf-8") as handle:
+            return json.load(handle)
+
+    def _save_manifest(self):
+        data = json.dumps(self._manifest, indent=1, sort_keys=True)
+        _write_atomic(
+            os.path.join(self._root, MANIFEST_NAME), data.encode("utf-8")
+        )
+
+    def _archived_through(self):
+        mark = self._manifest.get("archived_through")
+        if not mark:
+            return None
+        event_id = mark["_id"]
+        if ObjectId.is_valid(event_id):
+            event_id = ObjectId(event_id)
+        return _parse_ts(mark["ts"]), event_id
+
+    def _delete_through(self, mark):
+        ts, event_id = mark
+        self._events.delete_many(
+            {
+                "$or": [
+                    {"ts": {"$lt": ts}},
+                    {"ts": ts, "_id": {"$lte": event_id}},
+                ]
+            }
+        )
+
+    @property
+    def archived_until(self):
+        value = self._manifest.get("archived_until")
+        return _parse_ts(value) if value else None
+
+    def start(self):
+        self._worker.start()
+
+    def stop(self):
+        self._worker.stop(flush=False)
+
+    def _write_day(self, day, events):
+        relative_dir = day.strftime("%Y/%m/%d")
+        directory = os.path.join(self._root, relative_dir)
+        os.makedirs(directory, exist_ok=True)
+        part = sum(
+            1
+            for entry in self._manifest["files"]
+            if entry["path"].startswith(relative_dir)
+        )
+        name = f"part-{part:05d}.ndjson.{CODEC_EXTENSIONS[self._codec]}"
+        lines = b"".join(
+            json.dumps(sanitize_doc(event), separators=(",", ":")).encode()
+            + b"\n"
+            for event in events
+        )
+        _write_atomic(
+            os.path.join(directory, name), _compress(self._codec, lines)
+        )
+        return {
+            "path": f"{relative_dir}/{name}",
+            "codec": self._codec,
+            "count": len(events),
+            "start": sanitize_doc(events[0]["ts"]),
+            "end": sanitize_doc(events[-1]["ts"]),
+        }
+
+    def archive_batch(self, cutoff):
+        """Archive and delete one batch older than ``cutoff``."""
+        mark = self._archived_through()
+        if mark is not None:
+            # Rows up to the mark are already archived; they are only still
+            # here if the last delete failed or the process died before it.
+            self._delete_through(mark)
+        docs = list(
+            self._events.find({"ts": {"$lt": cutoff}})
+            .sort([("ts", 1), ("_id", 1)])
+            .limit(self._batch_size)
+        )
+        if not docs:
+            return 0
+        by_day = defaultdict(list)
+        for doc in docs:
+            event = self._layout.from_doc(doc)
+            by_day[_as_utc(event["ts"]).date()].append(event)
+        with self._lock:
+            for day, events in sorted(by_day.items()):
+                self._manifest["files"].append(self._write_day(day, events))
+            self._manifest["archived_through"] = sanitize_doc(
+                {"ts": docs[-1]["ts"], "_id": docs[-1]["_id"]}
+            )
+            self._save_manifest()
+        # Deleted only after the files and manifest are durable; if this
+        # fails, the next batch removes the rows instead of re-archiving.
+        self._events.delete_many({"_id": {"$in": [d["_id"] for d in docs]}})
+        self.archived += len(docs)
+        return len(docs)
+
+    def run_once(self, now=None):
+        now = now or datetime.now(timezone.utc)
+        cutoff = now - self._after
+        total = 0
+        for _ in range(self._max_batches):
+            moved = self.archive_batch(cutoff)
+            total += moved
+            if moved < self._batch_size:
+                with self._lock:
+                    self._manifest["archived_until"] = sanitize_doc(cutoff)
+                    self._save_manifest()
+                break
+        return total
+
+    def _entries(self, since, until, descending):
+        with self._lock:
+            entries = list(self._manifest["files"])
+        selected = [
+            entry
+            for entry in entries
+            if (since is None or _parse_ts(entry["end"]) >= since)
+            and (until is None or _parse_ts(entry["start"]) < until)
+        ]
+        selected.sort(
+            key=lambda entry: (entry["start"], entry["path"]),
+            reverse=descending,
+        )
+        return selected
+
+    def _read(self, entry):
+        with open(os.path.join(self._root, entry["path"]), "rb") as handle:
+            data = _decompress(entry["codec"], handle.read())
+        for line in data.splitlines():
+            event = json.loads(line)
+            event["ts"] = _parse_ts(event["ts"])
+            if ObjectId.is_valid(event.get("_id")):
+                event["_id"] = ObjectId(event["_id"])
+            yield event
+
+    def iter_events(
+        self,
+        filters,
+        since=None,
+        until=None,
+        after=None,
+        before=None,
+        descending=False,
+    ):
+        """Yield archived events in ``(ts, _id)`` order.
+
+        ``after``/``before`` are ``(ts, _id)`` positions that bound the
+        walk exclusively, as pagination cursors do. One file is held in
+        memory at a time.
+        """
+        after_key = (
+            _position({"ts": after[0], "_id": after[1]}) if after else None
+        )
+        before_key = (
+            _position({"ts": before[0], "_id": before[1]}) if before else None
+        )
+        for entry in self._entries(since, until, descending):
+            events = [
+                event
+                for event in self._read(entry)
+                if (since is None or event["ts"] >= since)
+                and (until is None or event["ts"] < until)
+                and (after_key is None or _position(event) > after_key)
+                and (before_key is None or _position(event) < before_key)
+                and archived_event_matches(event, filters)
+            ]
+            events.sort(key=_position, reverse=descending)
+            yield from events
+
+    def stats(self):
+        with self._lock:
+            files = list(self._manifest["files"])
+        return {
+            "files": len(files),
+            "events": sum(entry["count"] for entry in files),
+            "archivedUntil": self._manifest.get("archived_until"),
+            "archivedThisProcess": self.archived,
+            "codec": self._codec,
+        }
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""Canonical project and config ids on audit events."""
+
+from collections import defaultdict
+
+from Api.serialization import oid_to_str
+from Engines.background import PeriodicWorker
+from Engines.caching import TTLCache
+
+
+class AuditIdentity:
+    """Resolve audit event slugs to ``project_id`` and ``config_id``.
+
+    ``annotate`` fills the ids in on every batch before it is written and
+    ``backfill_batch`` does the same for documents written before ids were
+    recorded. Once no event lacks a ``project_id`` field, ``complete`` is
+    true and queries can filter on ids alone.
+    """
+
+    CACHE_TTL_SECONDS = 300
+    CACHE_MAX_ENTRIES = 4096
+    BACKFILL_BATCH_SIZE = 500
+    BACKFILL_INTERVAL_SECONDS = 5.0
+
+    def __init__(
+        self,
+        events_col,
+        projects_engine,
+        configs_engine,
+        batch_size=BACKFILL_BATCH_SIZE,
+        interval_seconds=BACKFILL_INTERVAL_SECONDS,
+    ):
+        self._events = events_col
+        self._projects = projects_engine
+        self._configs = configs_engine
+        self._batch_size = max(1, int(batch_size))
+        self._cache = TTLCache(
+            max_entries=self.CACHE_MAX_ENTRIES,
+            ttl_seconds=self.CACHE_TTL_SECONDS,
+        )
+        self._worker = PeriodicWorker(
+            "ssm-audit-identity-backfill", interval_seconds, self.backfill_once
+        )
+        self.complete = False
+        self.backfilled = 0
+
+    def lookup(self, project_slug, config_slug=None):
+        """Return ``(project_id, config_id)`` as strings, or ``None``s."""
+        if project_slug is None:
+            return None, None
+        key = (project_slug, config_slug)
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+        project = self._projects.get_by_slug(project_slug)
+        project_id = project["_id"] if project else None
+        config = None
+        if project_id is not None and config_slug is not None:
+            config = self._configs.get_by_slug(project_id, config_slug)
+        resolved = (
+            oid_to_str(project_id),
+            oid_to_str(config["_id"]) if config else None,
+        )
+        self._cache.set(key, resolved)
+        return resolved
+
+    def annotate(self, events):
+        for event in events:
+            if event.get("project_id") is not None:
+                event.setdefault("config_id", None)
+                continue
+            project_id, config_id = self.lookup(
+                event.get("project_slug"), event.get("config_slug")
+            )
+            event["project_id"] = project_id
+            if event.get("config_id") is None:
+                event["config_id"] = config_id
+
+    def backfill_once(self):
+        """Add ids to one batch of legacy events; returns how many."""
+        docs = list(
+            self._events.find(
+                {"project_id": {"$exists": False}},
+                {"project_slug": 1, "config_slug": 1, "config_id": 1},
+            ).limit(self._batch_size)
+        )
+        if not docs:
+            self.complete = True
+            self._worker.stop(flush=False)
+            return 0
+        groups = defaultdict(list)
+        for doc in docs:
+            key = (
+                doc.get("project_slug"),
+                doc.get("config_slug"),
+                doc.get("config_id") is not None,
+            )
+            groups[key].append(doc["_id"])
+        for (project_slug, config_slug, has_config_id), ids in groups.items():
+            project_id, config_id = self.lookup(project_slug, config_slug)
+            update = {"project_id": project_id}
+            if not has_config_id:
+                update["config_id"] = config_id
+            self._events.update_many({"_id": {"$in": ids}}, {"$set": update})
+        self.backfilled += len(docs)
+        return len(docs)
+
+    def start_backfill(self):
+        if self._events.find_one({"project_id": {"$exists": False}}) is None:
+            self.complete = True
+            return
+        self._worker.start()
+
+    def stats(self):
+        return {
+            "complete": self.complete,
+            "backfilled": self.backfilled,
+            "cache": self._cache.stats(),
+        }
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""Per-action recording policies for high-volume audit events."""
+
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from loguru import logger
+
+from Engines.background import PeriodicWorker, on_shutdown
+
+COLLAPSE_KEY_FIELDS = (
+    "action",
+    "actor_type",
+    "actor_id",
+    "token_id",
+    "project_slug",
+    "config_slug",
+    "key",
+    "status_code",
+)
+
+
+def event_weight(event):
+    """How many requests one stored event stands for."""
+    return int(event.get("count") or event.get("sample_rate") or 1)
+
+
+def parse_policies(spec):
+    """Parse ``action=all|sample:N|collapse:SECONDS`` pairs.
+
+    Pairs are comma separated. Only ``*.read`` actions accept a policy
+    other than ``all``; anything else is logged and ignored.
+    """
+    policies = {}
+    for item in (spec or "").split(","):
+        if not item.strip():
+            continue
+        action, _, rule = item.partition("=")
+        action = action.strip()
+        mode, _, value = rule.strip().lower().partition(":")
+        try:
+            amount = float(value) if value else 0.0
+        except ValueError:
+            amount = 0.0
+        if mode == "all":
+            policies[action] = ("all", 0)
+        elif not action.endswith(".read"):
+            logger.warning(f"Audit policy for {action!r} ignored: not a read")
+        elif mode == "sample" and amount >= 1:
+            policies[action] = ("sample", int(amount))
+        elif mode == "collapse" and amount > 0:
+            policies[action] = ("collapse", amount)
+        else:
+            logger.warning(f"Invalid audit policy {item.strip()!r} ignored")
+    return policies
+
+
+class AuditPolicies:
+    """Decide which audit events are recorded and in what form.
+
+    ``sample:N`` keeps one event in N per action and marks it with
+    ``sample_rate``. ``collapse:S`` folds identical reads (same actor,
+    token, project, config, key and status) seen within S seconds of the
+    first one into a single event with ``count``, ``window_start`` and
+    ``window_end``, written once the window closes. Failed requests and
+    actions without a policy are always recorded as they are.
+    """
+
+    def __init__(self, spec, emit, clock=None):
+        self._policies = parse_policies(spec)
+        self._emit = emit
+        self._clock = clock or time.time
+        self._seen = {}
+        self._open = {}
+        self._lock = threading.Lock()
+        windows = [
+            value
+            for mode, value in self._policies.values()
+            if mode == "collapse"
+        ]
+        self._worker = PeriodicWorker(
+            "ssm-audit-collapse",
+            min(windows) if windows else 0,
+            self.flush_closed,
+        )
+        if windows:
+            on_shutdown(self.flush)
+        self.sampled_out = 0
+        self.collapsed = 0
+
+    @property
+    def policies(self):
+        return dict(self._policies)
+
+    def admit(self, event):
+        """Return the event to record now, or ``None`` to hold it back."""
+        mode, value = self._policies.get(event.get("action"), ("all", 0))
+        if mode == "all" or int(event.get("status_code") or 200) >= 400:
+            return event
+        if mode == "sample":
+            return self._sample(event, value)
+        self._collapse(event, value)
+        return None
+
+    def _sample(self, event, rate):
+        with self._lock:
+            seen = self._seen.get(event["action"], 0)
+            self._seen[event["action"]] = seen + 1
+        if seen % rate:
+            self.sampled_out += 1
+            return None
+        return {**event, "sample_rate": rate}
+
+    def _collapse(self, event, window):
+        key = tuple(event.get(field) for field in COLLAPSE_KEY_FIELDS)
+        now = self._clock()
+        expired = None
+        with self._lock:
+            entry = self._open.get(key)
+            if entry is not None and now >= entry["deadline"]:
+                expired = self._open.pop(key)
+                entry = None
+            if entry is None:
+                self._open[key] = {
+                    "event": event,
+                    "count": 1,
+                    "latency_ms": int(event.get("latency_ms") or 0),
+                    "deadline": now + window,
+                    "window": window,
+                }
+            else:
+                entry["count"] += 1
+                entry["latency_ms"] += int(event.get("latency_ms") or 0)
+                self.collapsed += 1
+        if expired is not None:
+            self._write(expired)
+        self._worker.start()
+
+    def _write(self, entry):
+        event = entry["event"]
+        start = event.get("ts") or datetime.now(timezone.utc)
+        try:
+            self._emit(
+                {
+                    **event,
+                    "count": entry["count"],
+                    # Mean latency, so latency_ms * count stays the total.
+                    "latency_ms": entry["latency_ms"] // entry["count"],
+                    "window_start": start,
+                    "window_end": start + timedelta(seconds=entry["window"]),
+                }
+            )
+        except Exception:
+            logger.exception("Failed to write collapsed audit event")
+
+    def flush(self, closed_only=False):
+        now = self._clock()
+        with self._lock:
+            keys = [
+                key
+                for key, entry in self._open.items()
+                if not closed_only or now >= entry["deadline"]
+            ]
+            ready = [self._open.pop(key) for key in keys]
+        for entry in ready:
+            self._write(entry)
+        return len(ready)
+
+    def flush_closed(self):
+        return self.flush(closed_only=True)
+
+    def stats(self):
+        with self._lock:
+            open_windows = len(self._open)
+        return {
+            "policies": {
+                action: f"{mode}:{value:g}" if value else mode
+                for action, (mode, value) in self._policies.items()
+            },
+            "openWindows": open_windows,
+            "sampledOut": self.sampled_out,
+            "collapsed": self.collapsed,
+        }
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""Hourly audit counters maintained alongside raw audit events."""
+
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+from pymongo import UpdateOne
+
+from Api.serialization import sanitize_doc
+from Engines.audit_policy import event_weight
+
+ROLLUP_KEY_FIELDS = (
+    "project_slug",
+    "config_slug",
+    "action",
+    "status_code",
+)
+
+
+def _as_utc(value):
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def _hour_of(ts):
+    return _as_utc(ts).replace(minute=0, second=0, microsecond=0)
+
+
+class AuditRollups:
+    """Per-(project, config, action, status, hour) counters.
+
+    Every written batch of raw events is folded into one ``$inc`` upsert per
+    bucket, so long-range questions read a handful of rollup documents
+    instead of scanning ``audit_events``.
+    """
+
+    GRANULARITIES = ("hour", "day")
+
+    def __init__(self, rollups_col):
+        self._rollups = rollups_col
+        self._rollups.create_index(
+            [("hour", 1), *[(field, 1) for field in ROLLUP_KEY_FIELDS]],
+            unique=True,
+        )
+        self._rollups.create_index([("project_slug", 1), ("hour", 1)])
+
+    @staticmethod
+    def _bucket_key(event):
+        ts = event.get("ts") or datetime.now(timezone.utc)
+        return (_hour_of(ts),) + tuple(
+            event.get(field) for field in ROLLUP_KEY_FIELDS
+        )
+
+    def record(self, events):
+        """Fold ``events`` into the hourly counters with one bulk write."""
+        buckets = defaultdict(lambda: {"count": 0, "latency": 0, "max": 0})
+        for event in events:
+            bucket = buckets[self._bucket_key(event)]
+            # Summarized and sampled events stand for several requests.
+            weight = event_weight(event)
+            bucket["count"] += weight
+            latency = int(event.get("latency_ms") or 0)
+            bucket["latency"] += latency * weight
+            bucket["max"] = max(bucket["max"], latency)
+        if not buckets:
+            return 0
+        operations = []
+        for key, bucket in buckets.items():
+            finder = {"hour": key[0], **dict(zip(ROLLUP_KEY_FIELDS, key[1:]))}
+            operations.append(
+                UpdateOne(
+                    finder,
+                    {
+                        "$inc": {
+                            "count": bucket["count"],
+                            "latency_ms_sum": bucket["latency"],
+                        },
+                        "$max": {"latency_ms_max": bucket["max"]},
+                    },
+                    upsert=True,
+                )
+            )
+        self._rollups.bulk_write(operations, ordered=False)
+        return len(operations)
+
+    @staticmethod
+    def _merge_days(rows):
+        merged = {}
+        for row in rows:
+            day = row["hour"].replace(hour=0)
+            key = (day,) + tuple(row.get(field) for field in ROLLUP_KEY_FIELDS)
+            current = merged.get(key)
+            if current is None:
+                merged[key] = {**row, "hour": day}
+                continue
+            current["count"] += row.get("count", 0)
+            current["latency_ms_sum"] += row.get("latency_ms_sum", 0)
+            current["latency_ms_max"] = max(
+                current.get("latency_ms_max", 0), row.get("latency_ms_max", 0)
+            )
+        return sorted(merged.values(), key=lambda row: row["hour"])
+
+    def query(
+        self,
+        project_slug=None,
+        config_slug=None,
+        action=None,
+        since=None,
+        until=None,
+        granularity="hour",
+    ):
+        if granularity not in self.GRANULARITIES:
+            raise ValueError("granularity must be hour or day")
+        query = {
+            field: value
+            for field, value in (
+                ("project_slug", project_slug),
+                ("config_slug", config_slug),
+                ("action", action),
+            )
+            if value is not None
+        }
+        hour_range = {}
+        if since is not None:
+            hour_range["$gte"] = _hour_of(since)
+        if until is not None:
+            hour_range["$lt"] = _as_utc(until)
+        if hour_range:
+            query["hour"] = hour_range
+        rows = [
+            {
+                "count": 0,
+                "latency_ms_sum": 0,
+                "latency_ms_max": 0,
+                **row,
+                "hour": _as_utc(row["hour"]),
+            }
+            for row in self._rollups.find(query, {"_id": 0}).sort("hour", 1)
+        ]
+        if granularity == "day":
+            rows = self._merge_days(rows)
+        for row in rows:
+            row["bucket_end"] = row["hour"] + (
+                timedelta(days=1)
+                if granularity == "day"
+                else timedelta(hours=1)
+            )
+            row["latency_ms_avg"] = (
+                row["latency_ms_sum"] / row["count"] if row["count"] else 0
+            )
+        return [sanitize_doc(row) for row in rows]
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""Per-route latency, throughput and error rate from audit events."""
+
+from collections import defaultdict
+
+PERCENTILES = (50, 95, 99)
+
+
+def route_latency_pipeline(query):
+    """Group matching events into a latency histogram per route and action.
+
+    Latencies are whole milliseconds, so grouping on the value keeps the
+    result small no matter how many events the window holds.
+    """
+    weight = {"$ifNull": ["$count", {"$ifNull": ["$sample_rate", 1]}]}
+    return [
+        {"$match": query},
+        {
+            "$group": {
+                "_id": {
+                    "route": {"$ifNull": ["$route", "$path"]},
+                    "method": "$method",
+                    "action": "$action",
+                    "latency_ms": "$latency_ms",
+                },
+                "count": {"$sum": weight},
+                "errors": {
+                    "$sum": {
+                        "$cond": [{"$gte": ["$status_code", 400]}, weight, 0]
+                    }
+                },
+            }
+        },
+    ]
+
+
+def _percentile(histogram, total, percentile):
+    """Nearest-rank percentile over ``(latency, count)`` pairs."""
+    rank = max(1, -(-total * percentile // 100))
+    seen = 0
+    for latency, count in histogram:
+        seen += count
+        if seen >= rank:
+            return latency
+    return histogram[-1][0] if histogram else None
+
+
+def summarize_routes(rows, window_seconds):
+    """Fold histogram rows into one stats entry per route and action."""
+    routes = defaultdict(
+        lambda: {"count": 0, "errors": 0, "histogram": defaultdict(int)}
+    )
+    for row in rows:
+        key = row["_id"]
+        entry = routes[
+            (key.get("route"), key.get("method"), key.get("action"))
+        ]
+        entry["count"] += row["count"]
+        entry["errors"] += row["errors"]
+        if key.get("latency_ms") is not None:
+            entry["histogram"][int(key["latency_ms"])] += row["count"]
+    window_seconds = max(1.0, float(window_seconds))
+    summary = []
+    for (route, method, action), entry in routes.items():
+        histogram = sorted(entry["histogram"].items())
+        timed = sum(count for _, count in histogram)
+        latency = {
+            f"p{percentile}": _percentile(histogram, timed, percentile)
+            for percentile in PERCENTILES
+        }
+        latency["max"] = histogram[-1][0] if histogram else None
+        summary.append(
+            {
+                "route": route,
+                "method": method,
+                "action": action,
+                "count": entry["count"],
+                "errors": entry["errors"],
+                "error_rate": entry["errors"] / entry["count"],
+                "throughput_per_minute": entry["count"] * 60 / window_seconds,
+                "latency_ms": latency,
+            }
+        )
+    summary.sort(key=lambda item: (-item["count"], str(item["route"])))
+    return summary
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""Storage layouts for audit events.
+
+``StandardLayout`` stores events as written. ``TimeSeriesLayout`` stores
+them in a MongoDB time-series collection, groups the project, config and
+actor fields under ``meta`` and replaces low-cardinality strings such as
+the action with small integer codes from ``AuditDictionary``. Both layouts
+hand the same logical event back to readers.
+"""
+
+import threading
+
+from loguru import logger
+from pymongo.errors import CollectionInvalid, DuplicateKeyError
+
+from Engines.background import PeriodicWorker
+
+STORAGE_MODES = ("standard", "timeseries")
+TIMESERIES_DELETE_MIN_VERSION = 7
+
+
+class StandardLayout:
+    timeseries = False
+
+    @staticmethod
+    def field(name):
+        return name
+
+    @staticmethod
+    def to_doc(event):
+        return event
+
+    @staticmethod
+    def from_doc(doc):
+        return doc
+
+    @staticmethod
+    def encode_value(_name, value):
+        return value
+
+    @staticmethod
+    def decode_value(_name, value):
+        return value
+
+    @staticmethod
+    def filter_value(_name, value):
+        return value
+
+
+class AuditDictionary:
+    """Two-way ``(kind, value) <-> code`` map persisted in MongoDB.
+
+    Codes are the documents' integer ``_id`` and are never reused, so a
+    code read back from an old event always decodes to its original value.
+    """
+
+    def __init__(self, dictionary_col):
+        self._col = dictionary_col
+        self._col.create_index([("kind", 1), ("value", 1)], unique=True)
+        self._codes = {}
+        self._values = {}
+        self._lock = threading.Lock()
+        for doc in self._col.find({}):
+            self._remember(doc)
+
+    def _remember(self, doc):
+        with self._lock:
+            self._codes[(doc["kind"], doc["value"])] = doc["_id"]
+            self._values[doc["_id"]] = doc["value"]
+        return doc["_id"]
+
+    def code(self, kind, value):
+        code = self._codes.get((kind, value))
+        if code is not None:
+            return code
+        while True:
+            existing = self._col.find_one({"kind": kind, "value": value})
+            if existing is not None:
+                return self._remember(existing)
+            last = self._col.find_one({}, sort=[("_id", -1)])
+            doc = {
+                "_id": (last["_id"] + 1) if last else 1,
+                "kind": kind,
+                "value": value,
+            }
+            try:
+                self._col.insert_one(doc)
+            except DuplicateKeyError:
+                # Another writer took this code or value first; re-read.
+                continue
+            return self._remember(doc)
+
+    def find_code(self, kind, value):
+        """Return the code for ``value`` without assigning a new one."""
+        code = self._codes.get((kind, value))
+        if code is not None:
+            return code
+        existing = self._col.find_one({"kind": kind, "value": value})
+        return self._remember(existing) if existing is not None else None
+
+    def value(self, code):
+        if code is None or code in self._values:
+            return self._values.get(code)
+        doc = self._col.find_one({"_id": code})
+        if doc is None:
+            return code
+        self._remember(doc)
+        return doc["value"]
+
+    def __len__(self):
+        return len(self._values)
+
+
+class TimeSeriesLayout:
+    META_FIELDS = (
+        "project_id",
+        "project_slug",
+        "config_id",
+        "config_slug",
+        "actor_type",
+        "actor_id",
+    )
+    # Only low-cardinality fields are encoded. Every new value costs a
+    # dictionary insert and stays in memory for the life of the process,
+    # so open-ended strings such as user agents are stored inline.
+    ENCODED_FIELDS = ("action", "method")
+    timeseries = True
+
+    def __init__(self, dictionary):
+        self._dictionary = dictionary
+
+    def field(self, name):
+        return f"meta.{name}" if name in self.META_FIELDS else name
+
+    def encode_value(self, name, value):
+        if name in self.ENCODED_FIELDS and value is not None:
+            return self._dictionary.code(name, value)
+        return value
+
+    def decode_value(self, name, value):
+        if name in self.ENCODED_FIELDS:
+            return self._dictionary.value(value)
+        return value
+
+    def filter_value(self, name, value):
+        if name not in self.ENCODED_FIELDS:
+            return value
+        code = self._dictionary.find_code(name, value)
+        # Codes start at 1, so an unknown value matches nothing.
+        return code if code is not None else 0
+
+    def to_doc(self, event):
+        # Meta keys keep one order so equal series share buckets.
+        doc = {
+            key: self.encode_value(key, value)
+            for key, value in event.items()
+            if key not in self.META_FIELDS
+        }
+        doc["meta"] = {
+            key: event[key] for key in self.META_FIELDS if key in event
+        }
+        return doc
+
+    def from_doc(self, doc):
+        event = {
+            key: self.decode_value(key, value)
+            for key, value in doc.items()
+            if key != "meta"
+        }
+        event.update(doc.get("meta") or {})
+        return event
+
+
+def supports_timeseries_deletes(database):
+    """Whether the server deletes time-series documents by any field.
+
+    MongoDB 7.0 is the first release whose time-series collections accept
+    ``delete_many`` filters outside the meta field, such as ``_id``. A
+    database handle without a client (as in tests) is assumed current.
+    """
+    server_info = getattr(
+        getattr(database, "client", None), "server_info", None
+    )
+    if not callable(server_info):
+        return True
+    try:
+        version = server_info().get("versionArray") or [0]
+    except Exception:
+        logger.exception("Failed to read the MongoDB server version")
+        return False
+    return int(version[0]) >= TIMESERIES_DELETE_MIN_VERSION
+
+
+def ensure_timeseries_collection(database, name, expire_after_seconds=None):
+    """Create ``name`` as a time-series collection on ``ts`` if missing."""
+    options = {
+        "timeseries": {
+            "timeField": "ts",
+            "metaField": "meta",
+            "granularity": "seconds",
+        }
+    }
+    if expire_after_seconds:
+        options["expireAfterSeconds"] = int(expire_after_seconds)
+    try:
+        database.create_collection(name, **options)
+    except CollectionInvalid:
+        pass
+    return database[name]
+
+
+class TimeSeriesMigration:
+    """Move events from the standard collection into the time-series one.
+
+    Each batch is copied oldest ``_id`` first with its original ``ts`` and
+    ``_id``, so pagination cursors stay valid, and is then deleted from the
+    source. Time-series collections have no unique ``_id`` index, so events
+    of a batch already in the target are skipped; a crash between the two
+    steps only leaves the delete to redo.
+    """
+
+    BATCH_SIZE = 1000
+    INTERVAL_SECONDS = 1.0
+
+    def __init__(
+        self,
+        source_col,
+        target_col,
+        layout,
+        prepare=None,
+        batch_size=BATCH_SIZE,
+        interval_seconds=INTERVAL_SECONDS,
+    ):
+        self._source = source_col
+        self._target = target_col
+        self._layout = layout
+        self._prepare = prepare
+        self._batch_size = max(1, int(batch_size))
+        self._worker = PeriodicWorker(
+            "ssm-audit-timeseries-migration", interval_seconds, self.run_once
+        )
+        self.complete = False
+        self.migrated = 0
+
+    @property
+    def source(self):
+        return self._source
+
+    def _copied_ids(self, docs):
+        """Ids of ``docs`` that an earlier, interrupted run already copied."""
+        timestamps = [doc["ts"] for doc in docs]
+        found = self._target.find(
+            {
+                "ts": {"$gte": min(timestamps), "$lte": max(timestamps)},
+                "_id": {"$in": [doc["_id"] for doc in docs]},
+            },
+            {"_id": 1},
+        )
+        return {doc["_id"] for doc in found}
+
+    def run_once(self):
+        docs = list(
+            self._source.find({}).sort("_id", 1).limit(self._batch_size)
+        )
+        if not docs:
+            if not self.complete:
+                logger.info(
+                    f"Audit time-series migration moved {self.migrated} events"
+                )
+            self.complete = True
+            self._worker.stop(flush=False)
+            return 0
+        copied = self._copied_ids(docs)
+        pending = [doc for doc in docs if doc["_id"] not in copied]
+        if pending and self._prepare is not None:
+            self._prepare(pending)
+        if pending:
+            self._target.insert_many(
+                [self._layout.to_doc(doc) for doc in pending], ordered=False
+            )
+        self._source.delete_many(
+            {"_id": {"$in": [doc["_id"] for doc in docs]}}
+        )
+        self.migrated += len(docs)
+        return len(docs)
+
+    def start(self):
+        if self._source.find_one({}) is None:
+            self.complete = True
+            return
+        self._worker.start()
+
+    def stats(self):
+        return {"complete": self.complete, "migrated": self.migrated}
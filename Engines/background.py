@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""Background helpers for periodic maintenance work."""
+
+import atexit
+import itertools
+import threading
+
+from loguru import logger
+
+# Shutdown stages: producers flush buffered events before the writers that
+# persist them stop.
+SHUTDOWN_PRODUCERS = 0
+SHUTDOWN_WRITERS = 1
+
+_shutdown_hooks: list = []
+_shutdown_lock = threading.Lock()
+_shutdown_registered = False
+_hook_ids = itertools.count()
+
+
+def on_shutdown(fn, stage=SHUTDOWN_PRODUCERS):
+    """Run ``fn`` on interpreter exit; lower stages run first.
+
+    Hooks of the same stage run in registration order. A single ``atexit``
+    handler drives them, so the order does not depend on when each
+    component happened to register.
+    """
+    global _shutdown_registered
+    with _shutdown_lock:
+        _shutdown_hooks.append((stage, next(_hook_ids), fn))
+        if not _shutdown_registered:
+            atexit.register(run_shutdown_hooks)
+            _shutdown_registered = True
+
+
+def run_shutdown_hooks():
+    while True:
+        with _shutdown_lock:
+            if not _shutdown_hooks:
+                return
+            entry = min(_shutdown_hooks, key=lambda hook: hook[:2])
+            _shutdown_hooks.remove(entry)
+        try:
+            entry[2]()
+        except Exception:
+            logger.exception("Shutdown hook failed")
+
+
+class PeriodicWorker:
+    """Run ``fn`` every ``interval_seconds`` on a daemon thread.
+
+    The thread is started lazily by ``start()``, which registers
+    ``shutdown()`` with ``on_shutdown``. Only workers created with
+    ``final_run`` (write-behind buffers with pending work) run ``fn`` one
+    last time on shutdown, so maintenance jobs do not add a full pass to
+    every exit.
+    """
+
+    def __init__(self, name, interval_seconds, fn, final_run=False):
+        self._name = name
+        self._interval = max(0.0, float(interval_seconds))
+        self._fn = fn
+        self._final_run = bool(final_run)
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._shutdown_registered = False
+        self.runs = 0
+        self.failures = 0
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self._interval <= 0 or self.running:
+            return
+        with self._lock:
+            if self.running:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._loop, name=self._name, daemon=True
+            )
+            self._thread.start()
+            if not self._shutdown_registered:
+                on_shutdown(self.shutdown)
+                self._shutdown_registered = True
+
+    def _loop(self):
+        while not self._stop.wait(self._interval):
+            self.run_once()
+
+    def run_once(self):
+        try:
+            result = self._fn()
+        except Exception:
+            self.failures += 1
+            logger.exception(f"{self._name} run failed")
+            return None
+        self.runs += 1
+        return result
+
+    def stop(self, flush=True):
+        thread = self._thread
+        self._stop.set()
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=max(1.0, self._interval))
+        self._thread = None
+        if flush:
+            self.run_once()
+
+    def shutdown(self):
+        """Stop on interpreter exit, running ``fn`` only if opted in."""
+        self.stop(flush=self._final_run)
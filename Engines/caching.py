@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""Small in-process caches shared across engines."""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after a TTL.
+
+    A ``ttl_seconds`` or ``max_entries`` of zero disables the cache; every
+    lookup is then a miss and nothing is stored.
+    """
+
+    def __init__(self, max_entries=1024, ttl_seconds=30, clock=None):
+        self._max_entries = max(0, int(max_entries))
+        self._ttl_seconds = max(0.0, float(ttl_seconds))
+        self._clock = clock or time.monotonic
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self):
+        return self._max_entries > 0 and self._ttl_seconds > 0
+
+    def get(self, key, default=None, is_valid=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            expires_at, value = entry
+            if expires_at <= self._clock() or (
+                is_valid is not None and not is_valid(value)
+            ):
+                del self._entries[key]
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl_seconds=None):
+        if not self.enabled:
+            return
+        ttl = self._ttl_seconds
+        if ttl_seconds is not None:
+            ttl = min(ttl, max(0.0, float(ttl_seconds)))
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (self._clock() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return None
+            self.invalidations += 1
+            return entry[1]
+
+    def pop_where(self, predicate):
+        with self._lock:
+            keys = [
+                key
+                for key, (_, value) in self._entries.items()
+                if predicate(key, value)
+            ]
+            for key in keys:
+                del self._entries[key]
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "size": len(self._entries),
+                "maxEntries": self._max_entries,
+                "ttlSeconds": self._ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hitRatio": (self.hits / lookups) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+class GenerationCounter:
+    """Monotonic counter used to invalidate caches derived from many writes.
+
+    Writers call ``bump()``; readers remember ``value`` alongside a cached
+    entry and treat the entry as stale once the value has moved on.
+    """
+
+    def __init__(self):
+        self._value = 0
+        self._lock = threading.Lock()
+
+    @property
+    def value(self):
+        return self._value
+
+    def bump(self):
+        with self._lock:
+            self._value += 1
+            return self._value
@@ -1,18 +1,41 @@
 #!/usr/bin/env python3
+import os
 from datetime import datetime, timezone
 
 from bson import ObjectId
 
 from Api.serialization import to_iso
+from Engines.background import PeriodicWorker
 from Engines.common import is_valid_slug
 
 
 class Configs:
+    ANCESTOR_BACKFILL_BATCH_SIZE = 500
+    ANCESTOR_BACKFILL_SECONDS = 5.0
+
     def __init__(self, configs_col):
         self._configs = configs_col
         self._configs.create_index(
             [("project_id", 1), ("slug", 1)], unique=True
         )
+        self._backfill_batch_size = max(
+            1,
+            int(
+                os.getenv(
+                    "CONFIG_ANCESTOR_BACKFILL_BATCH_SIZE",
+                    self.ANCESTOR_BACKFILL_BATCH_SIZE,
+                )
+            ),
+        )
+        self._backfill_worker = PeriodicWorker(
+            "ssm-config-ancestor-backfill",
+            os.getenv(
+                "CONFIG_ANCESTOR_BACKFILL_SECONDS",
+                self.ANCESTOR_BACKFILL_SECONDS,
+            ),
+            self.backfill_ancestor_ids,
+        )
+        self.ancestors_backfilled = 0
 
     def create(self, project_id, slug, name, parent_config_id=None):
         if not is_valid_slug(slug):
@@ -28,11 +51,18 @@ class Configs:
                 return "Parent config not found", 404
             if parent["project_id"] != project_id:
                 return "Parent config must belong to the same project", 400
+        ancestor_ids = []
+        if parent is not None:
+            parent_ancestor_ids = self.ancestor_ids(parent)
+            if parent_ancestor_ids is None:
+                return "Config inheritance cycle detected", 400
+            ancestor_ids = [*parent_ancestor_ids, parent["_id"]]
         payload = {
             "project_id": project_id,
             "slug": slug,
             "name": name or slug,
             "parent_config_id": parent_config_id,
+            "ancestor_ids": ancestor_ids,
             "created_at": datetime.now(timezone.utc),
         }
         try:
@@ -47,6 +77,76 @@ class Configs:
     def get_by_id(self, config_id):
         return self._configs.find_one({"_id": config_id})
 
+    def ancestor_ids(self, config):
+        """Return the config's ancestor ids, root first.
+
+        Configs created before ``ancestor_ids`` was stored have the path
+        walked on every call until ``backfill_ancestor_ids`` stores it;
+        reads never write. ``None`` means the chain is broken by a missing
+        parent or a cycle.
+        """
+        stored = config.get("ancestor_ids")
+        if stored is not None:
+            return list(stored)
+        ancestor_ids = []
+        visited = {config["_id"]}
+        current = config.get("parent_config_id")
+        while current is not None:
+            if current in visited:
+                return None
+            parent = self._configs.find_one(
+                {"_id": current}, {"parent_config_id": 1}
+            )
+            if parent is None:
+                return None
+            visited.add(current)
+            ancestor_ids.append(current)
+            current = parent.get("parent_config_id")
+        ancestor_ids.reverse()
+        return ancestor_ids
+
+    def backfill_ancestor_ids(self):
+        """Store ``ancestor_ids`` on one batch of legacy configs.
+
+        A broken chain is stored as ``None`` so the config leaves the
+        backlog and reads keep walking it. Returns how many were updated.
+        """
+        docs = list(
+            self._configs.find(
+                {"ancestor_ids": {"$exists": False}}, {"parent_config_id": 1}
+            ).limit(self._backfill_batch_size)
+        )
+        if not docs:
+            self._backfill_worker.stop(flush=False)
+            return 0
+        for doc in docs:
+            self._configs.update_one(
+                {"_id": doc["_id"]},
+                {"$set": {"ancestor_ids": self.ancestor_ids(doc)}},
+            )
+        self.ancestors_backfilled += len(docs)
+        return len(docs)
+
+    def start_ancestor_backfill(self):
+        if self._configs.find_one({"ancestor_ids": {"$exists": False}}):
+            self._backfill_worker.start()
+
+    def secrets_revisions(self, config_ids):
+        """Return each config's ``secrets_revision`` in the given order."""
+        docs = self._configs.find(
+            {"_id": {"$in": list(config_ids)}}, {"secrets_revision": 1}
+        )
+        by_id = {
+            doc["_id"]: int(doc.get("secrets_revision") or 0) for doc in docs
+        }
+        return [by_id.get(config_id, 0) for config_id in config_ids]
+
+    def bump_secrets_revision(self, config_ids):
+        self._configs.update_many(
+            {"_id": {"$in": list(config_ids)}},
+            {"$inc": {"secrets_revision": 1}},
+        )
+
     def list_ids(self, project_id):
         docs = self._configs.find({"project_id": project_id}, {"_id": 1})
         return [doc["_id"] for doc in docs if "_id" in doc]
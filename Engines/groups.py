@@ -3,6 +3,7 @@ from datetime import datetime, timezone
 
 from bson import ObjectId
 
+from Engines.caching import GenerationCounter
 from Engines.common import is_valid_slug
 
 SUPPORTED_MAPPING_PROVIDERS = ("manual",)
@@ -15,11 +16,13 @@ class Groups:
         group_members_col,
         group_mappings_col,
         memberships_engine=None,
+        authz_generation=None,
     ):
         self._groups = groups_col
         self._group_members = group_members_col
         self._group_mappings = group_mappings_col
         self._memberships = memberships_engine
+        self._authz_generation = authz_generation or GenerationCounter()
 
         self._groups.create_index(
             [("workspace_id", 1), ("slug", 1)], unique=True
@@ -70,6 +73,7 @@ class Groups:
             self._groups.insert_one(payload)
         except Exception:
             return None, "Group already exists", 400
+        self._authz_generation.bump()
         return payload, "OK", 201
 
     def update_group(
@@ -89,6 +93,7 @@ class Groups:
             updates["description"] = str(description).strip() or None
 
         self._groups.update_one({"_id": group["_id"]}, {"$set": updates})
+        self._authz_generation.bump()
         return self._get_by_slug(workspace_id, group_slug), "OK", 200
 
     def delete_group(self, workspace_id, group_slug):
@@ -109,6 +114,7 @@ class Groups:
             )
 
         self._groups.delete_one({"_id": group_id})
+        self._authz_generation.bump()
         return "OK", 200
 
     def list_group_members(self, workspace_id, group_id):
@@ -158,6 +164,7 @@ class Groups:
                 }
             )
 
+        self._authz_generation.bump()
         members = self.list_group_members(workspace_id, group_id)
         return members, "OK", 200
 
@@ -179,6 +186,7 @@ class Groups:
         self._group_members.delete_many(
             {"workspace_id": workspace_id, "username": username}
         )
+        self._authz_generation.bump()
 
     def list_group_mappings(self, workspace_id):
         return list(
@@ -211,6 +219,7 @@ class Groups:
             self._group_mappings.insert_one(payload)
         except Exception:
             return None, "Group mapping already exists", 400
+        self._authz_generation.bump()
         return payload, "OK", 201
 
     def delete_group_mapping(self, workspace_id, mapping_id):
@@ -224,4 +233,5 @@ class Groups:
         )
         if res.deleted_count == 0:
             return "Group mapping not found", 404
+        self._authz_generation.bump()
         return "OK", 200
@@ -3,15 +3,23 @@ from datetime import datetime, timezone
 
 from bson import ObjectId
 
+from Engines.caching import GenerationCounter
+
 WORKSPACE_ROLES = ("owner", "admin", "collaborator", "viewer")
 PROJECT_ROLES = ("admin", "collaborator", "viewer", "none")
 SUBJECT_TYPES = ("user", "group")
 
 
 class Memberships:
-    def __init__(self, workspace_memberships_col, project_memberships_col):
+    def __init__(
+        self,
+        workspace_memberships_col,
+        project_memberships_col,
+        authz_generation=None,
+    ):
         self._workspace_memberships = workspace_memberships_col
         self._project_memberships = project_memberships_col
+        self._authz_generation = authz_generation or GenerationCounter()
 
         self._workspace_memberships.create_index(
             [("workspace_id", 1), ("username", 1)], unique=True
@@ -79,6 +87,7 @@ class Memberships:
             },
             upsert=True,
         )
+        self._authz_generation.bump()
         return self.get_workspace_membership(workspace_id, username), "OK", 200
 
     def remove_workspace_membership(self, workspace_id, username):
@@ -87,6 +96,7 @@ class Memberships:
         )
         if res.deleted_count == 0:
             return "Membership not found", 404
+        self._authz_generation.bump()
         return "OK", 200
 
     def upsert_project_membership(
@@ -121,6 +131,7 @@ class Memberships:
             },
             upsert=True,
         )
+        self._authz_generation.bump()
         return (
             self._project_memberships.find_one(
                 {
@@ -147,6 +158,7 @@ class Memberships:
         )
         if res.deleted_count == 0:
             return "Membership not found", 404
+        self._authz_generation.bump()
         return "OK", 200
 
     def list_project_memberships(self, workspace_id, project_id):
@@ -195,3 +207,4 @@ class Memberships:
                 "subject_id": subject_id,
             }
         )
+        self._authz_generation.bump()
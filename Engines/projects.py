@@ -4,13 +4,17 @@ from datetime import datetime, timezone
 from bson import ObjectId
 
 from Api.serialization import to_iso
+from Engines.caching import GenerationCounter
 from Engines.common import is_valid_slug
 
 
 class Projects:
-    def __init__(self, projects_col, workspaces_engine=None):
+    def __init__(
+        self, projects_col, workspaces_engine=None, authz_generation=None
+    ):
         self._projects = projects_col
         self._workspaces = workspaces_engine
+        self._authz_generation = authz_generation or GenerationCounter()
         self._projects.create_index("slug", unique=True)
         self._projects.create_index("workspace_id")
 
@@ -34,6 +38,7 @@ class Projects:
             self._projects.insert_one(payload)
         except Exception:
             return "Project already exists", 400
+        self._authz_generation.bump()
         return payload, 201
 
     def get_by_id(self, project_id):
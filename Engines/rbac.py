@@ -1,6 +1,8 @@
 #!/usr/bin/env python3
+import os
 from collections import defaultdict
 
+from Engines.caching import GenerationCounter, TTLCache
 from Engines.memberships import PROJECT_ROLES, WORKSPACE_ROLES
 
 DEFAULT_WORKSPACE_ROLE = "viewer"
@@ -87,9 +89,21 @@ WORKSPACE_DEFAULT_SETTINGS = {
     "referencingEnabled": True,
 }
 
+# Collection names in the auth database, as wired in connection.py.
+AUTH_COLLECTIONS = {
+    "users": "users",
+    "workspaces": "workspaces",
+    "workspace_memberships": "workspace_memberships",
+    "project_memberships": "project_memberships",
+    "group_members": "group_members",
+    "system_state": "system_state",
+}
+
 
 class RBAC:
     ONBOARDING_DOC_ID = "bootstrap_state_v1"
+    ACTOR_CACHE_TTL_SECONDS = 300
+    ACTOR_CACHE_MAX_ENTRIES = 4096
 
     def __init__(
         self,
@@ -99,6 +113,10 @@ class RBAC:
         groups_engine,
         projects_engine,
         onboarding_state_col=None,
+        authz_generation=None,
+        auth_db=None,
+        workspace_slug="default",
+        projects_col=None,
     ):
         self._workspaces = workspaces_engine
         self._users = users_engine
@@ -106,6 +124,46 @@ class RBAC:
         self._groups = groups_engine
         self._projects = projects_engine
         self._onboarding_state = onboarding_state_col
+        self._auth_db = auth_db
+        self._workspace_slug = workspace_slug
+        # $lookup only reaches collections in the same database, so the
+        # snapshot joins projects only when they live next to auth data.
+        self._projects_lookup = (
+            projects_col.name
+            if projects_col is not None
+            and auth_db is not None
+            and getattr(projects_col.database, "name", None)
+            == getattr(auth_db, "name", None)
+            else None
+        )
+        # Every engine that can change a resolved actor bumps this counter,
+        # so cached contexts are only reused while nothing has changed. The
+        # TTL only bounds staleness from writes made outside this process.
+        self._authz_generation = authz_generation or GenerationCounter()
+        self._actor_cache = TTLCache(
+            max_entries=os.getenv(
+                "RBAC_ACTOR_CACHE_MAX_ENTRIES", self.ACTOR_CACHE_MAX_ENTRIES
+            ),
+            ttl_seconds=os.getenv(
+                "RBAC_ACTOR_CACHE_TTL_SECONDS", self.ACTOR_CACHE_TTL_SECONDS
+            ),
+        )
+        # workspace_id -> (generation, project ids) for owners and admins
+        # when projects cannot be joined into the snapshot.
+        self._workspace_projects = TTLCache(
+            max_entries=os.getenv(
+                "RBAC_ACTOR_CACHE_MAX_ENTRIES", self.ACTOR_CACHE_MAX_ENTRIES
+            ),
+            ttl_seconds=os.getenv(
+                "RBAC_ACTOR_CACHE_TTL_SECONDS", self.ACTOR_CACHE_TTL_SECONDS
+            ),
+        )
+
+    def cache_stats(self):
+        return {
+            **self._actor_cache.stats(),
+            "generation": self._authz_generation.value,
+        }
 
     def _bootstrap_owner_username(self):
         if self._onboarding_state is None:
@@ -162,6 +220,261 @@ class RBAC:
         )
         return workspace, self._users.get(username), membership
 
+    def _actor_snapshot_pipeline(self, username):
+        names = AUTH_COLLECTIONS
+        user = {"$literal": username}
+        in_workspace = {"$eq": ["$workspace_id", "$$workspace_id"]}
+        workspace_let = {"workspace_id": "$workspace._id"}
+        return [
+            {"$match": {"username": username}},
+            {"$limit": 1},
+            {
+                "$lookup": {
+                    "from": names["workspaces"],
+                    "pipeline": [
+                        {"$match": {"slug": self._workspace_slug}},
+                        {"$limit": 1},
+                    ],
+                    "as": "workspace",
+                }
+            },
+            {"$unwind": "$workspace"},
+            {
+                "$lookup": {
+                    "from": names["workspace_memberships"],
+                    "let": workspace_let,
+                    "pipeline": [
+                        {
+                            "$match": {
+                                "$expr": {
+                                    "$and": [
+                                        in_workspace,
+                                        {"$eq": ["$username", user]},
+                                    ]
+                                }
+                            }
+                        },
+                        {"$limit": 1},
+                    ],
+                    "as": "membership",
+                }
+            },
+            {
+                "$lookup": {
+                    "from": names["system_state"],
+                    "pipeline": [
+                        {"$match": {"_id": self.ONBOARDING_DOC_ID}},
+                        {"$project": {"initialized_by": 1}},
+                    ],
+                    "as": "onboarding",
+                }
+            },
+            {
+                "$lookup": {
+                    "from": names["group_members"],
+                    "let": workspace_let,
+                    "pipeline": [
+                        {
+                            "$match": {
+                                "$expr": {
+                                    "$and": [
+                                        in_workspace,
+                                        {"$eq": ["$username", user]},
+                                    ]
+                                }
+                            }
+                        },
+                        {"$project": {"_id": 0, "group_id": 1}},
+                    ],
+                    "as": "groups",
+                }
+            },
+            {
+                # Group ids may be stored as ObjectIds or strings on either
+                # side; match every representation, like the engine path.
+                "$addFields": {
+                    "group_ids": {
+                        "$concatArrays": [
+                            "$groups.group_id",
+                            {
+                                "$map": {
+                                    "input": "$groups.group_id",
+                                    "in": {"$toString": "$$this"},
+                                }
+                            },
+                            {
+                                "$map": {
+                                    "input": "$groups.group_id",
+                                    "in": {
+                                        "$convert": {
+                                            "input": "$$this",
+                                            "to": "objectId",
+                                            "onError": None,
+                                            "onNull": None,
+                                        }
+                                    },
+                                }
+                            },
+                        ]
+                    }
+                }
+            },
+            {
+                "$lookup": {
+                    "from": names["project_memberships"],
+                    "let": {
+                        "workspace_id": "$workspace._id",
+                        "group_ids": "$group_ids",
+                    },
+                    "pipeline": [
+                        {
+                            "$match": {
+                                "$expr": {
+                                    "$and": [
+                                        in_workspace,
+                                        {
+                                            "$or": [
+                                                {
+                                                    "$and": [
+                                                        {
+                                                            "$eq": [
+                                                                "$subject_type",
+                                                                "user",
+                                                            ]
+                                                        },
+                                                        {
+                                                            "$eq": [
+                                                                "$subject_id",
+                                                                user,
+                                                            ]
+                                                        },
+                                                    ]
+                                                },
+                                                {
+                                                    "$and": [
+                                                        {
+                                                            "$eq": [
+                                                                "$subject_type",
+                                                                "group",
+                                                            ]
+                                                        },
+                                                        {
+                                                            "$in": [
+                                                                "$subject_id",
+                                                                "$$group_ids",
+                                                            ]
+                                                        },
+                                                    ]
+                                                },
+                                            ]
+                                        },
+                                    ]
+                                }
+                            }
+                        },
+                        {
+                            "$project": {
+                                "_id": 0,
+                                "project_id": 1,
+                                "project_role": 1,
+                            }
+                        },
+                    ],
+                    "as": "project_memberships",
+                }
+            },
+            *self._projects_lookup_stages(in_workspace),
+            {"$project": {"groups": 0, "group_ids": 0}},
+        ]
+
+    def _projects_lookup_stages(self, in_workspace):
+        """Join every workspace project, for owners and admins only."""
+        if self._projects_lookup is None:
+            return []
+        role = {"$arrayElemAt": ["$membership.workspace_role", 0]}
+        unassigned = {"$eq": [{"$type": "$workspace_id"}, "missing"]}
+        return [
+            {
+                "$lookup": {
+                    "from": self._projects_lookup,
+                    "let": {"workspace_id": "$workspace._id", "role": role},
+                    "pipeline": [
+                        {
+                            "$match": {
+                                "$expr": {
+                                    "$and": [
+                                        {
+                                            "$in": [
+                                                "$$role",
+                                                ["owner", "admin"],
+                                            ]
+                                        },
+                                        {"$or": [in_workspace, unassigned]},
+                                    ]
+                                }
+                            }
+                        },
+                        {"$sort": {"slug": 1}},
+                        {"$project": {"_id": 1}},
+                    ],
+                    "as": "projects",
+                }
+            }
+        ]
+
+    def _load_actor_snapshot(self, username):
+        """Load everything a resolved actor needs in one aggregation.
+
+        Returns ``None`` when the aggregation is unavailable or when the
+        user still needs a workspace membership written, in which case the
+        caller falls back to ``_ensure_user_workspace_membership``. The
+        workspace projects for owners and admins are ``None`` when they
+        could not be joined.
+        """
+        if self._auth_db is None:
+            return None
+        try:
+            docs = list(
+                self._auth_db[AUTH_COLLECTIONS["users"]].aggregate(
+                    self._actor_snapshot_pipeline(username)
+                )
+            )
+        except Exception:
+            return None
+        if not docs:
+            return None
+
+        doc = docs[0]
+        memberships = doc.pop("membership", None) or []
+        onboarding = doc.pop("onboarding", None) or []
+        workspace = doc.pop("workspace", None)
+        project_membership_docs = doc.pop("project_memberships", None) or []
+        # Only joined when projects share the auth database.
+        project_docs = (
+            doc.pop("projects", None) or []
+            if self._projects_lookup is not None
+            else None
+        )
+        if not workspace or not memberships:
+            return None
+
+        membership = memberships[0]
+        bootstrap_owner = (onboarding[0] if onboarding else {}).get(
+            "initialized_by"
+        )
+        if (
+            bootstrap_owner == username
+            and membership.get("workspace_role") != "owner"
+        ):
+            return None
+        return (
+            workspace,
+            doc,
+            membership,
+            project_membership_docs,
+            project_docs,
+        )
+
     @staticmethod
     def _project_role_max(current_role, new_role):
         if PROJECT_ROLE_RANK.get(new_role, 0) > PROJECT_ROLE_RANK.get(
@@ -175,7 +488,9 @@ class RBAC:
         docs = self._memberships.list_project_memberships_for_subjects(
             workspace_id, username, group_ids
         )
+        return self._project_roles_from_docs(docs)
 
+    def _project_roles_from_docs(self, docs):
         roles = defaultdict(lambda: "none")
         for doc in docs:
             project_id = doc.get("project_id")
@@ -190,9 +505,49 @@ class RBAC:
         return roles
 
     def resolve_personal_actor(self, username):
+        generation = self._authz_generation.value
+        cached = self._actor_cache.get(
+            username, is_valid=lambda entry: entry[0] == generation
+        )
+        if cached is not None:
+            return dict(cached[1])
+
+        context = self._resolve_personal_actor(username)
+        self._actor_cache.set(username, (generation, context))
+        return dict(context)
+
+    def _load_actor_state(self, username):
+        snapshot = self._load_actor_snapshot(username)
+        if snapshot is not None:
+            return snapshot
         workspace, user, membership = self._ensure_user_workspace_membership(
             username
         )
+        return workspace, user, membership, None, None
+
+    def _list_workspace_projects(self, workspace_id):
+        generation = self._authz_generation.value
+        key = str(workspace_id)
+        cached = self._workspace_projects.get(
+            key, is_valid=lambda entry: entry[0] == generation
+        )
+        if cached is not None:
+            return cached[1]
+        projects = [
+            {"_id": project.get("_id")}
+            for project in self._projects.list_docs(workspace_id=workspace_id)
+        ]
+        self._workspace_projects.set(key, (generation, projects))
+        return projects
+
+    def _resolve_personal_actor(self, username):
+        (
+            workspace,
+            user,
+            membership,
+            project_membership_docs,
+            project_docs,
+        ) = self._load_actor_state(username)
         if workspace is None or membership is None:
             return {
                 "workspace_id": None,
@@ -234,7 +589,11 @@ class RBAC:
             scopes.append({"actions": list(global_actions)})
 
         if workspace_role in ("owner", "admin"):
-            projects = self._projects.list_docs(workspace_id=workspace_id)
+            projects = (
+                self._list_workspace_projects(workspace_id)
+                if project_docs is None
+                else project_docs
+            )
             for project in projects:
                 project_id = project.get("_id")
                 if project_id is None:
@@ -243,7 +602,11 @@ class RBAC:
                 visible_project_ids.append(key)
                 project_roles[key] = "admin"
         else:
-            roles = self._project_roles_for_user(workspace_id, username)
+            roles = (
+                self._project_roles_for_user(workspace_id, username)
+                if project_membership_docs is None
+                else self._project_roles_from_docs(project_membership_docs)
+            )
             for project_id, project_role in roles.items():
                 actions = PROJECT_ROLE_ACTIONS.get(project_role) or []
                 if not actions:
@@ -1,7 +1,16 @@
 #!/usr/bin/env python3
+import hashlib
+import json
+import os
+import threading
 from datetime import datetime, timezone
 
+from loguru import logger
+from pymongo import UpdateMany, UpdateOne
+
 from Api.serialization import to_iso
+from Engines.background import PeriodicWorker
+from Engines.caching import TTLCache
 from Engines.common import is_valid_env_key
 from Engines.secret_icons import (
     normalize_icon_slug,
@@ -173,14 +182,187 @@ class _ConfigKeyComparisonService:
         }
 
 
+class _IconRepairQueue:
+    """Write icon slugs that exports had to resolve on the fly.
+
+    Exports never write; they queue the keys whose stored slug was missing
+    or inconsistent, and the queue applies them across the project in one
+    ``bulk_write`` per flush. Keys given a manual icon in the meantime are
+    left alone.
+    """
+
+    def __init__(self, secrets_col, project_config_ids, on_write, interval):
+        self._secrets = secrets_col
+        self._project_config_ids = project_config_ids
+        self._on_write = on_write
+        self._interval = max(0.0, float(interval))
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._worker = PeriodicWorker(
+            "ssm-secret-icon-repair",
+            self._interval,
+            self.flush,
+            final_run=True,
+        )
+        self.flushes = 0
+        self.repaired = 0
+
+    def record(self, config_id, key, icon_slug):
+        if self._interval <= 0:
+            return
+        with self._lock:
+            self._pending[(str(config_id), key)] = (config_id, key, icon_slug)
+        self._worker.start()
+
+    def _requeue(self, pending):
+        with self._lock:
+            for pending_key, item in pending.items():
+                self._pending.setdefault(pending_key, item)
+
+    def _operations(self, pending):
+        ids_by_config = {}
+        operations = []
+        for config_id, key, icon_slug in pending.values():
+            if str(config_id) not in ids_by_config:
+                ids_by_config[str(config_id)] = self._project_config_ids(
+                    config_id
+                )
+            operations.append(
+                (
+                    {
+                        "config_id": {"$in": ids_by_config[str(config_id)]},
+                        "key": key,
+                        "icon_source": {"$ne": SecretsV2.ICON_SOURCE_MANUAL},
+                    },
+                    {
+                        "$set": {
+                            "icon_slug": icon_slug,
+                            "icon_source": SecretsV2.ICON_SOURCE_AUTO,
+                        }
+                    },
+                )
+            )
+        touched = {
+            config_id
+            for config_ids in ids_by_config.values()
+            for config_id in config_ids
+        }
+        return operations, touched
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        try:
+            operations, touched = self._operations(pending)
+            bulk_write = getattr(self._secrets, "bulk_write", None)
+            if callable(bulk_write):
+                bulk_write(
+                    [
+                        UpdateMany(query, update)
+                        for query, update in operations
+                    ],
+                    ordered=False,
+                )
+            else:
+                for query, update in operations:
+                    self._secrets.update_many(query, update)
+        except Exception:
+            self._requeue(pending)
+            logger.exception("Failed to write repaired secret icon slugs")
+            return 0
+        self._on_write(touched)
+        self.flushes += 1
+        self.repaired += len(operations)
+        return len(operations)
+
+    def stats(self):
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            "intervalSeconds": self._interval,
+            "pending": pending,
+            "flushes": self.flushes,
+            "repaired": self.repaired,
+        }
+
+
 class SecretsV2:
     ICON_SOURCE_AUTO = "auto"
     ICON_SOURCE_MANUAL = "manual"
+    EXPORT_CACHE_MAX_ENTRIES = 256
+    EXPORT_CACHE_TTL_SECONDS = 300
+    ICON_REPAIR_SECONDS = 5
+    ETAG_VERSION = 2
+    BULK_MAX_KEYS = 1000
 
     def __init__(self, secrets_col, configs_engine):
         self._secrets = secrets_col
         self._configs = configs_engine
         self._secrets.create_index([("config_id", 1), ("key", 1)], unique=True)
+        # Every write bumps the revision of the configs it touched. A cached
+        # export remembers the revisions of its whole inheritance chain and
+        # is only reused while none of them has moved; the TTL bounds
+        # staleness from writes made by other processes.
+        self._revisions = {}
+        self._revisions_lock = threading.Lock()
+        self._export_cache = TTLCache(
+            max_entries=os.getenv(
+                "SECRETS_EXPORT_CACHE_MAX_ENTRIES",
+                self.EXPORT_CACHE_MAX_ENTRIES,
+            ),
+            ttl_seconds=os.getenv(
+                "SECRETS_EXPORT_CACHE_TTL_SECONDS",
+                self.EXPORT_CACHE_TTL_SECONDS,
+            ),
+        )
+        # Configs a resolving export of a config read through references,
+        # as recorded by its last successful resolution.
+        self._reference_deps = TTLCache(
+            max_entries=os.getenv(
+                "SECRETS_EXPORT_CACHE_MAX_ENTRIES",
+                self.EXPORT_CACHE_MAX_ENTRIES,
+            ),
+            ttl_seconds=os.getenv(
+                "SECRETS_EXPORT_CACHE_TTL_SECONDS",
+                self.EXPORT_CACHE_TTL_SECONDS,
+            ),
+        )
+        self._icon_repairs = _IconRepairQueue(
+            secrets_col,
+            self._project_config_ids_for_config,
+            self._bump_revisions,
+            os.getenv("SECRETS_ICON_REPAIR_SECONDS", self.ICON_REPAIR_SECONDS),
+        )
+
+    def _bump_revisions(self, config_ids):
+        config_ids = list(config_ids)
+        with self._revisions_lock:
+            for config_id in config_ids:
+                key = str(config_id)
+                self._revisions[key] = self._revisions.get(key, 0) + 1
+        # The stored revision is shared by every process and backs ETags.
+        bump = getattr(self._configs, "bump_secrets_revision", None)
+        if callable(bump) and config_ids:
+            bump(config_ids)
+
+    def _chain_revisions(self, chain_ids):
+        with self._revisions_lock:
+            return tuple(self._revisions.get(key, 0) for key in chain_ids)
+
+    def cache_stats(self):
+        with self._revisions_lock:
+            tracked = len(self._revisions)
+        return {
+            **self._export_cache.stats(),
+            "trackedConfigs": tracked,
+            "iconRepairs": self._icon_repairs.stats(),
+        }
+
+    def repair_icons(self):
+        """Write queued icon slug repairs now; returns the keys written."""
+        return self._icon_repairs.flush()
 
     @classmethod
     def _normalize_icon_source(cls, value):
@@ -246,13 +428,13 @@ class SecretsV2:
                 {"config_id": {"$in": config_ids}, "key": key},
                 {"$set": set_doc},
             )
-            return
-
-        for current_config_id in config_ids:
-            self._secrets.update_one(
-                {"config_id": current_config_id, "key": key},
-                {"$set": set_doc},
-            )
+        else:
+            for current_config_id in config_ids:
+                self._secrets.update_one(
+                    {"config_id": current_config_id, "key": key},
+                    {"$set": set_doc},
+                )
+        self._bump_revisions(config_ids)
 
     def _resolve_icon_slug_for_put(
         self, config_id, key, icon_slug, icon_slug_provided
@@ -368,6 +550,7 @@ class SecretsV2:
                     },
                 )
 
+        self._bump_revisions(config_ids)
         return summary, "OK", 200
 
     def put(
@@ -407,11 +590,121 @@ class SecretsV2:
         self._secrets.update_one(
             {"config_id": config_id, "key": key}, update_doc, upsert=True
         )
+        self._bump_revisions([config_id])
         self._sync_project_icon_slug(
             config_id, key, resolved_icon_slug, resolved_icon_source
         )
         return {"status": "OK", "key": key}, 200
 
+    def _invalid_items(self, items):
+        errors = {}
+        for key, value in items.items():
+            if not isinstance(key, str) or not is_valid_env_key(key):
+                errors[str(key)] = "Invalid secret key"
+            elif not isinstance(value, str):
+                errors[key] = "Secret value must be a string"
+        return errors
+
+    def _project_icon_entries(self, config_id, keys):
+        """Pick every key's icon as ``put`` does, from one project query.
+
+        Also returns the keys whose icon differs in another project config
+        and so needs the project-wide sync.
+        """
+        project_ids = self._project_config_ids_for_config(config_id)
+        order = {str(current): i for i, current in enumerate(project_ids)}
+        docs = sorted(
+            self._secrets.find(
+                {"config_id": {"$in": project_ids}, "key": {"$in": keys}},
+                {"config_id": 1, "key": 1, "icon_slug": 1, "icon_source": 1},
+            ),
+            key=lambda doc: order.get(str(doc["config_id"]), len(order)),
+        )
+        entries = {}
+        others = []
+        for doc in docs:
+            entry = (
+                normalize_icon_slug(doc.get("icon_slug")),
+                self._normalize_icon_source(doc.get("icon_source")),
+            )
+            if doc["key"] not in entries and is_valid_icon_slug(entry[0]):
+                entries[doc["key"]] = entry
+            if str(doc["config_id"]) != str(config_id):
+                others.append((doc["key"], entry))
+        for key in keys:
+            entries.setdefault(
+                key, (resolve_icon_slug(key, None), self.ICON_SOURCE_AUTO)
+            )
+        to_sync = {key for key, entry in others if entry != entries[key]}
+        return project_ids, entries, to_sync
+
+    def put_many(self, config_id, items, actor):
+        """Upsert many secrets of one config with a single ``bulk_write``.
+
+        Nothing is written unless every key and value is valid. Icons are
+        chosen as ``put`` chooses them when no icon is given.
+        """
+        if len(items) > self.BULK_MAX_KEYS:
+            return {
+                "status": f"At most {self.BULK_MAX_KEYS} secrets per request"
+            }, 400
+        errors = self._invalid_items(items)
+        if errors:
+            return {"status": "Invalid secrets", "errors": errors}, 400
+        keys = sorted(items)
+        if not keys:
+            return {"status": "OK", "written": 0, "iconsSynced": 0}, 200
+
+        project_ids, icons, to_sync = self._project_icon_entries(
+            config_id, keys
+        )
+        now = datetime.now(timezone.utc)
+        upserts = [
+            (
+                {"config_id": config_id, "key": key},
+                {
+                    "$set": {
+                        "value_enc": SecretCodec.encrypt(items[key]),
+                        "updated_at": now,
+                        "updated_by": actor,
+                        "icon_slug": icons[key][0],
+                        "icon_source": icons[key][1],
+                    }
+                },
+            )
+            for key in keys
+        ]
+        syncs = [
+            (
+                {"config_id": {"$in": project_ids}, "key": key},
+                {
+                    "$set": {
+                        "icon_slug": icons[key][0],
+                        "icon_source": icons[key][1],
+                    }
+                },
+            )
+            for key in sorted(to_sync)
+        ]
+        bulk_write = getattr(self._secrets, "bulk_write", None)
+        if callable(bulk_write):
+            bulk_write(
+                [UpdateOne(q, u, upsert=True) for q, u in upserts]
+                + [UpdateMany(q, u) for q, u in syncs],
+                ordered=False,
+            )
+        else:
+            for query, update in upserts:
+                self._secrets.update_one(query, update, upsert=True)
+            for query, update in syncs:
+                self._secrets.update_many(query, update)
+        self._bump_revisions([config_id, *(project_ids if syncs else [])])
+        return {
+            "status": "OK",
+            "written": len(keys),
+            "iconsSynced": len(syncs),
+        }, 200
+
     def get(self, config_id, key):
         if not is_valid_env_key(key):
             return "Invalid secret key", 400
@@ -430,6 +723,7 @@ class SecretsV2:
         res = self._secrets.delete_one({"config_id": config_id, "key": key})
         if res.deleted_count == 0:
             return "Secret not found", 404
+        self._bump_revisions([config_id])
         return {"status": "OK", "key": key}, 200
 
     def compare_key_across_configs(
@@ -466,50 +760,210 @@ class SecretsV2:
         chain.reverse()
         return chain, None, None
 
-    def export_config(
-        self, config_id, include_parent=True, include_metadata=False
-    ):
-        chain = [self._configs.get_by_id(config_id)]
-        if chain[0] is None:
-            return None, None, "Config not found", 404
-        if include_parent:
-            chain, err, code = self._resolve_chain(config_id)
-            if err:
-                return None, None, err, code
+    def _chain_ids(self, config, include_parent):
+        """Config ids to merge, root first, ending with ``config``."""
+        if not include_parent:
+            return [config["_id"]], None, None
+        ancestor_ids = getattr(self._configs, "ancestor_ids", None)
+        if callable(ancestor_ids):
+            ids = ancestor_ids(config)
+            if ids is not None:
+                return [*ids, config["_id"]], None, None
+        chain, err, code = self._resolve_chain(config["_id"])
+        if err:
+            return None, err, code
+        return [cfg["_id"] for cfg in chain], None, None
+
+    def _chain_docs(self, chain_ids):
+        """Load every secret of the chain with one query, in chain order."""
+        position = {str(config_id): i for i, config_id in enumerate(chain_ids)}
+        docs = list(self._secrets.find({"config_id": {"$in": chain_ids}}))
+        # Sorting on key too keeps the rendered body byte-stable for ETags.
+        docs.sort(
+            key=lambda item: (position[str(item["config_id"])], item["key"])
+        )
+        return docs
+
+    def _merge_chain(self, config_id, chain_ids, include_metadata):
         merged = {}
         meta = {}
         project_icon_by_key = {}
         keys_needing_sync = set()
-        for cfg in chain:
-            cursor = self._secrets.find({"config_id": cfg["_id"]})
-            for item in cursor:
-                merged[item["key"]] = SecretCodec.decrypt(item["value_enc"])
-                key = item["key"]
-                icon_slug = normalize_icon_slug(item.get("icon_slug"))
-                if not is_valid_icon_slug(icon_slug):
-                    icon_slug = resolve_icon_slug(key, None)
-                    keys_needing_sync.add(key)
-
-                previous_icon_slug = project_icon_by_key.get(key)
-                if previous_icon_slug and previous_icon_slug != icon_slug:
-                    keys_needing_sync.add(key)
-                project_icon_by_key[key] = icon_slug
+        for item in self._chain_docs(chain_ids):
+            merged[item["key"]] = SecretCodec.decrypt(item["value_enc"])
+            key = item["key"]
+            icon_slug = normalize_icon_slug(item.get("icon_slug"))
+            if not is_valid_icon_slug(icon_slug):
+                icon_slug = resolve_icon_slug(key, None)
+                keys_needing_sync.add(key)
+
+            previous_icon_slug = project_icon_by_key.get(key)
+            if previous_icon_slug and previous_icon_slug != icon_slug:
+                keys_needing_sync.add(key)
+            project_icon_by_key[key] = icon_slug
+
+            if include_metadata:
+                meta[key] = {
+                    "updatedAt": to_iso(item.get("updated_at")),
+                    "updatedBy": item.get("updated_by"),
+                    "iconSlug": icon_slug,
+                }
 
+        for key in keys_needing_sync:
+            self._icon_repairs.record(config_id, key, project_icon_by_key[key])
+        return merged, meta if include_metadata else None
+
+    def _cached_export(
+        self, config_id, include_parent, include_metadata, state=None
+    ):
+        """Return the cache entry for an export, loading it if needed.
+
+        With ``state`` (from ``export_state``) an entry is only reused if
+        it was loaded at that stored state, so writes made by other
+        processes are seen before the TTL runs out and the data matches
+        an ETag derived from the same state.
+        """
+        cache_key = (
+            str(config_id),
+            bool(include_parent),
+            bool(include_metadata),
+        )
+        entry = self._export_cache.get(
+            cache_key,
+            is_valid=lambda cached: (
+                self._chain_revisions(cached["chain"]) == cached["revisions"]
+                and (state is None or cached["state"] == state)
+            ),
+        )
+        if entry is not None:
+            return entry, "OK", 200
+        config = self._configs.get_by_id(config_id)
+        if config is None:
+            return None, "Config not found", 404
+        chain_ids, err, code = self._chain_ids(config, include_parent)
+        if err:
+            return None, err, code
+        # Captured before the secrets are read, so a write racing this export
+        # leaves the entry stale instead of caching pre-write values.
+        revisions = self._chain_revisions(tuple(map(str, chain_ids)))
+        merged, meta = self._merge_chain(
+            config_id, chain_ids, include_metadata
+        )
+        entry = {
+            "chain": tuple(map(str, chain_ids)),
+            "revisions": revisions,
+            "state": state,
+            "data": merged,
+            "meta": meta,
+            "rendered": {},
+        }
+        self._export_cache.set(cache_key, entry)
+        return entry, "OK", 200
+
+    def export_config(
+        self,
+        config_id,
+        include_parent=True,
+        include_metadata=False,
+        state=None,
+    ):
+        entry, msg, code = self._cached_export(
+            config_id, include_parent, include_metadata, state
+        )
+        if entry is None:
+            return None, None, msg, code
+        meta = entry["meta"]
+        if meta is not None:
+            meta = {key: dict(value) for key, value in meta.items()}
+        return dict(entry["data"]), meta, "OK", 200
+
+    def export_rendered(
+        self,
+        config_id,
+        fmt="json",
+        include_parent=True,
+        include_metadata=False,
+        state=None,
+    ):
+        """Return the serialized export body and its key count.
+
+        The body is rendered once per cached export and format, so repeat
+        exports of an unchanged config skip both the merge and the encoding.
+        """
+        entry, msg, code = self._cached_export(
+            config_id, include_parent, include_metadata, state
+        )
+        if entry is None:
+            return None, None, msg, code
+        body = entry["rendered"].get(fmt)
+        if body is None:
+            if fmt == "env":
+                body, msg, code = self.to_env(entry["data"])
+                if code >= 400:
+                    return None, None, msg, code
+            else:
+                payload = {"data": entry["data"], "status": "OK"}
                 if include_metadata:
-                    meta[key] = {
-                        "updatedAt": to_iso(item.get("updated_at")),
-                        "updatedBy": item.get("updated_by"),
-                        "iconSlug": icon_slug,
-                    }
+                    payload["meta"] = entry["meta"]
+                body = json.dumps(payload) + "\n"
+            entry["rendered"][fmt] = body
+        return body, len(entry["data"]), "OK", 200
+
+    def export_state(self, config, include_parent=True):
+        """Stored revisions of the configs an export of ``config`` reads.
+
+        Returns ``(chain ids, revisions)`` without reading any secret, or
+        ``None`` when revisions are unavailable or the chain is broken.
+        """
+        revisions_for = getattr(self._configs, "secrets_revisions", None)
+        if not callable(revisions_for):
+            return None
+        chain_ids, err, _ = self._chain_ids(config, include_parent)
+        if err:
+            return None
+        return (
+            tuple(str(config_id) for config_id in chain_ids),
+            tuple(revisions_for(chain_ids)),
+        )
 
-        for key in keys_needing_sync:
-            self._sync_project_icon_slug(
-                config_id,
-                key,
-                project_icon_by_key[key],
-                self.ICON_SOURCE_AUTO,
-            )
-        return merged, meta if include_metadata else None, "OK", 200
+    def state_etag(self, states, variant=()):
+        """Strong ETag for a response built from the given export states.
+
+        ``variant`` holds whatever else shapes the response, such as the
+        format. Returns ``None`` if any state is unavailable.
+        """
+        if any(state is None for state in states):
+            return None
+        material = json.dumps(
+            [
+                self.ETAG_VERSION,
+                [[list(chain), list(revs)] for chain, revs in states],
+                list(variant),
+            ]
+        )
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()[:32]
+
+    def export_etag(self, config, include_parent=True, variant=()):
+        """ETag of an export of ``config`` alone, without reading secrets."""
+        return self.state_etag(
+            [self.export_state(config, include_parent)], variant
+        )
+
+    def reference_dependencies(self, config_id, include_parent=True):
+        """Configs the last resolving export of ``config_id`` read.
+
+        A tuple of ``(project slug, config slug, config id)``, with a
+        ``None`` id for references that pointed at nothing, or ``None``
+        when no resolution has been recorded.
+        """
+        return self._reference_deps.get((str(config_id), bool(include_parent)))
+
+    def record_reference_dependencies(
+        self, config_id, include_parent, dependencies
+    ):
+        self._reference_deps.set(
+            (str(config_id), bool(include_parent)), tuple(dependencies)
+        )
 
     @staticmethod
     def to_env(data):
@@ -1,10 +1,13 @@
 #!/usr/bin/env python3
 from datetime import datetime, timezone
 
+from Engines.caching import GenerationCounter
+
 
 class Users:
-    def __init__(self, users_col):
+    def __init__(self, users_col, authz_generation=None):
         self._users = users_col
+        self._authz_generation = authz_generation or GenerationCounter()
         self._users.create_index("username", unique=True)
 
     @staticmethod
@@ -81,12 +84,14 @@ class Users:
             datetime.now(timezone.utc) if disabled else None
         )
         self._users.update_one({"username": username}, {"$set": updates})
+        self._authz_generation.bump()
         return self.get(username), "OK", 200
 
     def delete(self, username):
         res = self._users.delete_one({"username": username})
         if res.deleted_count == 0:
             return "User not found", 404
+        self._authz_generation.bump()
         return "OK", 200
 
     def is_disabled(self, username):
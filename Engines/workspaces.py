@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 from datetime import datetime, timezone
 
+from Engines.caching import GenerationCounter
 from Engines.common import is_valid_slug
 from Engines.rbac import (
     WORKSPACE_ROLES,
@@ -13,8 +14,9 @@ DEFAULT_WORKSPACE_NAME = "Default Workspace"
 
 
 class Workspaces:
-    def __init__(self, workspaces_col):
+    def __init__(self, workspaces_col, authz_generation=None):
         self._workspaces = workspaces_col
+        self._authz_generation = authz_generation or GenerationCounter()
         self._workspaces.create_index("slug", unique=True)
 
     @staticmethod
@@ -91,6 +93,7 @@ class Workspaces:
                 }
             },
         )
+        self._authz_generation.bump()
         return settings, "OK", 200
 
     def create(self, slug, name):
@@ -16,7 +16,9 @@ from Engines.users import Users as _Users
 from Engines.memberships import Memberships as _Memberships
 from Engines.groups import Groups as _Groups
 from Engines.rbac import RBAC as _RBAC
+from Engines.caching import GenerationCounter as _GenerationCounter
 
+from Access.auth_failures import AuthFailures as _AuthFailures
 from Access.tokens import Tokens as _Tokens
 from Access.userpass import User_Pass as _User_Pass
 from Access.onboarding import Onboarding as _Onboarding
@@ -31,26 +33,55 @@ class __connection:
         self.__data = self.__client["secrets_manager_data"]
         self.__auth = self.__client["secrets_manager_auth"]
 
+        # Shared by every engine whose writes can change a resolved actor.
+        self.authz_generation = _GenerationCounter()
+
         self.kv = _KV(self.__data["kv"])
-        self.workspaces = _Workspaces(self.__auth["workspaces"])
-        self.users = _Users(self.__auth["users"])
+        self.workspaces = _Workspaces(
+            self.__auth["workspaces"], authz_generation=self.authz_generation
+        )
+        self.users = _Users(
+            self.__auth["users"], authz_generation=self.authz_generation
+        )
         self.memberships = _Memberships(
             self.__auth["workspace_memberships"],
             self.__auth["project_memberships"],
+            authz_generation=self.authz_generation,
         )
         self.groups = _Groups(
             self.__auth["groups"],
             self.__auth["group_members"],
             self.__auth["group_mappings"],
             memberships_engine=self.memberships,
+            authz_generation=self.authz_generation,
         )
 
         self.projects = _Projects(
-            self.__data["projects"], workspaces_engine=self.workspaces
+            self.__data["projects"],
+            workspaces_engine=self.workspaces,
+            authz_generation=self.authz_generation,
         )
         self.configs = _Configs(self.__data["configs"])
+        self.configs.start_ancestor_backfill()
         self.secrets_v2 = _SecretsV2(self.__data["secrets"], self.configs)
-        self.audit = _AuditEvents(self.__data["audit_events"])
+        self.audit = _AuditEvents(
+            self.__data["audit_events"],
+            rollups_col=self.__data["audit_rollups"],
+            projects_engine=self.projects,
+            configs_engine=self.configs,
+        )
+        self.auth_failures = _AuthFailures(
+            self.audit.write_event,
+            flush_interval_seconds=os.getenv(
+                "AUTH_FAILURE_FLUSH_SECONDS", _AuthFailures.FLUSH_SECONDS
+            ),
+            window_seconds=os.getenv(
+                "AUTH_FAILURE_WINDOW_SECONDS", _AuthFailures.WINDOW_SECONDS
+            ),
+            throttle_limit=os.getenv(
+                "AUTH_FAILURE_THROTTLE_LIMIT", _AuthFailures.THROTTLE_LIMIT
+            ),
+        )
 
         self.rbac = _RBAC(
             self.workspaces,
@@ -59,11 +90,15 @@ class __connection:
             self.groups,
             self.projects,
             onboarding_state_col=self.__auth["system_state"],
+            auth_db=self.__auth,
+            authz_generation=self.authz_generation,
         )
         self.tokens = _Tokens(
             self.__auth["tokens"],
             personal_actor_resolver=self.rbac.resolve_personal_actor,
+            archive_col=self.__auth["tokens_archive"],
         )
+        self.tokens.start_retention_sweeper()
         self.userpass = _User_Pass(self.__auth["userpass"])
         self.onboarding = _Onboarding(
             self.__auth["system_state"],
@@ -7,7 +7,13 @@ interface AuditFilters {
   configSlug?: string;
   since?: string;
   page?: number;
+  cursor?: string;
   limit?: number;
+  tokenId?: string;
+  actorId?: string;
+  action?: string;
+  statusMin?: number;
+  statusMax?: number;
 }
 
 export async function getAuditEvents(filters: AuditFilters = {}): Promise<AuditEventsPage> {
@@ -16,7 +22,16 @@ export async function getAuditEvents(filters: AuditFilters = {}): Promise<AuditE
   if (filters.projectSlug) params.set('project', filters.projectSlug);
   if (filters.configSlug) params.set('config', filters.configSlug);
   if (filters.since) params.set('since', filters.since);
-  params.set('page', String(filters.page ?? 1));
+  if (filters.tokenId) params.set('token_id', filters.tokenId);
+  if (filters.actorId) params.set('actor_id', filters.actorId);
+  if (filters.action) params.set('action', filters.action);
+  if (filters.statusMin !== undefined) params.set('status_min', String(filters.statusMin));
+  if (filters.statusMax !== undefined) params.set('status_max', String(filters.statusMax));
+  if (filters.cursor) {
+    params.set('cursor', filters.cursor);
+  } else {
+    params.set('page', String(filters.page ?? 1));
+  }
   params.set('limit', String(filters.limit ?? 50));
 
   const response = await apiClient<AuditEventsResponseDto>(`/audit/events?${params.toString()}`);
@@ -24,6 +39,7 @@ export async function getAuditEvents(filters: AuditFilters = {}): Promise<AuditE
     events: (response.events ?? []).map(mapAuditEventDto),
     page: response.page ?? filters.page ?? 1,
     limit: response.limit ?? filters.limit ?? 50,
-    hasNext: Boolean(response.hasNext ?? response.has_next)
+    hasNext: Boolean(response.hasNext ?? response.has_next),
+    nextCursor: response.nextCursor ?? response.next_cursor ?? undefined
   };
 }
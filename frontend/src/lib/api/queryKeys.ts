@@ -15,6 +15,7 @@ export const queryKeys = {
     configSlug?: string;
     since?: string;
     page?: number;
+    cursor?: string;
     limit?: number;
   }) => ['audit', filters] as const,
   compareSecret: (
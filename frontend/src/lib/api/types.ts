@@ -94,6 +94,7 @@ export interface AuditEventsPage {
   page: number;
   limit: number;
   hasNext: boolean;
+  nextCursor?: string;
 }
 
 export interface ApiError {
@@ -319,6 +320,8 @@ export interface AuditEventsResponseDto {
   limit?: number;
   has_next?: boolean;
   hasNext?: boolean;
+  next_cursor?: string | null;
+  nextCursor?: string | null;
   status?: string;
 }
 
@@ -36,6 +36,9 @@ export function AuditPage() {
   const [configFilter, setConfigFilter] = useState<string>('');
   const [sinceDate, setSinceDate] = useState('');
   const [page, setPage] = useState(1);
+  // Cursor that starts each visited page, so deep pages seek instead of skip.
+  const [pageCursors, setPageCursors] = useState<Record<number, string>>({});
+  const cursor = page > 1 ? pageCursors[page] : undefined;
 
   const { data: projects = [] } = useQuery({
     queryKey: queryKeys.projects(),
@@ -56,6 +59,7 @@ export function AuditPage() {
       configSlug: configFilter || undefined,
       since: sinceIso,
       page,
+      cursor,
       limit: AUDIT_PAGE_SIZE
     }),
     queryFn: () =>
@@ -64,6 +68,7 @@ export function AuditPage() {
         configSlug: configFilter || undefined,
         since: sinceIso,
         page,
+        cursor,
         limit: AUDIT_PAGE_SIZE
       })
   });
@@ -71,6 +76,14 @@ export function AuditPage() {
   const events = data?.events ?? [];
   const hasNext = data?.hasNext ?? false;
 
+  const goToNextPage = () => {
+    const nextCursor = data?.nextCursor;
+    if (nextCursor) {
+      setPageCursors((current) => ({ ...current, [page + 1]: nextCursor }));
+    }
+    setPage((current) => current + 1);
+  };
+
   const hasFilters = Boolean(projectFilter || configFilter || sinceDate);
 
   const clearFilters = () => {
@@ -271,7 +284,7 @@ export function AuditPage() {
             variant="outline"
             size="sm"
             className="h-8 px-3 text-xs"
-            onClick={() => setPage((current) => current + 1)}
+            onClick={goToNextPage}
             disabled={isLoading || !hasNext}
           >
             Next
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""Compare audit query plans before and after the identity backfill.
+
+Seeds a scratch database with audit events across several projects, half of
+them written with slugs only as older releases did, then explains the same
+project-scoped page query with the legacy ``$or`` shape and with the single
+``project_id`` predicate used once every event carries canonical ids.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+from pathlib import Path
+import sys
+from datetime import datetime, timedelta, timezone
+
+import pymongo
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from Engines.audit import AuditEvents  # noqa: E402
+from Engines.configs import Configs  # noqa: E402
+from Engines.projects import Projects  # noqa: E402
+
+
+def _seed(db, projects: int, events: int) -> str:
+    project_engine = Projects(db["projects"])
+    now = datetime.now(timezone.utc)
+    slugs = [f"project-{index}" for index in range(projects)]
+    for slug in slugs:
+        project_engine.create(slug, slug)
+    ids = {
+        doc["slug"]: str(doc["_id"])
+        for doc in db["projects"].find({}, {"slug": 1})
+    }
+    batch = []
+    for index in range(events):
+        slug = slugs[index % projects]
+        event = {
+            "ts": now - timedelta(seconds=index),
+            "action": "secrets.read",
+            "project_slug": slug,
+        }
+        if index % 2:
+            event["project_id"] = ids[slug]
+        batch.append(event)
+        if len(batch) == 5000:
+            db["audit_events"].insert_many(batch)
+            batch = []
+    if batch:
+        db["audit_events"].insert_many(batch)
+    return ids[slugs[0]]
+
+
+def _stages(plan: dict) -> list[str]:
+    stages = [plan.get("stage", "?")]
+    for key in ("inputStage", "inputStages"):
+        children = plan.get(key)
+        if isinstance(children, dict):
+            children = [children]
+        for child in children or []:
+            stages.extend(_stages(child))
+    return stages
+
+
+def _explain(collection, query: dict, limit: int) -> dict:
+    explain = (
+        collection.find(query)
+        .sort([("ts", -1), ("_id", -1)])
+        .limit(limit)
+        .explain()
+    )
+    stats = explain["executionStats"]
+    return {
+        "stages": _stages(explain["queryPlanner"]["winningPlan"]),
+        "keys": stats["totalKeysExamined"],
+        "docs": stats["totalDocsExamined"],
+        "ms": stats["executionTimeMillis"],
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--uri",
+        default=os.getenv("CONNECTION_STRING", "mongodb://localhost:27017"),
+    )
+    parser.add_argument("--database", default="ssm_bench_audit_plan")
+    parser.add_argument("--projects", type=int, default=20)
+    parser.add_argument("--events", type=int, default=200000)
+    parser.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args()
+
+    os.environ["AUDIT_FLUSH_SECONDS"] = "0"
+    os.environ["AUDIT_BACKFILL_SECONDS"] = "0"
+    client: pymongo.MongoClient = pymongo.MongoClient(args.uri)
+    client.drop_database(args.database)
+    try:
+        db = client[args.database]
+        project_id = _seed(db, args.projects, args.events)
+        audit = AuditEvents(
+            db["audit_events"],
+            projects_engine=Projects(db["projects"]),
+            configs_engine=Configs(db["configs"]),
+        )
+        scope = {"project_slug": "project-0", "project_id": project_id}
+        before = _explain(
+            db["audit_events"], audit._build_query(**scope), args.limit
+        )
+        while audit._identity.backfill_once():
+            pass
+        after = _explain(
+            db["audit_events"],
+            audit._build_query(canonical=True, **scope),
+            args.limit,
+        )
+        for label, result in (("$or", before), ("project_id", after)):
+            print(
+                f"{label:>10}: {' <- '.join(result['stages'])}; "
+                f"{result['keys']} keys, {result['docs']} docs, "
+                f"{result['ms']} ms"
+            )
+    finally:
+        client.drop_database(args.database)
+        client.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""Measure config export cost on deep inheritance chains.
+
+Seeds a scratch database with a single chain of configs, each holding a few
+secrets, then exports the deepest config twice: once walking the parents
+one lookup at a time, as configs created before ``ancestor_ids`` was stored
+are resolved, and once with the stored path. The export cache is disabled
+so every export hits MongoDB; each run reports the database round trips of
+one export and the median wall time.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import pymongo
+from pymongo import monitoring
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from Engines.configs import Configs  # noqa: E402
+from Engines.secrets_v2 import SecretsV2  # noqa: E402
+
+
+class _CommandCounter(monitoring.CommandListener):
+    def __init__(self) -> None:
+        self.count = 0
+
+    def started(self, event) -> None:
+        self.count += 1
+
+    def succeeded(self, event) -> None:
+        pass
+
+    def failed(self, event) -> None:
+        pass
+
+
+class _WalkingConfigs(Configs):
+    """Resolve chains by walking parents, ignoring stored paths."""
+
+    def ancestor_ids(self, _config):
+        return None
+
+
+def _seed(db, depth: int, keys: int):
+    configs = Configs(db["configs"])
+    parent_id = None
+    for level in range(depth):
+        created, _ = configs.create("bench", f"level-{level}", None, parent_id)
+        parent_id = created["_id"]
+        db["secrets"].insert_many(
+            [
+                {
+                    "config_id": parent_id,
+                    "key": f"KEY_{level}_{index}",
+                    "value_enc": "value",
+                    "icon_slug": "lucide:key-round",
+                }
+                for index in range(keys)
+            ]
+        )
+    return parent_id
+
+
+def _run(engine, counter, config_id, repeat: int) -> tuple[int, float]:
+    counter.count = 0
+    engine.export_config(config_id)
+    trips = counter.count
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        engine.export_config(config_id)
+        timings.append((time.perf_counter() - started) * 1000)
+    return trips, statistics.median(timings)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--uri",
+        default=os.getenv("CONNECTION_STRING", "mongodb://localhost:27017"),
+    )
+    parser.add_argument("--database", default="ssm_bench_export_chain")
+    parser.add_argument("--depth", type=int, default=8)
+    parser.add_argument("--keys", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    os.environ["SECRETS_EXPORT_CACHE_TTL_SECONDS"] = "0"
+    counter = _CommandCounter()
+    client: pymongo.MongoClient = pymongo.MongoClient(
+        args.uri, event_listeners=[counter]
+    )
+    client.drop_database(args.database)
+    try:
+        db = client[args.database]
+        leaf_id = _seed(db, args.depth, args.keys)
+        engine = SecretsV2(db["secrets"], Configs(db["configs"]))
+        legacy = SecretsV2(db["secrets"], _WalkingConfigs(db["configs"]))
+        results = {
+            "walk": _run(legacy, counter, leaf_id, args.repeat),
+            "ancestor_ids": _run(engine, counter, leaf_id, args.repeat),
+        }
+        for label, (trips, median_ms) in results.items():
+            print(
+                f"{label:>12}: depth {args.depth}, {trips} round trips, "
+                f"{median_ms:.2f} ms median"
+            )
+    finally:
+        client.drop_database(args.database)
+        client.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""Count MongoDB round trips and latency for personal actor resolution.
+
+Seeds a scratch database with one collaborator who belongs to many groups
+and one workspace admin, then resolves both actors with and without the
+single-aggregation snapshot. The actor cache is disabled so every
+resolution reaches MongoDB.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+from pathlib import Path
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+
+import pymongo
+from pymongo import monitoring
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from Engines.groups import Groups  # noqa: E402
+from Engines.memberships import Memberships  # noqa: E402
+from Engines.projects import Projects  # noqa: E402
+from Engines.rbac import RBAC  # noqa: E402
+from Engines.users import Users  # noqa: E402
+from Engines.workspaces import Workspaces  # noqa: E402
+
+
+class CommandCounter(monitoring.CommandListener):
+    def __init__(self) -> None:
+        self.count = 0
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        self.count += 1
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        pass
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        pass
+
+
+def _seed(db, groups: int) -> tuple[RBAC, RBAC]:
+    workspaces = Workspaces(db["workspaces"])
+    users = Users(db["users"])
+    memberships = Memberships(
+        db["workspace_memberships"], db["project_memberships"]
+    )
+    group_engine = Groups(
+        db["groups"],
+        db["group_members"],
+        db["group_mappings"],
+        memberships_engine=memberships,
+    )
+    projects = Projects(db["projects"], workspaces_engine=workspaces)
+
+    workspace_id = workspaces.ensure_default()["_id"]
+    for username, role in (
+        ("owner", "owner"),
+        ("alice", "collaborator"),
+        ("admin", "admin"),
+    ):
+        users.ensure(username)
+        memberships.upsert_workspace_membership(workspace_id, username, role)
+
+    now = datetime.now(timezone.utc)
+    for index in range(groups):
+        slug = f"group-{index}"
+        group, _, _ = group_engine.create_group(workspace_id, slug)
+        group_engine.update_group_members(workspace_id, slug, add=["alice"])
+        project_id = (
+            db["projects"]
+            .insert_one(
+                {
+                    "slug": f"project-{index}",
+                    "name": f"project-{index}",
+                    "workspace_id": workspace_id,
+                    "created_at": now,
+                }
+            )
+            .inserted_id
+        )
+        memberships.upsert_project_membership(
+            workspace_id, project_id, "group", str(group["_id"]), "viewer"
+        )
+
+    engines = (workspaces, users, memberships, group_engine, projects)
+    state = db["system_state"]
+    legacy = RBAC(*engines, onboarding_state_col=state)
+    snapshot = RBAC(
+        *engines,
+        onboarding_state_col=state,
+        auth_db=db,
+        projects_col=db["projects"],
+    )
+    return legacy, snapshot
+
+
+def _measure(
+    engine: RBAC, counter: CommandCounter, username: str, iterations: int
+) -> dict:
+    engine.resolve_personal_actor(username)
+    counter.count = 0
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        actor = engine.resolve_personal_actor(username)
+        timings.append((time.perf_counter() - started) * 1000)
+    return {
+        "round_trips": counter.count / iterations,
+        "p50_ms": statistics.median(timings),
+        "max_ms": max(timings),
+        "projects": len(actor["visible_project_ids"]),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--uri",
+        default=os.getenv("CONNECTION_STRING", "mongodb://localhost:27017"),
+    )
+    parser.add_argument("--database", default="ssm_bench_rbac")
+    parser.add_argument("--groups", type=int, default=60)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    os.environ["RBAC_ACTOR_CACHE_TTL_SECONDS"] = "0"
+    counter = CommandCounter()
+    client: pymongo.MongoClient = pymongo.MongoClient(
+        args.uri, event_listeners=[counter]
+    )
+    client.drop_database(args.database)
+    try:
+        legacy, snapshot = _seed(client[args.database], args.groups)
+        runs = [
+            (label, engine, username)
+            for username in ("alice", "admin")
+            for label, engine in (("engines", legacy), ("snapshot", snapshot))
+        ]
+        for label, engine, username in runs:
+            result = _measure(engine, counter, username, args.iterations)
+            print(
+                f"{username:>5} {label:>8}: "
+                f"{result['round_trips']:.1f} round trips, "
+                f"p50 {result['p50_ms']:.2f} ms, "
+                f"max {result['max_ms']:.2f} ms, "
+                f"{result['projects']} visible projects"
+            )
+    finally:
+        client.drop_database(args.database)
+        client.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -43,6 +43,11 @@ class ApiClient:
         self.timeout = timeout
         self.retries = retries
         self.session = requests.Session()
+        # (project, config, resolve_references, raw) -> (etag, data) of the
+        # last export, replayed as If-None-Match on the next one.
+        self.export_etags: dict[
+            tuple[str, str, bool, bool], tuple[str, dict[str, str]]
+        ] = {}
 
     def _build_url(self, path: str) -> str:
         clean_path = path if path.startswith("/") else f"/{path}"
@@ -59,19 +64,43 @@ class ApiClient:
         basic_auth: tuple[str, str] | None = None,
         accept: str | None = None,
     ) -> Any:
+        response = self._send(
+            method,
+            path,
+            headers=self._headers(token, accept),
+            params=params,
+            json_body=json_body,
+            basic_auth=basic_auth,
+        )
+        return self._parse_response(response)
+
+    def _headers(
+        self, token: str | None, accept: str | None
+    ) -> dict[str, str]:
         headers: dict[str, str] = {}
         effective_token = token if token is not None else self.token
         if effective_token:
             headers["Authorization"] = f"Bearer {effective_token}"
         if accept:
             headers["Accept"] = accept
+        return headers
 
+    def _send(
+        self,
+        method: str,
+        path: str,
+        *,
+        headers: dict[str, str],
+        params: dict[str, Any] | None = None,
+        json_body: dict[str, Any] | None = None,
+        basic_auth: tuple[str, str] | None = None,
+    ) -> requests.Response:
         url = self._build_url(path)
         last_exception: Exception | None = None
 
         for attempt in range(self.retries + 1):
             try:
-                response = self.session.request(
+                return self.session.request(
                     method=method.upper(),
                     url=url,
                     params=params,
@@ -80,7 +109,6 @@ class ApiClient:
                     auth=basic_auth,
                     timeout=self.timeout,
                 )
-                return self._parse_response(response)
             except requests.RequestException as exc:
                 last_exception = exc
                 if attempt >= self.retries:
@@ -137,6 +165,16 @@ class ApiClient:
             )
         return payload
 
+    @staticmethod
+    def export_key(
+        project: str,
+        config: str,
+        *,
+        resolve_references: bool = True,
+        raw: bool = False,
+    ) -> tuple[str, str, bool, bool]:
+        return (project, config, resolve_references and not raw, raw)
+
     def export_secrets_json(
         self,
         project: str,
@@ -145,31 +183,44 @@ class ApiClient:
         resolve_references: bool = True,
         raw: bool = False,
     ) -> dict[str, str]:
-        payload = self.request(
+        cache_key = self.export_key(
+            project, config, resolve_references=resolve_references, raw=raw
+        )
+        resolve = cache_key[2]
+        headers = self._headers(None, "application/json")
+        cached = self.export_etags.get(cache_key)
+        if cached is not None:
+            headers["If-None-Match"] = cached[0]
+        response = self._send(
             "GET",
             f"/projects/{project}/configs/{config}/secrets",
+            headers=headers,
             params={
                 "format": "json",
                 "include_parent": "true",
                 "include_meta": "false",
                 "raw": str(raw).lower(),
-                "resolve_references": str(
-                    resolve_references and not raw
-                ).lower(),
+                "resolve_references": str(resolve).lower(),
             },
-            accept="application/json",
         )
+        if response.status_code == 304 and cached is not None:
+            return dict(cached[1])
+        payload = self._parse_response(response)
         data = payload.get("data") if isinstance(payload, dict) else None
         if not isinstance(data, dict):
             raise ApiError(
                 "Secrets response is invalid", status_code=1, body=payload
             )
 
-        return {
+        result = {
             key: value
             for key, value in data.items()
             if isinstance(key, str) and isinstance(value, str)
         }
+        etag = response.headers.get("ETag")
+        if etag:
+            self.export_etags[cache_key] = (etag, dict(result))
+        return result
 
     def upsert_secret(
         self, project: str, config: str, key: str, value: str
@@ -181,6 +232,17 @@ class ApiClient:
             accept="application/json",
         )
 
+    def upsert_secrets(
+        self, project: str, config: str, secrets: dict[str, str]
+    ) -> dict[str, Any]:
+        payload = self.request(
+            "POST",
+            f"/projects/{project}/configs/{config}/secrets/bulk",
+            json_body={"secrets": secrets},
+            accept="application/json",
+        )
+        return payload if isinstance(payload, dict) else {}
+
     def list_projects(self) -> list[dict[str, Any]]:
         payload = self.request("GET", "/projects", accept="application/json")
         projects = (
@@ -321,6 +383,37 @@ class ApiClient:
             )
         return payload
 
+    def revoke_tokens(
+        self,
+        *,
+        subject_user: str | None = None,
+        subject_service_name: str | None = None,
+        created_by: str | None = None,
+    ) -> int:
+        body = {
+            key: value
+            for key, value in (
+                ("subject_user", subject_user),
+                ("subject_service_name", subject_service_name),
+                ("created_by", created_by),
+            )
+            if value
+        }
+        payload = self.request(
+            "POST",
+            "/auth/tokens/v2/revoke-bulk",
+            json_body=body,
+            accept="application/json",
+        )
+        revoked = payload.get("revoked") if isinstance(payload, dict) else None
+        if not isinstance(revoked, int):
+            raise ApiError(
+                "Token revoke response is invalid",
+                status_code=1,
+                body=payload,
+            )
+        return revoked
+
     def list_workspace_groups(self) -> list[dict[str, Any]]:
         payload = self.request(
             "GET", "/workspace/groups", accept="application/json"
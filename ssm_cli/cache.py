@@ -15,11 +15,17 @@ def _cache_file(base_url: str, project: str, config: str) -> Path:
 
 
 def save_secret_cache(
-    base_url: str, project: str, config: str, data: dict[str, str]
+    base_url: str,
+    project: str,
+    config: str,
+    data: dict[str, str],
+    etag: str | None = None,
 ) -> None:
     path = _cache_file(base_url, project, config)
     path.parent.mkdir(parents=True, exist_ok=True)
-    payload = {"fetched_at": int(time.time()), "data": data}
+    payload: dict[str, object] = {"fetched_at": int(time.time()), "data": data}
+    if etag:
+        payload["etag"] = etag
     temp = path.with_suffix(path.suffix + ".tmp")
     with temp.open("w", encoding="utf-8") as handle:
         json.dump(payload, handle, sort_keys=True)
@@ -27,12 +33,9 @@ def save_secret_cache(
     temp.replace(path)
 
 
-def load_secret_cache(
-    base_url: str,
-    project: str,
-    config: str,
-    max_age_seconds: int | None = None,
-) -> dict[str, str] | None:
+def _read_cache(
+    base_url: str, project: str, config: str
+) -> tuple[int, dict[str, str], str | None] | None:
     path = _cache_file(base_url, project, config)
     if not path.exists():
         return None
@@ -48,13 +51,45 @@ def load_secret_cache(
     if not isinstance(fetched_at, int) or not isinstance(data, dict):
         return None
 
+    etag = payload.get("etag")
+    return (
+        fetched_at,
+        {
+            key: value
+            for key, value in data.items()
+            if isinstance(key, str) and isinstance(value, str)
+        },
+        etag if isinstance(etag, str) else None,
+    )
+
+
+def load_secret_cache(
+    base_url: str,
+    project: str,
+    config: str,
+    max_age_seconds: int | None = None,
+) -> dict[str, str] | None:
+    cached = _read_cache(base_url, project, config)
+    if cached is None:
+        return None
+
+    fetched_at, data, _ = cached
     if max_age_seconds is not None:
         age = int(time.time()) - fetched_at
         if age > max_age_seconds:
             return None
 
-    return {
-        key: value
-        for key, value in data.items()
-        if isinstance(key, str) and isinstance(value, str)
-    }
+    return data
+
+
+def load_secret_cache_etag(
+    base_url: str, project: str, config: str
+) -> tuple[str, dict[str, str]] | None:
+    """Return the cached ETag and data, whatever their age.
+
+    A server that still answers 304 for the ETag vouches for the data.
+    """
+    cached = _read_cache(base_url, project, config)
+    if cached is None or cached[2] is None:
+        return None
+    return cached[2], cached[1]
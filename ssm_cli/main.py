@@ -13,7 +13,11 @@ from rich.table import Table
 
 from ssm_cli import auth
 from ssm_cli.api import ApiClient, ApiError, normalize_base_url
-from ssm_cli.cache import load_secret_cache, save_secret_cache
+from ssm_cli.cache import (
+    load_secret_cache,
+    load_secret_cache_etag,
+    save_secret_cache,
+)
 from ssm_cli.config import (
     DEFAULT_PROFILE,
     GlobalConfig,
@@ -95,6 +99,17 @@ def _fetch_secrets(
         return cached, "cache"
 
     client = ApiClient(resolution.base_url, token=resolution.token)
+    export_key = ApiClient.export_key(
+        resolution.project,
+        resolution.config,
+        resolve_references=resolve_references,
+        raw=raw,
+    )
+    seed = load_secret_cache_etag(
+        resolution.base_url, resolution.project, resolution.config
+    )
+    if seed is not None:
+        client.export_etags[export_key] = seed
     try:
         data = client.export_secrets_json(
             resolution.project,
@@ -102,8 +117,13 @@ def _fetch_secrets(
             resolve_references=resolve_references,
             raw=raw,
         )
+        etag, _ = client.export_etags.get(export_key, (None, None))
         save_secret_cache(
-            resolution.base_url, resolution.project, resolution.config, data
+            resolution.base_url,
+            resolution.project,
+            resolution.config,
+            data,
+            etag=etag,
         )
         return data, "remote"
     except ApiError:
@@ -161,6 +181,61 @@ def _upsert_secret(resolution: Resolution, *, key: str, value: str) -> None:
     client.upsert_secret(resolution.project, resolution.config, key, value)
 
 
+BULK_UPLOAD_CHUNK = 500
+
+
+def _upload_error(exc: ApiError) -> str:
+    return f"{exc.message} (status={exc.status_code})"
+
+
+def _upload_per_key(
+    client: ApiClient, project: str, config: str, chunk: dict[str, str]
+) -> list[tuple[str, str]]:
+    failures: list[tuple[str, str]] = []
+    for key in sorted(chunk):
+        try:
+            client.upsert_secret(project, config, key, chunk[key])
+        except ApiError as exc:
+            failures.append((key, _upload_error(exc)))
+    return failures
+
+
+def _upload_chunk(
+    client: ApiClient, resolution: Resolution, chunk: dict[str, str]
+) -> list[tuple[str, str]]:
+    """Upload one chunk in bulk; returns ``(key, error)`` failures.
+
+    Keys the server rejects are reported and the rest are sent again.
+    Servers without the bulk endpoint get one request per key instead.
+    """
+    project, config = str(resolution.project), str(resolution.config)
+    try:
+        client.upsert_secrets(project, config, chunk)
+        return []
+    except ApiError as exc:
+        if exc.status_code in (404, 405):
+            return _upload_per_key(client, project, config, chunk)
+        body = exc.body if isinstance(exc.body, dict) else {}
+        errors = body.get("errors")
+        if (
+            exc.status_code != 400
+            or not isinstance(errors, dict)
+            or not set(errors) & set(chunk)
+        ):
+            return [(key, _upload_error(exc)) for key in sorted(chunk)]
+    failures = [
+        (key, f"{errors[key]} (status=400)")
+        for key in sorted(chunk)
+        if key in errors
+    ]
+    remaining = {
+        key: value for key, value in chunk.items() if key not in errors
+    }
+    if remaining:
+        failures.extend(_upload_chunk(client, resolution, remaining))
+    return sorted(failures)
+
+
 def _read_text(path: Path) -> str:
     try:
         return path.read_text(encoding="utf-8")
@@ -310,6 +385,39 @@ def auth_set_token(
     )
 
 
+@auth_cmd.command(
+    "revoke-tokens",
+    help="Revoke every live token for a user, service or creator",
+)
+@click.option("--user", "subject_user", default=None, help="Token subject")
+@click.option(
+    "--service", "subject_service_name", default=None, help="Service name"
+)
+@click.option("--created-by", default=None, help="Token creator")
+@click.option("--base-url", default=None, help="Base URL override")
+@click.option("--profile", default=None, help="Profile name")
+@_handle_errors
+def auth_revoke_tokens(
+    subject_user: str | None,
+    subject_service_name: str | None,
+    created_by: str | None,
+    base_url: str | None,
+    profile: str | None,
+) -> None:
+    if not (subject_user or subject_service_name or created_by):
+        raise CliError(
+            "Pass at least one of --user, --service or --created-by.",
+            exit_code=2,
+        )
+    client = _workspace_client(base_url, profile)
+    revoked = client.revoke_tokens(
+        subject_user=subject_user,
+        subject_service_name=subject_service_name,
+        created_by=created_by,
+    )
+    console.print(f"Revoked {revoked} token(s).")
+
+
 @cli.command(help="Login with username/password and store returned token")
 @click.option("--username", prompt=True, help="Username")
 @click.option("--password", prompt=True, hide_input=True, help="Password")
@@ -675,15 +783,17 @@ def secrets_upload(
         profile=profile,
     )
 
+    client = ApiClient(str(resolution.base_url), token=resolution.token)
     failures: list[tuple[str, str]] = []
-    succeeded = 0
+    keys = sorted(payload.keys())
+    for start in range(0, len(keys), BULK_UPLOAD_CHUNK):
+        chunk = {
+            key: payload[key]
+            for key in keys[start : start + BULK_UPLOAD_CHUNK]
+        }
+        failures.extend(_upload_chunk(client, resolution, chunk))
     total = len(payload)
-    for key in sorted(payload.keys()):
-        try:
-            _upsert_secret(resolution, key=key, value=payload[key])
-            succeeded += 1
-        except ApiError as exc:
-            failures.append((key, f"{exc.message} (status={exc.status_code})"))
+    succeeded = total - len(failures)
 
     console.print(
         f"Upload complete: total={total}, succeeded={succeeded}, "
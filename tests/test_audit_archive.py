@@ -0,0 +1,165 @@
+import gzip
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from bson import ObjectId
+
+from Engines.audit import AuditEvents
+
+
+class FakeCursor(list):
+    def sort(self, keys, direction=None):
+        keys = keys if isinstance(keys, list) else [(keys, direction)]
+        docs = list(self)
+        for field, order in reversed(keys):
+            docs.sort(key=lambda doc, f=field: doc.get(f), reverse=order == -1)
+        return FakeCursor(docs)
+
+    def limit(self, amount):
+        return FakeCursor(self[:amount])
+
+
+OPERATORS = {
+    "$in": lambda current, bound: current in bound,
+    "$lt": lambda current, bound: current < bound,
+    "$gt": lambda current, bound: current > bound,
+    "$gte": lambda current, bound: current >= bound,
+    "$lte": lambda current, bound: current <= bound,
+}
+
+
+class FakeCollection:
+    def __init__(self, docs):
+        self.docs = docs
+        self.fail_deletes = 0
+
+    def create_index(self, *_args, **_kwargs):
+        return None
+
+    def drop_index(self, *_args, **_kwargs):
+        return None
+
+    @staticmethod
+    def _match(doc, query):
+        for key, value in query.items():
+            if key == "$or":
+                return any(FakeCollection._match(doc, q) for q in value)
+            if key == "$and":
+                return all(FakeCollection._match(doc, q) for q in value)
+            current = doc.get(key)
+            if not isinstance(value, dict):
+                if current != value:
+                    return False
+                continue
+            if not all(
+                OPERATORS[op](current, bound) for op, bound in value.items()
+            ):
+                return False
+        return True
+
+    def find(self, query, _projection=None):
+        return FakeCursor(d for d in self.docs if self._match(d, query))
+
+    def delete_many(self, query):
+        if self.fail_deletes:
+            self.fail_deletes -= 1
+            raise RuntimeError("connection reset")
+        self.docs = [d for d in self.docs if not self._match(d, query)]
+
+
+NOW = datetime(2026, 6, 1, tzinfo=timezone.utc)
+
+
+def _events():
+    return [
+        {
+            "_id": ObjectId(),
+            "ts": NOW - timedelta(days=days, minutes=minute),
+            "action": "secrets.read",
+            "project_slug": "app" if minute % 2 else "other",
+        }
+        for days in (200, 100, 1)
+        for minute in range(4)
+    ]
+
+
+def _audit(monkeypatch, tmp_path, docs):
+    monkeypatch.setenv("AUDIT_ARCHIVE_DIR", str(tmp_path))
+    monkeypatch.setenv("AUDIT_ARCHIVE_AFTER_DAYS", "90")
+    monkeypatch.setenv("AUDIT_ARCHIVE_SECONDS", "0")
+    monkeypatch.setenv("AUDIT_ARCHIVE_BATCH_SIZE", "3")
+    return AuditEvents(FakeCollection(docs))
+
+
+def test_archive_moves_old_events_to_daily_files(monkeypatch, tmp_path):
+    docs = _events()
+    audit = _audit(monkeypatch, tmp_path, docs)
+
+    assert audit.archive_events(now=NOW) == 8
+    assert len(audit._events.docs) == 4
+
+    manifest = json.loads((tmp_path / "manifest.json").read_text())
+    assert manifest["archived_until"] == "2026-03-03T00:00:00Z"
+    assert sum(entry["count"] for entry in manifest["files"]) == 8
+    first = manifest["files"][0]
+    lines = gzip.decompress((tmp_path / first["path"]).read_bytes())
+    assert first["path"].endswith(".ndjson.gz")
+    assert len(lines.splitlines()) == first["count"]
+
+
+def test_pages_and_exports_continue_into_archive(monkeypatch, tmp_path):
+    docs = _events()
+    expected = sorted(docs, key=lambda doc: doc["ts"], reverse=True)
+    audit = _audit(monkeypatch, tmp_path, list(docs))
+    audit.archive_events(now=NOW)
+
+    seen, cursor = [], None
+    while True:
+        page = audit.query_events_page(limit=5, cursor=cursor)
+        seen.extend(event["ts"] for event in page["events"])
+        cursor = page["next_cursor"]
+        if not page["has_next"]:
+            break
+    assert len(seen) == len(expected)
+    assert seen == sorted(seen, reverse=True)
+
+    exported = list(audit.export_events(project_slug="app"))
+    assert [event["project_slug"] for event in exported] == ["app"] * 6
+    assert [event["ts"] for event in exported] == sorted(
+        event["ts"] for event in exported
+    )
+    resumed = list(
+        audit.export_events(project_slug="app", cursor=exported[1]["cursor"])
+    )
+    assert resumed == exported[2:]
+
+
+def test_archive_pass_does_not_run_at_exit(monkeypatch, tmp_path):
+    monkeypatch.setenv("AUDIT_ARCHIVE_DIR", str(tmp_path))
+    monkeypatch.setenv("AUDIT_ARCHIVE_SECONDS", "3600")
+    audit = AuditEvents(FakeCollection(_events()))
+
+    audit._archive._worker.shutdown()
+
+    assert len(audit._events.docs) == 12
+    assert audit._archive.archived == 0
+
+
+def test_failed_delete_is_not_archived_twice(monkeypatch, tmp_path):
+    docs = _events()
+    audit = _audit(monkeypatch, tmp_path, docs)
+    audit._events.fail_deletes = 1
+
+    with pytest.raises(RuntimeError):
+        audit.archive_events(now=NOW)
+    assert len(audit._events.docs) == 12
+    assert audit.archive_events(now=NOW) == 5
+    assert len(audit._events.docs) == 4
+
+    manifest = json.loads((tmp_path / "manifest.json").read_text())
+    assert sum(entry["count"] for entry in manifest["files"]) == 8
+    archived = list(audit._archive.iter_events({}))
+    assert sorted(str(event["_id"]) for event in archived) == sorted(
+        str(doc["_id"]) for doc in docs if doc["ts"] < NOW - timedelta(90)
+    )
@@ -0,0 +1,145 @@
+from datetime import datetime, timezone
+
+from bson import ObjectId
+
+from Engines.audit import AuditEvents
+
+
+class FakeProjects:
+    def __init__(self, slugs):
+        self.docs = {slug: {"_id": ObjectId(), "slug": slug} for slug in slugs}
+        self.lookups = 0
+
+    def get_by_slug(self, slug):
+        self.lookups += 1
+        return self.docs.get(slug)
+
+
+class FakeConfigs:
+    def __init__(self):
+        self.docs = {}
+
+    def add(self, project_id, slug):
+        self.docs[(project_id, slug)] = {"_id": ObjectId(), "slug": slug}
+        return self.docs[(project_id, slug)]
+
+    def get_by_slug(self, project_id, slug):
+        return self.docs.get((project_id, slug))
+
+
+class FakeCursor(list):
+    def limit(self, amount):
+        return FakeCursor(self[:amount])
+
+    def sort(self, *_args, **_kwargs):
+        return self
+
+    def skip(self, amount):
+        return FakeCursor(self[amount:])
+
+
+class FakeEvents:
+    def __init__(self, docs=()):
+        self.docs = [{"_id": ObjectId(), **doc} for doc in docs]
+        self.queries = []
+
+    def create_index(self, *_args, **_kwargs):
+        return None
+
+    def drop_index(self, *_args, **_kwargs):
+        return None
+
+    def insert_many(self, docs, **_kwargs):
+        self.docs.extend(docs)
+
+    @staticmethod
+    def _missing(query):
+        return query == {"project_id": {"$exists": False}}
+
+    def find(self, query, _projection=None):
+        self.queries.append(query)
+        if self._missing(query):
+            return FakeCursor(
+                doc for doc in self.docs if "project_id" not in doc
+            )
+        return FakeCursor(self.docs)
+
+    def find_one(self, query):
+        return next(iter(self.find(query)), None)
+
+    def update_many(self, query, update):
+        ids = set(query["_id"]["$in"])
+        for doc in self.docs:
+            if doc["_id"] in ids:
+                doc.update(update["$set"])
+
+
+def _engines():
+    projects = FakeProjects(["app"])
+    configs = FakeConfigs()
+    config = configs.add(projects.docs["app"]["_id"], "dev")
+    return projects, configs, config
+
+
+def test_written_events_get_canonical_ids(monkeypatch):
+    monkeypatch.setenv("AUDIT_FLUSH_SECONDS", "0")
+    projects, configs, config = _engines()
+    events = FakeEvents()
+    audit = AuditEvents(
+        events, projects_engine=projects, configs_engine=configs
+    )
+
+    for _ in range(3):
+        audit.write_event({"project_slug": "app", "config_slug": "dev"})
+    audit.write_event({"action": "tokens.create"})
+
+    project_id = str(projects.docs["app"]["_id"])
+    assert [doc["project_id"] for doc in events.docs] == [project_id] * 3 + [
+        None
+    ]
+    assert events.docs[0]["config_id"] == str(config["_id"])
+    assert events.docs[3]["config_id"] is None
+    assert projects.lookups == 1
+
+
+def test_backfill_fills_legacy_events_then_queries_use_ids(monkeypatch):
+    monkeypatch.setenv("AUDIT_BACKFILL_SECONDS", "0")
+    monkeypatch.setenv("AUDIT_BACKFILL_BATCH_SIZE", "2")
+    projects, configs, config = _engines()
+    legacy_config_id = str(ObjectId())
+    events = FakeEvents(
+        [
+            {"project_slug": "app", "config_slug": "dev"},
+            {"project_slug": "app", "config_id": legacy_config_id},
+            {"project_slug": "gone"},
+        ]
+    )
+    audit = AuditEvents(
+        events, projects_engine=projects, configs_engine=configs
+    )
+    project_id = str(projects.docs["app"]["_id"])
+    scope = {"project_slug": "app", "project_id": project_id}
+
+    audit.query_events_page(**scope)
+    assert "$or" in events.queries[-1]
+
+    identity = audit._identity
+    assert identity.backfill_once() == 2
+    assert identity.backfill_once() == 1
+    assert identity.backfill_once() == 0
+    assert identity.complete is True
+    assert [doc["project_id"] for doc in events.docs] == [
+        project_id,
+        project_id,
+        None,
+    ]
+    assert events.docs[0]["config_id"] == str(config["_id"])
+    assert events.docs[1]["config_id"] == legacy_config_id
+
+    audit.query_events_page(
+        since=datetime(2026, 1, 1, tzinfo=timezone.utc), **scope
+    )
+    assert events.queries[-1] == {
+        "project_id": project_id,
+        "ts": {"$gte": datetime(2026, 1, 1, tzinfo=timezone.utc)},
+    }
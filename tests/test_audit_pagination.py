@@ -1,5 +1,7 @@
 from datetime import datetime, timedelta, timezone
 
+from bson import ObjectId
+
 from Engines.audit import AuditEvents
 
 
@@ -7,9 +9,13 @@ class FakeCursor:
     def __init__(self, docs):
         self.docs = docs
 
-    def sort(self, key, direction):
-        reverse = direction == -1
-        self.docs.sort(key=lambda item: item.get(key), reverse=reverse)
+    def sort(self, key, direction=None):
+        keys = key if isinstance(key, list) else [(key, direction)]
+        for field, order in reversed(keys):
+            self.docs.sort(
+                key=lambda item, field=field: item.get(field),
+                reverse=order == -1,
+            )
         return self
 
     def skip(self, amount):
@@ -20,17 +26,43 @@ class FakeCursor:
         self.docs = self.docs[:amount]
         return self
 
+    def batch_size(self, amount):
+        self.batch = amount
+        return self
+
+    def hint(self, index):
+        self.hinted = index
+        return self
+
     def __iter__(self):
         return iter(self.docs)
 
 
 class FakeCollection:
     def __init__(self, docs):
+        for doc in docs:
+            doc.setdefault("_id", ObjectId())
         self.docs = docs
 
     def create_index(self, *_args, **_kwargs):
         return None
 
+    OPERATORS = {
+        "$gt": lambda current, bound: current > bound,
+        "$gte": lambda current, bound: current >= bound,
+        "$lt": lambda current, bound: current < bound,
+        "$lte": lambda current, bound: current <= bound,
+    }
+
+    @classmethod
+    def _match_value(cls, current, value):
+        if isinstance(value, dict):
+            return current is not None and all(
+                cls.OPERATORS[op](current, bound)
+                for op, bound in value.items()
+            )
+        return current == value
+
     def _match(self, doc, query):
         for key, value in query.items():
             if key == "$and":
@@ -41,21 +73,16 @@ class FakeCollection:
                 if not any(self._match(doc, clause) for clause in value):
                     return False
                 continue
-
-            current = doc.get(key)
-            if isinstance(value, dict) and "$gte" in value:
-                if current is None or current < value["$gte"]:
-                    return False
-                continue
-            if current != value:
+            if not self._match_value(doc.get(key), value):
                 return False
         return True
 
     def find(self, query, projection=None):
         _ = projection
-        return FakeCursor(
+        self.last_cursor = FakeCursor(
             [doc for doc in self.docs if self._match(doc, query)]
         )
+        return self.last_cursor
 
 
 def test_query_events_page_returns_ordered_slice_with_has_next():
@@ -106,3 +133,112 @@ def test_query_events_page_applies_filters_and_since():
     )
     assert filtered["has_next"] is False
     assert [event["action"] for event in filtered["events"]] == ["a-late"]
+
+
+def test_query_events_page_cursor_walks_every_event_once():
+    base = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    # Two events share each timestamp so the _id tie-breaker matters.
+    docs = [
+        {"_id": i, "ts": base + timedelta(minutes=i // 2), "action": f"a{i}"}
+        for i in range(7)
+    ]
+    audit = AuditEvents(FakeCollection(docs))
+
+    seen = []
+    cursor = None
+    while True:
+        result = audit.query_events_page(limit=3, cursor=cursor)
+        seen.extend(event["action"] for event in result["events"])
+        assert all("_id" not in event for event in result["events"])
+        cursor = result["next_cursor"]
+        if not result["has_next"]:
+            assert cursor is None
+            break
+
+    assert seen == [f"a{i}" for i in reversed(range(7))]
+
+
+def test_query_events_page_rejects_malformed_cursor():
+    audit = AuditEvents(FakeCollection([]))
+    try:
+        audit.query_events_page(cursor="not-a-cursor")
+    except ValueError as exc:
+        assert str(exc) == "Invalid cursor"
+    else:
+        raise AssertionError("expected ValueError")
+
+
+def test_export_events_streams_oldest_first_and_resumes_from_cursor():
+    base = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    docs = [
+        {"_id": i, "ts": base + timedelta(minutes=i // 2), "action": f"a{i}"}
+        for i in range(8)
+    ]
+    audit = AuditEvents(FakeCollection(docs))
+    window = {
+        "since": base + timedelta(minutes=1),
+        "until": base + timedelta(minutes=4),
+    }
+
+    events = list(audit.export_events(**window))
+    assert [event["action"] for event in events] == [
+        f"a{i}" for i in range(2, 8)
+    ]
+    assert all("_id" not in event for event in events)
+
+    resumed = audit.export_events(cursor=events[2]["cursor"], **window)
+    assert [event["action"] for event in resumed] == ["a5", "a6", "a7"]
+
+
+def test_attribute_filters_narrow_results_and_hint_selective_index():
+    base = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    docs = [
+        {
+            "ts": base + timedelta(minutes=i),
+            "action": "secrets.read" if i % 2 else "secrets.write",
+            "token_id": "leaked" if i < 4 else "other",
+            "actor_id": "svc",
+            "status_code": 403 if i == 3 else 200,
+            "project_slug": "app",
+        }
+        for i in range(6)
+    ]
+    collection = FakeCollection(docs)
+    audit = AuditEvents(collection)
+
+    page = audit.query_events_page(
+        project_slug="app", token_id="leaked", action="secrets.read"
+    )
+    assert [event["ts"][:16] for event in page["events"]] == [
+        "2026-01-01T00:03",
+        "2026-01-01T00:01",
+    ]
+    assert collection.last_cursor.hinted == [
+        ("token_id", 1),
+        ("ts", -1),
+        ("_id", -1),
+    ]
+
+    page = audit.query_events_page(actor_id="svc", status_min=400)
+    assert [event["status_code"] for event in page["events"]] == [403]
+    assert collection.last_cursor.hinted[0] == ("actor_id", 1)
+
+    page = audit.query_events_page(status_max=299)
+    assert len(page["events"]) == 5
+    assert not hasattr(collection.last_cursor, "hinted")
+
+
+def test_superseded_field_ts_indexes_are_dropped():
+    class IndexRecorder(FakeCollection):
+        def __init__(self):
+            super().__init__([])
+            self.dropped = []
+
+        def drop_index(self, name):
+            self.dropped.append(name)
+
+    collection = IndexRecorder()
+    AuditEvents(collection)
+
+    assert "project_id_1_ts_-1" in collection.dropped
+    assert "token_id_1_ts_-1" in collection.dropped
@@ -0,0 +1,69 @@
+from datetime import datetime, timezone
+
+from Engines.audit_policy import AuditPolicies, parse_policies
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _read(key="API_KEY", status=200, latency=10):
+    return {
+        "ts": datetime(2026, 1, 1, tzinfo=timezone.utc),
+        "action": "secrets.read",
+        "actor_id": "svc",
+        "project_slug": "app",
+        "config_slug": "dev",
+        "key": key,
+        "status_code": status,
+        "latency_ms": latency,
+    }
+
+
+def test_parse_policies_only_relaxes_reads():
+    policies = parse_policies(
+        "secrets.read=sample:10, secrets.write=sample:10,"
+        "secrets.export=collapse:60, config.read=collapse:30, x.read=bogus"
+    )
+    assert policies == {
+        "secrets.read": ("sample", 10),
+        "config.read": ("collapse", 30.0),
+    }
+
+
+def test_sample_keeps_one_in_n_and_failures_always():
+    written = []
+    policies = AuditPolicies("secrets.read=sample:3", written.append)
+
+    admitted = [policies.admit(_read()) for _ in range(6)]
+    kept = [event for event in admitted if event is not None]
+
+    assert [event["sample_rate"] for event in kept] == [3, 3]
+    assert policies.admit(_read(status=403)) is not None
+    assert policies.admit({"action": "secrets.write"}) is not None
+    assert policies.stats()["sampledOut"] == 4
+
+
+def test_collapse_folds_identical_reads_within_window():
+    written = []
+    clock = Clock()
+    policies = AuditPolicies(
+        "secrets.read=collapse:60", written.append, clock=clock
+    )
+
+    for latency in (10, 20, 30):
+        assert policies.admit(_read(latency=latency)) is None
+    policies.admit(_read(key="OTHER"))
+    assert written == []
+
+    clock.now += 61
+    assert policies.flush_closed() == 2
+    by_key = {event["key"]: event for event in written}
+    assert by_key["API_KEY"]["count"] == 3
+    assert by_key["API_KEY"]["latency_ms"] == 20
+    assert by_key["OTHER"]["count"] == 1
+    assert policies.stats()["collapsed"] == 2
@@ -0,0 +1,143 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from Engines.audit import AuditEvents
+
+
+class Cursor(list):
+    def sort(self, key, direction=1):
+        return Cursor(
+            sorted(self, key=lambda doc: doc[key], reverse=direction < 0)
+        )
+
+
+class RollupCollection:
+    def __init__(self):
+        self.docs = []
+        self.bulk_calls = 0
+
+    def create_index(self, *_args, **_kwargs):
+        return None
+
+    def bulk_write(self, operations, **_kwargs):
+        self.bulk_calls += 1
+        for operation in operations:
+            finder, update = operation._filter, operation._doc
+            doc = next(
+                (
+                    doc
+                    for doc in self.docs
+                    if all(doc.get(k) == v for k, v in finder.items())
+                ),
+                None,
+            )
+            if doc is None:
+                doc = dict(finder)
+                self.docs.append(doc)
+            for field, amount in update["$inc"].items():
+                doc[field] = doc.get(field, 0) + amount
+            for field, value in update["$max"].items():
+                doc[field] = max(doc.get(field, value), value)
+
+    def find(self, query, _projection=None):
+        def matches(doc):
+            for field, expected in query.items():
+                value = doc.get(field)
+                if isinstance(expected, dict):
+                    if "$gte" in expected and value < expected["$gte"]:
+                        return False
+                    if "$lt" in expected and value >= expected["$lt"]:
+                        return False
+                elif value != expected:
+                    return False
+            return True
+
+        return Cursor(dict(doc) for doc in self.docs if matches(doc))
+
+
+class EventCollection:
+    def __init__(self):
+        self.docs = []
+        self.indexes = []
+        self.dropped = []
+
+    def create_index(self, keys, **kwargs):
+        self.indexes.append((keys, kwargs))
+
+    def drop_index(self, name):
+        self.dropped.append(name)
+
+    def insert_many(self, docs, **_kwargs):
+        self.docs.extend(docs)
+
+
+def _audit(monkeypatch):
+    monkeypatch.setenv("AUDIT_FLUSH_SECONDS", "0")
+    rollups = RollupCollection()
+    return AuditEvents(EventCollection(), rollups_col=rollups), rollups
+
+
+def _event(audit, ts, action="secrets.read", status=200, latency=10):
+    audit._writer.submit(
+        {
+            "ts": ts,
+            "project_slug": "app",
+            "config_slug": "dev",
+            "action": action,
+            "status_code": status,
+            "latency_ms": latency,
+        }
+    )
+
+
+def test_written_events_fold_into_hourly_rollups(monkeypatch):
+    audit, rollups = _audit(monkeypatch)
+    base = datetime(2026, 1, 1, 10, 5, tzinfo=timezone.utc)
+    _event(audit, base, latency=10)
+    _event(audit, base + timedelta(minutes=20), latency=30)
+    _event(audit, base + timedelta(hours=1), status=403, latency=5)
+
+    buckets = audit.query_rollups(project_slug="app")
+
+    assert rollups.bulk_calls == 3
+    assert [(b["status_code"], b["count"]) for b in buckets] == [
+        (200, 2),
+        (403, 1),
+    ]
+    assert buckets[0]["latency_ms_avg"] == 20
+    assert buckets[0]["latency_ms_max"] == 30
+    assert buckets[0]["bucket_end"] == "2026-01-01T11:00:00Z"
+
+
+def test_day_granularity_merges_hours(monkeypatch):
+    audit, _ = _audit(monkeypatch)
+    base = datetime(2026, 1, 1, 1, tzinfo=timezone.utc)
+    for hours in (0, 5, 30):
+        _event(audit, base + timedelta(hours=hours))
+
+    buckets = audit.query_rollups(project_slug="app", granularity="day")
+    assert [b["count"] for b in buckets] == [2, 1]
+
+    since = datetime(2026, 1, 2, tzinfo=timezone.utc)
+    buckets = audit.query_rollups(since=since, granularity="day")
+    assert [b["count"] for b in buckets] == [1]
+
+    with pytest.raises(ValueError):
+        audit.query_rollups(granularity="week")
+
+
+def test_retention_days_controls_ttl_index(monkeypatch):
+    monkeypatch.setenv("AUDIT_RETENTION_DAYS", "7")
+    events = EventCollection()
+    AuditEvents(events)
+    ttl = [kwargs for _, kwargs in events.indexes if kwargs]
+    assert ttl == [{"name": "ts_ttl", "expireAfterSeconds": 7 * 86400}]
+
+    monkeypatch.setenv("AUDIT_RETENTION_DAYS", "0")
+    events = EventCollection()
+    AuditEvents(events)
+    legacy = [f"{name}_1_ts_-1" for name in AuditEvents.LEGACY_INDEXED_FIELDS]
+    assert [name for name in events.dropped if name not in legacy] == [
+        "ts_ttl"
+    ]
@@ -0,0 +1,77 @@
+from datetime import datetime, timedelta, timezone
+
+from Engines.audit import AuditEvents
+from Engines.audit_stats import summarize_routes
+
+
+def _row(route, latency, count, errors=0, action="secrets.read"):
+    return {
+        "_id": {
+            "route": route,
+            "method": "GET",
+            "action": action,
+            "latency_ms": latency,
+        },
+        "count": count,
+        "errors": errors,
+    }
+
+
+def test_summarize_routes_computes_percentiles_and_rates():
+    route = "/api/secrets/<project_slug>/<config_slug>/<key>"
+    rows = [
+        _row(route, 5, 90),
+        _row(route, 40, 8, errors=2),
+        _row(route, 400, 2, errors=2),
+        _row("/api/audit/events", 12, 1, action=None),
+    ]
+
+    summary = summarize_routes(rows, window_seconds=600)
+
+    assert [item["route"] for item in summary] == [route, "/api/audit/events"]
+    top = summary[0]
+    assert top["count"] == 100
+    assert top["error_rate"] == 0.04
+    assert top["throughput_per_minute"] == 10
+    assert top["latency_ms"] == {"p50": 5, "p95": 40, "p99": 400, "max": 400}
+
+
+def test_untimed_events_count_toward_errors_only():
+    rows = [_row("/api/auth/tokens", None, 3, errors=3, action="auth.fail")]
+
+    (entry,) = summarize_routes(rows, window_seconds=60)
+
+    assert entry["error_rate"] == 1
+    assert entry["latency_ms"]["p99"] is None
+
+
+class AggregateCollection:
+    def __init__(self):
+        self.pipelines = []
+
+    def create_index(self, *_args, **_kwargs):
+        return None
+
+    def drop_index(self, *_args, **_kwargs):
+        return None
+
+    def aggregate(self, pipeline):
+        self.pipelines.append(pipeline)
+        return [_row("/api/projects", 7, 4)]
+
+
+def test_route_stats_matches_the_requested_window():
+    events = AggregateCollection()
+    audit = AuditEvents(events)
+    until = datetime(2026, 1, 1, 12, tzinfo=timezone.utc)
+    since = until - timedelta(minutes=2)
+
+    stats = audit.route_stats(since, until, project_slug="app")
+
+    match = events.pipelines[0][0]["$match"]
+    assert match == {
+        "project_slug": "app",
+        "ts": {"$gte": since, "$lt": until},
+    }
+    assert stats["total_routes"] == 1
+    assert stats["routes"][0]["throughput_per_minute"] == 2
@@ -0,0 +1,261 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from bson import ObjectId
+from pymongo.errors import CollectionInvalid, DuplicateKeyError
+
+from Engines.audit import AuditEvents
+
+
+class FakeCursor(list):
+    def sort(self, key, direction=None):
+        keys = key if isinstance(key, list) else [(key, direction)]
+        docs = list(self)
+        for field, order in reversed(keys):
+            docs.sort(key=lambda doc, f=field: doc.get(f), reverse=order == -1)
+        return FakeCursor(docs)
+
+    def limit(self, amount):
+        return FakeCursor(self[:amount])
+
+    def skip(self, amount):
+        return FakeCursor(self[amount:])
+
+
+def _lookup(doc, path):
+    for part in path.split("."):
+        doc = (doc or {}).get(part)
+    return doc
+
+
+class FakeCollection:
+    def __init__(self, name, database, docs=()):
+        self.name = name
+        self.database = database
+        self.docs = [dict(doc) for doc in docs]
+        self.fail_deletes = 0
+
+    def create_index(self, *_args, **_kwargs):
+        return None
+
+    def _match(self, doc, query):
+        for key, value in query.items():
+            if key == "$and":
+                if not all(self._match(doc, clause) for clause in value):
+                    return False
+            elif isinstance(value, dict):
+                current = _lookup(doc, key)
+                if "$in" in value and current not in value["$in"]:
+                    return False
+                if "$gte" in value and current < value["$gte"]:
+                    return False
+                if "$lte" in value and current > value["$lte"]:
+                    return False
+            elif _lookup(doc, key) != value:
+                return False
+        return True
+
+    def find(self, query, _projection=None):
+        return FakeCursor(doc for doc in self.docs if self._match(doc, query))
+
+    def find_one(self, query, sort=None):
+        found = self.find(query)
+        if sort:
+            found = found.sort(sort)
+        return found[0] if found else None
+
+    def insert_one(self, doc):
+        if self.find_one({"_id": doc["_id"]}) or (
+            "kind" in doc
+            and self.find_one({"kind": doc["kind"], "value": doc["value"]})
+        ):
+            raise DuplicateKeyError("duplicate")
+        self.docs.append(doc)
+
+    def insert_many(self, docs, **_kwargs):
+        for doc in docs:
+            doc.setdefault("_id", ObjectId())
+        self.docs.extend(docs)
+
+    def delete_many(self, query):
+        if self.fail_deletes:
+            self.fail_deletes -= 1
+            raise ConnectionError("connection reset")
+        self.docs = [doc for doc in self.docs if not self._match(doc, query)]
+
+
+class FakeDatabase:
+    def __init__(self):
+        self.collections = {}
+        self.created = {}
+        self.commands = []
+
+    def __getitem__(self, name):
+        if name not in self.collections:
+            self.collections[name] = FakeCollection(name, self)
+        return self.collections[name]
+
+    def create_collection(self, name, **options):
+        if name in self.created:
+            raise CollectionInvalid(name)
+        self.created[name] = options
+        return self[name]
+
+    def command(self, *args, **kwargs):
+        self.commands.append((args, kwargs))
+
+
+def _legacy_event(minutes, action):
+    return {
+        "_id": ObjectId(),
+        "ts": datetime(2026, 1, 1, tzinfo=timezone.utc)
+        + timedelta(minutes=minutes),
+        "action": action,
+        "project_slug": "app",
+        "actor_type": "user",
+        "actor_id": "alice",
+        "user_agent": "ssm-cli/1.0",
+        "status_code": 200,
+    }
+
+
+def test_timeseries_mode_round_trips_events_and_migrates(monkeypatch):
+    monkeypatch.setenv("AUDIT_STORAGE", "timeseries")
+    monkeypatch.setenv("AUDIT_FLUSH_SECONDS", "0")
+    monkeypatch.setenv("AUDIT_RETENTION_DAYS", "30")
+    database = FakeDatabase()
+    legacy = database["audit_events"]
+    legacy.docs = [
+        _legacy_event(0, "secrets.read"),
+        _legacy_event(1, "secrets.write"),
+    ]
+    before = [
+        {k: v for k, v in doc.items() if k != "_id"} for doc in legacy.docs
+    ]
+
+    audit = AuditEvents(legacy)
+    assert audit._migration.run_once() == 2
+    assert audit._migration.run_once() == 0
+    assert legacy.docs == []
+
+    options = database.created["audit_events_ts"]
+    assert options["timeseries"]["metaField"] == "meta"
+    assert options["expireAfterSeconds"] == 30 * 86400
+
+    stored = database["audit_events_ts"].docs
+    assert stored[0]["meta"] == {
+        "project_slug": "app",
+        "actor_type": "user",
+        "actor_id": "alice",
+    }
+    assert isinstance(stored[0]["action"], int)
+    assert stored[0]["user_agent"] == "ssm-cli/1.0"
+    assert len(database["audit_events_dictionary"].docs) == 2
+
+    page = audit.query_events_page(project_slug="app", limit=10)
+    assert page["events"] == [
+        {**event, "ts": event["ts"].isoformat().replace("+00:00", "Z")}
+        for event in reversed(before)
+    ]
+
+
+def test_dictionary_codes_survive_restart(monkeypatch):
+    monkeypatch.setenv("AUDIT_STORAGE", "timeseries")
+    monkeypatch.setenv("AUDIT_FLUSH_SECONDS", "0")
+    database = FakeDatabase()
+    first = AuditEvents(database["audit_events"])
+    first.write_event({"action": "secrets.read", "project_slug": "app"})
+
+    second = AuditEvents(database["audit_events"])
+    second.write_event({"action": "secrets.read", "project_slug": "app"})
+
+    codes = {doc["action"] for doc in database["audit_events_ts"].docs}
+    assert len(codes) == 1
+    events = second.query_events_page(project_slug="app")["events"]
+    assert [event["action"] for event in events] == ["secrets.read"] * 2
+    assert second.storage_stats()["mode"] == "timeseries"
+
+
+def test_reads_include_events_not_yet_migrated(monkeypatch):
+    monkeypatch.setenv("AUDIT_STORAGE", "timeseries")
+    monkeypatch.setenv("AUDIT_FLUSH_SECONDS", "0")
+    database = FakeDatabase()
+    legacy = database["audit_events"]
+    legacy.docs = [
+        _legacy_event(0, "secrets.read"),
+        _legacy_event(2, "secrets.write"),
+    ]
+    audit = AuditEvents(legacy)
+    audit._migration._worker.stop(flush=False)
+    audit.write_event(
+        {
+            "ts": datetime(2026, 1, 1, 0, 1, tzinfo=timezone.utc),
+            "action": "secrets.delete",
+            "project_slug": "app",
+        }
+    )
+
+    page = audit.query_events_page(project_slug="app", limit=2)
+    exported = list(audit.export_events(project_slug="app"))
+    deleted = audit.query_events_page(action="secrets.delete")
+
+    assert [event["action"] for event in page["events"]] == [
+        "secrets.write",
+        "secrets.delete",
+    ]
+    assert page["has_next"] is True
+    assert [event["action"] for event in exported] == [
+        "secrets.read",
+        "secrets.delete",
+        "secrets.write",
+    ]
+    assert len(deleted["events"]) == 1
+
+
+def test_migration_resumes_after_crash_between_copy_and_delete(
+    monkeypatch,
+):
+    monkeypatch.setenv("AUDIT_STORAGE", "timeseries")
+    monkeypatch.setenv("AUDIT_FLUSH_SECONDS", "0")
+    database = FakeDatabase()
+    legacy = database["audit_events"]
+    legacy.docs = [
+        _legacy_event(0, "secrets.read"),
+        _legacy_event(1, "secrets.write"),
+    ]
+    audit = AuditEvents(legacy)
+    audit._migration._worker.stop(flush=False)
+    legacy.fail_deletes = 1
+
+    with pytest.raises(ConnectionError):
+        audit._migration.run_once()
+    target = database["audit_events_ts"]
+    assert len(legacy.docs) == len(target.docs) == 2
+
+    page = audit.query_events_page(project_slug="app", limit=10)
+    exported = list(audit.export_events(project_slug="app"))
+    assert [event["action"] for event in page["events"]] == [
+        "secrets.write",
+        "secrets.read",
+    ]
+    assert len(exported) == 2
+
+    assert audit._migration.run_once() == 2
+    assert legacy.docs == []
+    assert len(target.docs) == 2
+
+
+def test_archive_is_disabled_before_mongodb_7(monkeypatch, tmp_path):
+    class Client:
+        @staticmethod
+        def server_info():
+            return {"versionArray": [6, 0, 14, 0]}
+
+    monkeypatch.setenv("AUDIT_STORAGE", "timeseries")
+    monkeypatch.setenv("AUDIT_ARCHIVE_DIR", str(tmp_path))
+    database = FakeDatabase()
+    database.client = Client()
+
+    audit = AuditEvents(database["audit_events"])
+
+    assert audit.storage_stats()["archive"] is None
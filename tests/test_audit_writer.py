@@ -0,0 +1,117 @@
+from Engines import background
+from Engines.audit import AuditEvents, _AuditWriter
+
+
+class BatchCollection:
+    def __init__(self):
+        self.docs = []
+        self.batches = []
+        self.insert_one_calls = 0
+
+    def create_index(self, *_args, **_kwargs):
+        return None
+
+    def insert_one(self, doc):
+        self.insert_one_calls += 1
+        self.docs.append(doc)
+
+    def insert_many(self, docs, **_kwargs):
+        self.batches.append(len(docs))
+        self.docs.extend(docs)
+
+
+def test_write_event_is_queued_and_flushed_in_batches(monkeypatch):
+    monkeypatch.setenv("AUDIT_FLUSH_SECONDS", "3600")
+    monkeypatch.setenv("AUDIT_BATCH_SIZE", "4")
+    collection = BatchCollection()
+    audit = AuditEvents(collection)
+
+    for index in range(10):
+        audit.write_event({"action": "secrets.read", "n": index})
+    assert collection.docs == []
+
+    assert audit.flush() == 10
+    assert collection.batches == [4, 4, 2]
+    assert [doc["n"] for doc in collection.docs] == list(range(10))
+    assert all("ts" in doc for doc in collection.docs)
+    stats = audit.writer_stats()
+    assert stats["queued"] == 10
+    assert stats["written"] == 10
+    assert stats["pending"] == 0
+    audit._writer.stop()
+
+
+def test_drop_policy_counts_events_that_do_not_fit(monkeypatch):
+    collection = BatchCollection()
+    writer = _AuditWriter(
+        collection,
+        batch_size=1,
+        flush_interval_seconds=3600,
+        max_queue=2,
+        full_policy="drop",
+    )
+    # Keep the background writer from draining the queue mid-test.
+    monkeypatch.setattr(writer, "_start", lambda: None)
+    results = [writer.submit({"n": index}) for index in range(3)]
+
+    assert results == [True, True, False]
+    assert writer.stats()["dropped"] == 1
+    writer.stop()
+    assert writer.stats()["written"] == 2
+
+
+def test_zero_interval_writes_synchronously(monkeypatch):
+    monkeypatch.setenv("AUDIT_FLUSH_SECONDS", "0")
+    collection = BatchCollection()
+    audit = AuditEvents(collection)
+
+    audit.write_event({"action": "secrets.write"})
+
+    assert len(collection.docs) == 1
+    assert audit.writer_stats()["pending"] == 0
+
+
+def test_shutdown_flushes_collapsed_events_before_writer_stops(monkeypatch):
+    monkeypatch.setattr(background, "_shutdown_hooks", [])
+    monkeypatch.setenv("AUDIT_FLUSH_SECONDS", "3600")
+    monkeypatch.setenv("AUDIT_POLICIES", "secrets.read=collapse:60")
+    collection = BatchCollection()
+    audit = AuditEvents(collection)
+
+    audit.write_event({"action": "secrets.read", "key": "API_KEY"})
+    audit.write_event({"action": "secrets.read", "key": "API_KEY"})
+    background.run_shutdown_hooks()
+
+    assert [doc["count"] for doc in collection.docs] == [2]
+
+
+class ReadableBatchCollection(BatchCollection):
+    class Cursor(list):
+        def sort(self, *_args, **_kwargs):
+            return self
+
+        def hint(self, *_args, **_kwargs):
+            return self
+
+        def limit(self, amount):
+            return type(self)(self[:amount])
+
+    def find(self, *_args, **_kwargs):
+        return self.Cursor(self.docs)
+
+
+def test_reads_do_not_drain_the_write_queue(monkeypatch):
+    monkeypatch.setenv("AUDIT_FLUSH_SECONDS", "3600")
+    collection = ReadableBatchCollection()
+    audit = AuditEvents(collection)
+    monkeypatch.setattr(audit._writer, "_start", lambda: None)
+    for index in range(5):
+        audit.write_event({"action": "secrets.read", "n": index})
+
+    audit.query_events_page(limit=10)
+    list(audit.export_events())
+    audit.query_rollups()
+
+    assert collection.batches == []
+    assert audit.writer_stats()["pending"] == 5
+    assert audit.flush() == 5
@@ -0,0 +1,184 @@
+from Access.auth_failures import AuthFailures
+from Access.tokens import Tokens
+from Access.userpass import User_Pass
+
+
+class FakeClock:
+    def __init__(self, now=1_000_020.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def _tracker(clock, **kwargs):
+    events = []
+    tracker = AuthFailures(
+        events.append, flush_interval_seconds=3600, clock=clock, **kwargs
+    )
+    return tracker, events
+
+
+def test_failures_are_summarized_per_ip_reason_and_minute():
+    clock = FakeClock()
+    tracker, events = _tracker(clock)
+    for _ in range(50):
+        tracker.record("10.0.0.1", "invalid", method="GET", path="/api/a")
+    tracker.record("10.0.0.1", "expired", method="GET", path="/api/b")
+    tracker.record("10.0.0.2", "invalid", method="POST", path="/api/a")
+    assert events == []
+
+    assert tracker.flush_closed() == 0
+    clock.now += 60
+    tracker.record("10.0.0.1", "invalid")
+    assert tracker.flush_closed() == 3
+
+    summary = next(
+        event
+        for event in events
+        if event["ip"] == "10.0.0.1" and event["reason"] == "invalid"
+    )
+    assert summary["action"] == "auth.fail"
+    assert summary["count"] == 50
+    assert summary["path"] == "/api/a"
+    assert tracker.flush() == 1
+    assert tracker.stats()["eventsWritten"] == 4
+
+
+def test_repeat_offenders_are_throttled_until_window_rolls_over():
+    clock = FakeClock()
+    tracker, events = _tracker(clock, throttle_limit=3, window_seconds=60)
+
+    for _ in range(2):
+        tracker.record("10.0.0.1", "invalid")
+    assert not tracker.is_throttled("10.0.0.1")
+    tracker.record("10.0.0.1", "invalid")
+    assert tracker.is_throttled("10.0.0.1")
+    assert not tracker.is_throttled("10.0.0.2")
+
+    tracker.record("10.0.0.1", "throttled")
+    tracker.flush()
+    throttled = next(e for e in events if e["reason"] == "throttled")
+    assert throttled["status_code"] == 429
+
+    clock.now += 61
+    assert not tracker.is_throttled("10.0.0.1")
+
+
+def test_zero_flush_interval_writes_through():
+    events = []
+    tracker = AuthFailures(
+        events.append, flush_interval_seconds=0, clock=FakeClock()
+    )
+    tracker.record("10.0.0.1", "userpass_invalid")
+    assert len(events) == 1
+    assert events[0]["actor_type"] == "user"
+
+
+class CountingCollection:
+    def __init__(self, docs=()):
+        self.docs = list(docs)
+        self.find_calls = 0
+
+    def create_index(self, *_args, **_kwargs):
+        return None
+
+    def find_one(self, query):
+        self.find_calls += 1
+        for doc in self.docs:
+            if all(doc.get(k) == v for k, v in query.items()):
+                return dict(doc)
+        return None
+
+    def insert_one(self, doc):
+        self.docs.append(dict(doc))
+
+    def update_one(self, *_args, **_kwargs):
+        return None
+
+
+def _throttled_tracker():
+    tracker, _ = _tracker(FakeClock(), throttle_limit=1)
+    tracker.record("10.0.0.1", "invalid")
+    assert tracker.is_throttled("10.0.0.1")
+    return tracker
+
+
+def _spy(monkeypatch, engine, name):
+    calls = []
+    check = getattr(engine, name)
+
+    def spy(*args):
+        calls.append(args)
+        return check(*args)
+
+    monkeypatch.setattr(engine, name, spy)
+    return calls
+
+
+def _login(tracker, ip, is_cached, check):
+    # The order Access.is_auth uses: admit first, then verify.
+    if not tracker.admit(ip, is_cached):
+        return 429
+    return 200 if check() else 401
+
+
+def test_throttled_ip_is_refused_before_password_hash(monkeypatch):
+    monkeypatch.setenv("USERPASS_HASH_WORKERS", "0")
+    tracker = _throttled_tracker()
+    col = CountingCollection()
+    users = User_Pass(col)
+    users.register("alice", "Secr3t!pass")
+    calls = _spy(monkeypatch, users, "is_authorized")
+    finds = col.find_calls
+
+    def login(ip, password):
+        return _login(
+            tracker,
+            ip,
+            lambda: users.is_cached("alice", password),
+            lambda: users.is_authorized("alice", password),
+        )
+
+    assert login("10.0.0.1", "Secr3t!pass") == 429
+    assert login("10.0.0.1", "wrong") == 429
+    assert calls == []
+    assert col.find_calls == finds
+    assert tracker.stats()["throttled"] == 2
+
+    assert login("10.0.0.2", "Secr3t!pass") == 200
+    assert login("10.0.0.1", "Secr3t!pass") == 200
+
+
+def test_throttled_ip_is_refused_before_token_lookup(monkeypatch):
+    tracker = _throttled_tracker()
+    col = CountingCollection()
+    tokens = Tokens(col)
+    col.docs.append(
+        {
+            "_id": "1",
+            "token_hash": tokens._hash_token("good"),
+            "type": "service",
+            "expires_at": None,
+            "revoked_at": None,
+            "scopes": [],
+        }
+    )
+    calls = _spy(monkeypatch, tokens, "authenticate")
+
+    def login(ip, token):
+        return _login(
+            tracker,
+            ip,
+            lambda: tokens.is_cached(token),
+            lambda: tokens.authenticate(token)[1] is None,
+        )
+
+    assert login("10.0.0.1", "unknown") == 429
+    assert login("10.0.0.1", "good") == 429
+    assert calls == []
+    assert col.find_calls == 0
+
+    assert login("10.0.0.2", "good") == 200
+    assert login("10.0.0.1", "good") == 200
+    assert col.find_calls == 1
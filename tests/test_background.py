@@ -0,0 +1,39 @@
+from Engines import background
+from Engines.background import PeriodicWorker
+
+
+def test_shutdown_skips_final_run_by_default():
+    calls = []
+    worker = PeriodicWorker("test-maintenance", 3600, lambda: calls.append(1))
+    worker.start()
+
+    worker.shutdown()
+
+    assert calls == []
+    assert not worker.running
+
+
+def test_shutdown_runs_once_more_when_opted_in():
+    calls = []
+    worker = PeriodicWorker(
+        "test-buffer", 3600, lambda: calls.append(1), final_run=True
+    )
+    worker.start()
+
+    worker.shutdown()
+
+    assert calls == [1]
+
+
+def test_shutdown_hooks_run_by_stage_then_registration(monkeypatch):
+    monkeypatch.setattr(background, "_shutdown_hooks", [])
+    calls = []
+    background.on_shutdown(
+        lambda: calls.append("writer"), stage=background.SHUTDOWN_WRITERS
+    )
+    background.on_shutdown(lambda: calls.append("policies"))
+    background.on_shutdown(lambda: calls.append("auth failures"))
+
+    background.run_shutdown_hooks()
+
+    assert calls == ["policies", "auth failures", "writer"]
@@ -0,0 +1,43 @@
+from Engines.caching import TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_ttl_cache_expires_entries():
+    clock = FakeClock()
+    cache = TTLCache(max_entries=4, ttl_seconds=10, clock=clock)
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+    clock.now = 11
+    assert cache.get("a") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(max_entries=2, ttl_seconds=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.stats()["evictions"] == 1
+
+
+def test_ttl_cache_pop_where_and_disabled_cache():
+    cache = TTLCache(max_entries=4, ttl_seconds=60)
+    cache.set("a", {"user": "alice"})
+    cache.set("b", {"user": "bob"})
+    assert cache.pop_where(lambda _key, value: value["user"] == "alice") == 1
+    assert cache.get("a") is None
+
+    disabled = TTLCache(max_entries=4, ttl_seconds=0)
+    disabled.set("a", 1)
+    assert disabled.get("a") is None
@@ -64,6 +64,25 @@ def test_export_secrets_json_parses_values(monkeypatch):
     assert data == {"API_KEY": "value", "PORT": "8080"}
 
 
+def test_export_secrets_json_revalidates_with_etag(monkeypatch):
+    client = ApiClient("http://localhost:8080", token="t")
+    seen = []
+
+    def fake_request(**kwargs):
+        seen.append(kwargs["headers"].get("If-None-Match"))
+        if seen[-1] == '"abc"':
+            return _response(304, None)
+        response = _response(200, {"data": {"A": "1"}, "status": "OK"})
+        response.headers["ETag"] = '"abc"'
+        return response
+
+    monkeypatch.setattr(client.session, "request", fake_request)
+
+    assert client.export_secrets_json("proj", "cfg") == {"A": "1"}
+    assert client.export_secrets_json("proj", "cfg") == {"A": "1"}
+    assert seen == [None, '"abc"']
+
+
 def test_export_secrets_json_raw_mode_disables_resolution(monkeypatch):
     client = ApiClient("http://localhost:8080", token="t")
 
@@ -125,3 +144,34 @@ def test_upsert_secret_uses_put_with_expected_payload(monkeypatch):
 
     monkeypatch.setattr(client.session, "request", fake_request)
     client.upsert_secret("proj", "dev", "API_KEY", "super-secret")
+
+
+def test_upsert_secrets_posts_bulk_payload(monkeypatch):
+    client = ApiClient("http://localhost:8080", token="t")
+
+    def fake_request(**kwargs):
+        assert kwargs["method"] == "POST"
+        assert kwargs["url"].endswith(
+            "/api/projects/proj/configs/dev/secrets/bulk"
+        )
+        assert kwargs["json"] == {"secrets": {"A": "1", "B": "2"}}
+        return _response(200, {"status": "OK", "written": 2})
+
+    monkeypatch.setattr(client.session, "request", fake_request)
+    assert client.upsert_secrets("proj", "dev", {"A": "1", "B": "2"}) == {
+        "status": "OK",
+        "written": 2,
+    }
+
+
+def test_revoke_tokens_posts_bulk_filter(monkeypatch):
+    client = ApiClient("http://localhost:8080", token="t")
+
+    def fake_request(**kwargs):
+        assert kwargs["method"] == "POST"
+        assert kwargs["url"].endswith("/api/auth/tokens/v2/revoke-bulk")
+        assert kwargs["json"] == {"subject_user": "alice"}
+        return _response(200, {"status": "OK", "revoked": 3})
+
+    monkeypatch.setattr(client.session, "request", fake_request)
+    assert client.revoke_tokens(subject_user="alice") == 3
@@ -1,3 +1,5 @@
+import requests  # type: ignore[import-untyped]
+
 from ssm_cli.api import ApiError
 from ssm_cli.main import _fetch_secrets
 from ssm_cli.resolve import Resolution
@@ -59,3 +61,32 @@ def test_fetch_secrets_raises_when_offline_cache_missing(
         raise AssertionError("Expected failure")
     except Exception as exc:
         assert "No cached secrets found" in str(exc)
+
+
+def test_fetch_secrets_revalidates_cached_etag(monkeypatch, tmp_path):
+    monkeypatch.setenv("SSM_CACHE_DIR", str(tmp_path))
+
+    from ssm_cli.cache import load_secret_cache_etag, save_secret_cache
+
+    save_secret_cache(
+        "http://localhost:8080/api",
+        "project-a",
+        "dev",
+        {"CACHED": "yes"},
+        etag='"v1"',
+    )
+
+    def fake_request(_self, **kwargs):
+        assert kwargs["headers"]["If-None-Match"] == '"v1"'
+        response = requests.Response()
+        response.status_code = 304
+        return response
+
+    monkeypatch.setattr("requests.Session.request", fake_request)
+
+    data, source = _fetch_secrets(_resolution(), offline=False, cache_ttl=0)
+    assert data == {"CACHED": "yes"}
+    assert source == "remote"
+    assert load_secret_cache_etag(
+        "http://localhost:8080/api", "project-a", "dev"
+    ) == ('"v1"', {"CACHED": "yes"})
@@ -80,7 +80,7 @@ def test_secrets_set_requires_single_value_source():
 
 
 def test_secrets_upload_env_file_success(monkeypatch, tmp_path: Path):
-    calls: list[tuple[str, str, str, str]] = []
+    calls: list[tuple[str, str, dict[str, str]]] = []
     env_file = tmp_path / "secrets.env"
     env_file.write_text(
         "# comment\nA=1\nexport B=2\nC=a=b\n",
@@ -91,10 +91,10 @@ def test_secrets_upload_env_file_success(monkeypatch, tmp_path: Path):
         "ssm_cli.main.resolve_context", lambda **_: _resolution()
     )
 
-    def fake_upsert(_self, project, config, key, value):
-        calls.append((project, config, key, value))
+    def fake_bulk(_self, project, config, secrets):
+        calls.append((project, config, secrets))
 
-    monkeypatch.setattr("ssm_cli.main.ApiClient.upsert_secret", fake_upsert)
+    monkeypatch.setattr("ssm_cli.main.ApiClient.upsert_secrets", fake_bulk)
 
     runner = CliRunner()
     result = runner.invoke(
@@ -103,22 +103,20 @@ def test_secrets_upload_env_file_success(monkeypatch, tmp_path: Path):
 
     assert result.exit_code == 0, result.output
     assert calls == [
-        ("payments", "prod", "A", "1"),
-        ("payments", "prod", "B", "2"),
-        ("payments", "prod", "C", "a=b"),
+        ("payments", "prod", {"A": "1", "B": "2", "C": "a=b"}),
     ]
 
 
 def test_secrets_upload_stdin_json_success(monkeypatch):
-    calls: list[tuple[str, str, str, str]] = []
+    calls: list[tuple[str, str, dict[str, str]]] = []
     monkeypatch.setattr(
         "ssm_cli.main.resolve_context", lambda **_: _resolution()
     )
 
-    def fake_upsert(_self, project, config, key, value):
-        calls.append((project, config, key, value))
+    def fake_bulk(_self, project, config, secrets):
+        calls.append((project, config, secrets))
 
-    monkeypatch.setattr("ssm_cli.main.ApiClient.upsert_secret", fake_upsert)
+    monkeypatch.setattr("ssm_cli.main.ApiClient.upsert_secrets", fake_bulk)
 
     runner = CliRunner()
     result = runner.invoke(
@@ -129,8 +127,7 @@ def test_secrets_upload_stdin_json_success(monkeypatch):
 
     assert result.exit_code == 0, result.output
     assert calls == [
-        ("payments", "prod", "DB_HOST", "localhost"),
-        ("payments", "prod", "DB_PORT", "5432"),
+        ("payments", "prod", {"DB_HOST": "localhost", "DB_PORT": "5432"}),
     ]
 
 
@@ -168,7 +165,12 @@ def test_secrets_upload_continues_on_failures(monkeypatch, tmp_path: Path):
         if key == "B":
             raise ApiError("Missing scope: secrets:write", status_code=403)
 
+    def missing_bulk(_self, _project, _config, _secrets):
+        raise ApiError("Not Found", status_code=404)
+
     monkeypatch.setattr("ssm_cli.main.ApiClient.upsert_secret", fake_upsert)
+    # Servers without the bulk endpoint fall back to one request per key.
+    monkeypatch.setattr("ssm_cli.main.ApiClient.upsert_secrets", missing_bulk)
 
     runner = CliRunner()
     result = runner.invoke(
@@ -184,3 +186,35 @@ def test_secrets_upload_continues_on_failures(monkeypatch, tmp_path: Path):
     assert "failed=1" in result.output
     assert "B" in result.output
     assert "Missing scope: secrets:write" in result.output
+
+
+def test_secrets_upload_resends_valid_keys_after_rejection(
+    monkeypatch, tmp_path: Path
+):
+    calls: list[dict[str, str]] = []
+    env_file = tmp_path / "secrets.env"
+    env_file.write_text("A=1\nB=${MISSING}\nC=3\n", encoding="utf-8")
+    monkeypatch.setattr(
+        "ssm_cli.main.resolve_context", lambda **_: _resolution()
+    )
+
+    def fake_bulk(_self, _project, _config, secrets):
+        calls.append(dict(secrets))
+        if "B" in secrets:
+            raise ApiError(
+                "Invalid secret references",
+                status_code=400,
+                body={"errors": {"B": "Referenced secret not found"}},
+            )
+
+    monkeypatch.setattr("ssm_cli.main.ApiClient.upsert_secrets", fake_bulk)
+
+    runner = CliRunner()
+    result = runner.invoke(
+        cli, ["secrets", "upload", "--env-file", str(env_file)]
+    )
+
+    assert result.exit_code == 1
+    assert calls[-1] == {"A": "1", "C": "3"}
+    assert "succeeded=2" in result.output
+    assert "Referenced secret not found" in result.output
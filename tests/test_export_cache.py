@@ -0,0 +1,274 @@
+import json
+from types import SimpleNamespace
+
+from Engines.secrets_v2 import SecretsV2
+
+
+class FakeSecrets:
+    def __init__(self, docs):
+        self.docs = docs
+        self.finds = 0
+
+    def create_index(self, *_args, **_kwargs):
+        return None
+
+    @staticmethod
+    def _matches(doc, query):
+        for field, expected in query.items():
+            if isinstance(expected, dict) and "$in" in expected:
+                if doc.get(field) not in expected["$in"]:
+                    return False
+            elif doc.get(field) != expected:
+                return False
+        return True
+
+    def find(self, query, _projection=None):
+        self.finds += 1
+        return [dict(d) for d in self.docs if self._matches(d, query)]
+
+    def find_one(self, query, _projection=None):
+        for doc in self.docs:
+            if self._matches(doc, query):
+                return dict(doc)
+        return None
+
+    def update_one(self, query, update, upsert=False):
+        for doc in self.docs:
+            if self._matches(doc, query):
+                doc.update(update.get("$set", {}))
+                return None
+        if upsert:
+            self.docs.append({**query, **update.get("$set", {})})
+        return None
+
+    def update_many(self, query, update):
+        for doc in self.docs:
+            if self._matches(doc, query):
+                doc.update(update.get("$set", {}))
+
+    def delete_one(self, query):
+        for index, doc in enumerate(self.docs):
+            if self._matches(doc, query):
+                del self.docs[index]
+                return SimpleNamespace(deleted_count=1)
+        return SimpleNamespace(deleted_count=0)
+
+
+class FakeConfigs:
+    def __init__(self, cfgs):
+        self.cfgs = cfgs
+        self.revisions = {}
+
+    def get_by_id(self, cfg_id):
+        return self.cfgs.get(cfg_id)
+
+    def list_ids(self, _project_id):
+        return list(self.cfgs)
+
+    def secrets_revisions(self, config_ids):
+        return [self.revisions.get(config_id, 0) for config_id in config_ids]
+
+    def bump_secrets_revision(self, config_ids):
+        for config_id in config_ids:
+            self.revisions[config_id] = self.revisions.get(config_id, 0) + 1
+
+
+def _engine():
+    cfgs = {
+        "root": {"_id": "root", "project_id": "p", "parent_config_id": None},
+        "child": {
+            "_id": "child",
+            "project_id": "p",
+            "parent_config_id": "root",
+        },
+        "other": {"_id": "other", "project_id": "p", "parent_config_id": None},
+    }
+    docs = [
+        {
+            "config_id": "root",
+            "key": "A",
+            "value_enc": "1",
+            "icon_slug": "lucide:key-round",
+        },
+        {
+            "config_id": "child",
+            "key": "B",
+            "value_enc": "2",
+            "icon_slug": "lucide:key-round",
+        },
+    ]
+    return SecretsV2(FakeSecrets(docs), FakeConfigs(cfgs))
+
+
+def test_repeat_export_is_served_from_cache():
+    engine = _engine()
+    first, _, _, code = engine.export_config("child")
+    finds = engine._secrets.finds
+    second, _, _, _ = engine.export_config("child")
+
+    assert code == 200
+    assert second == first == {"A": "1", "B": "2"}
+    assert engine._secrets.finds == finds
+    assert engine.cache_stats()["hits"] == 1
+
+
+def test_returned_exports_do_not_alias_the_cache():
+    engine = _engine()
+    data, _, _, _ = engine.export_config("child")
+    data["A"] = "changed"
+
+    assert engine.export_config("child")[0]["A"] == "1"
+
+
+def test_write_to_ancestor_invalidates_descendant_export():
+    engine = _engine()
+    engine.export_config("child")
+    engine.export_config("other")
+
+    engine.put("root", "A", "10", "alice")
+    data, _, _, _ = engine.export_config("child")
+
+    assert data == {"A": "10", "B": "2"}
+
+
+def test_delete_invalidates_export():
+    engine = _engine()
+    engine.export_config("child")
+
+    engine.delete("child", "B")
+
+    assert engine.export_config("child")[0] == {"A": "1"}
+
+
+def test_write_elsewhere_keeps_unrelated_export_cached():
+    engine = _engine()
+    engine.export_config("root")
+    finds = engine._secrets.finds
+
+    engine.delete("child", "B")
+    engine.export_config("root")
+
+    assert engine._secrets.finds == finds
+
+
+def test_rendered_bodies_match_export():
+    engine = _engine()
+    body, keys, _, code = engine.export_rendered("child", fmt="json")
+    env, _, _, _ = engine.export_rendered("child", fmt="env")
+
+    assert code == 200
+    assert keys == 2
+    assert json.loads(body) == {"data": {"A": "1", "B": "2"}, "status": "OK"}
+    assert env == "A=1\nB=2"
+    assert engine.export_rendered("child", fmt="json")[0] is body
+
+
+def test_env_render_rejects_multiline_values():
+    engine = _engine()
+    engine.put("child", "B", "two\nlines", "alice")
+
+    body, _, _, code = engine.export_rendered("child", fmt="env")
+
+    assert body is None
+    assert code == 400
+
+
+def test_zero_ttl_disables_cache(monkeypatch):
+    monkeypatch.setenv("SECRETS_EXPORT_CACHE_TTL_SECONDS", "0")
+    engine = _engine()
+    engine.export_config("child")
+    finds = engine._secrets.finds
+    engine.export_config("child")
+
+    assert engine._secrets.finds > finds
+    assert engine.cache_stats()["enabled"] is False
+
+
+def test_etag_is_stable_until_the_chain_changes():
+    engine = _engine()
+    child = engine._configs.cfgs["child"]
+    etag = engine.export_etag(child, variant=("export", "json"))
+    finds = engine._secrets.finds
+
+    assert engine.export_etag(child, variant=("export", "json")) == etag
+    assert engine.export_etag(child, variant=("export", "env")) != etag
+    assert engine._secrets.finds == finds
+
+    engine.put("root", "A", "10", "alice")
+    assert engine.export_etag(child, variant=("export", "json")) != etag
+
+
+def test_etag_follows_writes_from_other_processes():
+    engine = _engine()
+    child = engine._configs.cfgs["child"]
+    etag = engine.export_etag(child)
+
+    engine._configs.bump_secrets_revision(["root"])
+
+    assert engine.export_etag(child) != etag
+    assert engine.export_etag(child, include_parent=False) == (
+        engine.export_etag(child, include_parent=False)
+    )
+
+
+def test_put_many_writes_in_one_batch_and_syncs_icons():
+    engine = _engine()
+    engine._secrets.docs.append(
+        {
+            "config_id": "other",
+            "key": "C",
+            "value_enc": "x",
+            "icon_slug": "lucide:lock",
+            "icon_source": SecretsV2.ICON_SOURCE_MANUAL,
+        }
+    )
+    engine.export_config("child")
+
+    result, code = engine.put_many("child", {"B": "20", "C": "3"}, "alice")
+
+    assert code == 200
+    assert result["written"] == 2
+    assert engine.export_config("child")[0] == {"A": "1", "B": "20", "C": "3"}
+    written = engine._secrets.find_one({"config_id": "child", "key": "C"})
+    assert written["icon_slug"] == "lucide:lock"
+    assert written["updated_by"] == "alice"
+
+
+def test_put_many_rejects_whole_batch_on_invalid_item():
+    engine = _engine()
+
+    result, code = engine.put_many(
+        "child", {"GOOD": "1", "bad key": "2", "NUM": 3}, "alice"
+    )
+
+    assert code == 400
+    assert set(result["errors"]) == {"bad key", "NUM"}
+    assert engine._secrets.find_one({"key": "GOOD"}) is None
+
+
+def test_export_at_state_sees_writes_from_other_processes():
+    engine = _engine()
+    child = engine._configs.cfgs["child"]
+    engine.export_config("child")
+    # Another process writes and bumps the stored revision only.
+    engine._secrets.docs[0]["value_enc"] = "10"
+    engine._configs.bump_secrets_revision(["root"])
+
+    assert engine.export_config("child")[0]["A"] == "1"
+    state = engine.export_state(child)
+    data, _, _, _ = engine.export_config("child", state=state)
+
+    assert data["A"] == "10"
+    assert engine.state_etag([state]) == engine.export_etag(child)
+
+
+def test_reference_dependencies_are_recorded_per_export():
+    engine = _engine()
+    dependencies = (("p", "other", "other"), ("p", "gone", None))
+
+    assert engine.reference_dependencies("child") is None
+    engine.record_reference_dependencies("child", True, dependencies)
+
+    assert engine.reference_dependencies("child") == dependencies
+    assert engine.reference_dependencies("child", False) is None
+    assert engine.state_etag([engine.export_state({"_id": "x"}), None]) is None
@@ -1,27 +1,72 @@
+from bson import ObjectId
+
+from Engines.configs import Configs
 from Engines.secrets_v2 import SecretsV2
 
 
 class FakeSecrets:
     def __init__(self, docs):
         self.docs = docs
+        self.queries = []
 
     def create_index(self, *_args, **_kwargs):
         return None
 
     def find(self, query):
-        return [d for d in self.docs if d["config_id"] == query["config_id"]]
+        self.queries.append(query)
+        config_ids = query["config_id"]["$in"]
+        return [d for d in self.docs if d["config_id"] in config_ids]
 
-    def update_one(self, query, update, upsert=False):
-        _ = upsert
+    def update_many(self, query, update):
         for doc in self.docs:
-            if doc.get("config_id") == query.get("config_id") and doc.get(
-                "key"
-            ) == query.get("key"):
-                for key, value in update.get("$set", {}).items():
-                    doc[key] = value
-                return None
+            if (
+                doc.get("config_id") in query["config_id"]["$in"]
+                and doc.get("key") == query["key"]
+            ):
+                doc.update(update["$set"])
+
+
+class FakeCursor(list):
+    def limit(self, amount):
+        return FakeCursor(self[:amount])
+
+
+class FakeConfigCollection:
+    def __init__(self):
+        self.docs = {}
+        self.updates = 0
+
+    def create_index(self, *_args, **_kwargs):
         return None
 
+    def insert_one(self, doc):
+        doc.setdefault("_id", ObjectId())
+        self.docs[doc["_id"]] = doc
+
+    def find(self, query, _projection=None):
+        if "ancestor_ids" in query:
+            return FakeCursor(
+                doc for doc in self.docs.values() if "ancestor_ids" not in doc
+            )
+        return FakeCursor(
+            doc
+            for doc in self.docs.values()
+            if doc.get("project_id") == query["project_id"]
+        )
+
+    def find_one(self, query, _projection=None):
+        return self.docs.get(query["_id"])
+
+    def update_one(self, query, update):
+        self.updates += 1
+        self.docs[query["_id"]].update(update["$set"])
+
+    def update_many(self, query, update):
+        for config_id in query["_id"]["$in"]:
+            doc = self.docs[config_id]
+            for key, amount in update["$inc"].items():
+                doc[key] = doc.get(key, 0) + amount
+
 
 class FakeConfigs:
     def __init__(self, cfgs):
@@ -50,3 +95,64 @@ def test_export_merge_child_overrides_parent():
     assert msg == "OK"
     assert data == {"A": "1", "B": "20", "C": "3"}
     assert meta["B"]["updatedAt"] is None
+
+
+def test_create_stores_ancestor_path_root_first():
+    configs = Configs(FakeConfigCollection())
+    root, _ = configs.create("p1", "root", "Root")
+    mid, _ = configs.create("p1", "mid", "Mid", root["_id"])
+    leaf, _ = configs.create("p1", "leaf", "Leaf", mid["_id"])
+
+    assert root["ancestor_ids"] == []
+    assert leaf["ancestor_ids"] == [root["_id"], mid["_id"]]
+
+
+def test_legacy_config_path_is_walked_without_writing():
+    collection = FakeConfigCollection()
+    root_id, child_id = ObjectId(), ObjectId()
+    collection.insert_one({"_id": root_id, "parent_config_id": None})
+    collection.insert_one({"_id": child_id, "parent_config_id": root_id})
+    configs = Configs(collection)
+
+    assert configs.ancestor_ids(collection.docs[child_id]) == [root_id]
+    assert "ancestor_ids" not in collection.docs[child_id]
+    assert collection.updates == 0
+
+
+def test_backfill_stores_legacy_paths_once():
+    collection = FakeConfigCollection()
+    root_id, child_id, orphan_id = ObjectId(), ObjectId(), ObjectId()
+    collection.insert_one({"_id": root_id, "parent_config_id": None})
+    collection.insert_one({"_id": child_id, "parent_config_id": root_id})
+    collection.insert_one({"_id": orphan_id, "parent_config_id": ObjectId()})
+    configs = Configs(collection)
+
+    assert configs.backfill_ancestor_ids() == 3
+    assert configs.backfill_ancestor_ids() == 0
+    assert collection.docs[root_id]["ancestor_ids"] == []
+    assert collection.docs[child_id]["ancestor_ids"] == [root_id]
+    assert collection.docs[orphan_id]["ancestor_ids"] is None
+    assert configs.ancestor_ids(collection.docs[orphan_id]) is None
+
+
+def test_export_loads_whole_chain_with_one_secrets_query():
+    configs = Configs(FakeConfigCollection())
+    root, _ = configs.create("p1", "root", "Root")
+    mid, _ = configs.create("p1", "mid", "Mid", root["_id"])
+    leaf, _ = configs.create("p1", "leaf", "Leaf", mid["_id"])
+    docs = [
+        {"config_id": leaf["_id"], "key": "A", "value_enc": "leaf"},
+        {"config_id": root["_id"], "key": "A", "value_enc": "root"},
+        {"config_id": mid["_id"], "key": "B", "value_enc": "mid"},
+        {"config_id": root["_id"], "key": "B", "value_enc": "root"},
+    ]
+    secrets = FakeSecrets(docs)
+    engine = SecretsV2(secrets, configs)
+
+    data, _, _, code = engine.export_config(leaf["_id"])
+
+    assert code == 200
+    assert data == {"A": "leaf", "B": "mid"}
+    assert secrets.queries == [
+        {"config_id": {"$in": [root["_id"], mid["_id"], leaf["_id"]]}}
+    ]
@@ -1,5 +1,6 @@
 from bson import ObjectId
 
+from Engines.caching import GenerationCounter
 from Engines.memberships import Memberships
 
 
@@ -35,3 +36,29 @@ def test_list_project_memberships_normalizes_group_ids_for_str_and_objectid():
     values = set(group_clause["subject_id"]["$in"])
     assert group_id in values
     assert str(group_id) in values
+
+
+class WritableCollection(FakeCollection):
+    def update_one(self, *_args, **_kwargs):
+        return None
+
+    def find_one(self, query):
+        return dict(query)
+
+    def delete_many(self, query):
+        self.last_query = query
+
+
+def test_membership_writes_bump_authorization_generation():
+    generation = GenerationCounter()
+    engine = Memberships(
+        WritableCollection(),
+        WritableCollection(),
+        authz_generation=generation,
+    )
+
+    engine.upsert_workspace_membership("w1", "alice", "viewer")
+    engine.upsert_project_membership("w1", "p1", "user", "alice", "admin")
+    engine.remove_all_for_subject("w1", "user", "alice")
+
+    assert generation.value == 3
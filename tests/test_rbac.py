@@ -1,5 +1,7 @@
 from datetime import datetime, timezone
+from types import SimpleNamespace
 
+from Engines.caching import GenerationCounter
 from Engines.rbac import RBAC
 
 
@@ -236,3 +238,204 @@ def test_viewer_gets_workspace_members_read_scope():
         and scope.get("project_id") is None
         for scope in actor["scopes"]
     )
+
+
+def test_resolved_actor_is_cached_until_generation_changes():
+    generation = GenerationCounter()
+    workspaces = WorkspacesStub()
+    users = UsersStub()
+    memberships = MembershipsStub()
+    groups = GroupsStub()
+    projects = ProjectsStub([{"_id": "p1"}])
+    engine = RBAC(
+        workspaces,
+        users,
+        memberships,
+        groups,
+        projects,
+        onboarding_state_col=OnboardingStateStub(),
+        authz_generation=generation,
+    )
+    memberships.upsert_workspace_membership("w1", "owner-user", "owner")
+    memberships.upsert_workspace_membership("w1", "alice", "viewer")
+    users.ensure("alice")
+
+    calls = []
+    original = groups.list_user_group_ids
+
+    def counting_list_user_group_ids(workspace_id, username):
+        calls.append(username)
+        return original(workspace_id, username)
+
+    groups.list_user_group_ids = counting_list_user_group_ids
+
+    first = engine.resolve_personal_actor("alice")
+    second = engine.resolve_personal_actor("alice")
+    assert first == second
+    assert calls == ["alice"]
+
+    memberships.upsert_workspace_membership("w1", "alice", "admin")
+    generation.bump()
+
+    third = engine.resolve_personal_actor("alice")
+    assert third["workspace_role"] == "admin"
+    assert engine.cache_stats()["hits"] == 1
+
+
+class AggregateCollectionStub:
+    def __init__(self, docs):
+        self.docs = docs
+        self.pipelines = []
+
+    def aggregate(self, pipeline):
+        self.pipelines.append(pipeline)
+        return iter([dict(doc) for doc in self.docs])
+
+
+class AuthDbStub:
+    name = "secrets_manager_auth"
+
+    def __init__(self, docs):
+        self.users = AggregateCollectionStub(docs)
+
+    def __getitem__(self, name):
+        assert name == "users"
+        return self.users
+
+
+def _build_rbac_with_snapshot(
+    snapshot_docs, initialized_by=None, projects_db=None
+):
+    auth_db = AuthDbStub(snapshot_docs)
+    projects_col = SimpleNamespace(
+        name="projects",
+        database=projects_db or SimpleNamespace(name="secrets_manager_data"),
+    )
+    memberships = MembershipsStub()
+    groups = GroupsStub()
+    engine = RBAC(
+        WorkspacesStub(),
+        UsersStub(),
+        memberships,
+        groups,
+        ProjectsStub([{"_id": "p1"}, {"_id": "p2"}]),
+        onboarding_state_col=OnboardingStateStub(initialized_by),
+        auth_db=auth_db,
+        projects_col=projects_col,
+    )
+    return engine, auth_db, memberships, groups
+
+
+def _snapshot_doc(workspace_role, onboarding=None, project_memberships=None):
+    return {
+        "username": "alice",
+        "disabled_at": None,
+        "workspace": {"_id": "w1", "slug": "default"},
+        "membership": [
+            {
+                "workspace_id": "w1",
+                "username": "alice",
+                "workspace_role": workspace_role,
+            }
+        ],
+        "onboarding": onboarding or [],
+        "project_memberships": project_memberships or [],
+    }
+
+
+def test_actor_resolves_from_single_aggregation():
+    snapshot = _snapshot_doc(
+        "collaborator",
+        project_memberships=[
+            {"project_id": "p1", "project_role": "viewer"},
+            {"project_id": "p1", "project_role": "admin"},
+            {"project_id": "p2", "project_role": "none"},
+        ],
+    )
+    engine, auth_db, memberships, groups = _build_rbac_with_snapshot(
+        [snapshot]
+    )
+
+    def unexpected(*args, **kwargs):
+        raise AssertionError("engine fallback should not run")
+
+    groups.list_user_group_ids = unexpected
+    memberships.get_workspace_membership = unexpected
+
+    actor = engine.resolve_personal_actor("alice")
+
+    assert len(auth_db.users.pipelines) == 1
+    assert actor["workspace_role"] == "collaborator"
+    assert actor["visible_project_ids"] == ["p1"]
+    assert actor["project_roles"] == {"p1": "admin"}
+
+
+def test_actor_snapshot_falls_back_when_membership_needs_writes():
+    engine, _, memberships, _ = _build_rbac_with_snapshot(
+        [_snapshot_doc("viewer", onboarding=[{"initialized_by": "alice"}])],
+        initialized_by="alice",
+    )
+    memberships.upsert_workspace_membership("w1", "alice", "viewer")
+
+    actor = engine.resolve_personal_actor("alice")
+
+    assert actor["workspace_role"] == "owner"
+    assert (
+        memberships.get_workspace_membership("w1", "alice")["workspace_role"]
+        == "owner"
+    )
+
+    engine, _, memberships, _ = _build_rbac_with_snapshot([])
+    actor = engine.resolve_personal_actor("alice")
+    assert actor["workspace_role"] == "owner"
+    assert memberships.get_workspace_membership("w1", "alice") is not None
+
+
+def test_admin_projects_are_joined_when_they_share_the_auth_db():
+    snapshot = {
+        **_snapshot_doc("admin"),
+        "projects": [{"_id": "p1"}, {"_id": "p3"}],
+    }
+    engine, auth_db, _, _ = _build_rbac_with_snapshot(
+        [snapshot], projects_db=SimpleNamespace(name=AuthDbStub.name)
+    )
+
+    def unexpected(*args, **kwargs):
+        raise AssertionError("projects should come from the snapshot")
+
+    engine._projects.list_docs = unexpected
+
+    actor = engine.resolve_personal_actor("alice")
+
+    lookups = [
+        stage["$lookup"]["from"]
+        for stage in auth_db.users.pipelines[0]
+        if "$lookup" in stage
+    ]
+    assert "projects" in lookups
+    assert actor["visible_project_ids"] == ["p1", "p3"]
+    assert actor["project_roles"] == {"p1": "admin", "p3": "admin"}
+
+
+def test_admin_project_list_is_shared_across_actors():
+    engine, auth_db, _, _ = _build_rbac_with_snapshot([_snapshot_doc("owner")])
+    calls = []
+    original = engine._projects.list_docs
+
+    def counting_list_docs(workspace_id=None):
+        calls.append(workspace_id)
+        return original(workspace_id)
+
+    engine._projects.list_docs = counting_list_docs
+
+    first = engine.resolve_personal_actor("alice")
+    auth_db.users.docs = [{**_snapshot_doc("admin"), "username": "bob"}]
+    second = engine.resolve_personal_actor("bob")
+
+    assert not any(
+        "$lookup" in stage and stage["$lookup"]["from"] == "projects"
+        for stage in auth_db.users.pipelines[0]
+    )
+    assert first["visible_project_ids"] == ["p1", "p2"]
+    assert second["visible_project_ids"] == ["p1", "p2"]
+    assert calls == ["w1"]
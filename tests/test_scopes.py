@@ -1,4 +1,4 @@
-from Access.policy import authorize
+from Access.policy import authorize, authorize_many
 
 
 def test_scope_matching_config():
@@ -50,3 +50,31 @@ def test_personal_token_scopes_are_intersection_of_dynamic_and_token_scopes():
         {"project_id": "p1", "actions": ["secrets:write"]}
     ]
     assert authorize(actor, "secrets:write", project_id="p1")
+
+
+def test_authorize_many_matches_authorize_for_each_target():
+    actor = {
+        "type": "token",
+        "scopes": [
+            {"project_id": "p1", "actions": ["secrets:export"]},
+            {
+                "project_id": "p2",
+                "config_id": "c2",
+                "actions": ["secrets:export"],
+            },
+        ],
+        "token_scopes": [{"actions": ["secrets:export"]}],
+    }
+    targets = [("p1", "c1"), ("p2", "c1"), ("p2", "c2"), ("p3", None)]
+
+    assert authorize_many(actor, "secrets:export", targets) == [
+        True,
+        False,
+        True,
+        False,
+    ]
+    assert authorize_many(actor, "secrets:export", targets) == [
+        authorize(actor, "secrets:export", project_id=p, config_id=c)
+        for p, c in targets
+    ]
+    assert authorize_many(None, "secrets:export", targets) == [False] * 4
@@ -184,3 +184,25 @@ def test_validate_value_references_detects_nested_broken_reference():
         key="DATABASE_URL", value=root_data["DATABASE_URL"]
     )
     assert any("Unresolved reference" in item for item in errors)
+
+
+def test_dependencies_list_every_referenced_context():
+    fixture = _Fixture()
+    fixture.exports["c-dev"]["GHOST"] = "${missing.KEY}"
+    resolver = SecretReferenceResolver(
+        project_slug="app",
+        config_slug="dev",
+        get_project_by_slug=fixture.get_project,
+        get_config_by_slug=fixture.get_config,
+        export_config=fixture.export_config,
+        require_scope=fixture.require_scope,
+        max_depth=8,
+    )
+
+    resolver.resolve_map(dict(fixture.exports["c-dev"]))
+
+    assert resolver.dependencies() == (
+        ("app", "base", "c-base"),
+        ("app", "missing", None),
+        ("shared", "prod", "c-shared-prod"),
+    )
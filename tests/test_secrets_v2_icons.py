@@ -15,6 +15,10 @@ class FakeSecrets:
                 if doc.get(key) not in value["$in"]:
                     return False
                 continue
+            if isinstance(value, dict) and "$ne" in value:
+                if doc.get(key) == value["$ne"]:
+                    return False
+                continue
             if doc.get(key) != value:
                 return False
         return True
@@ -205,11 +209,14 @@ def test_export_metadata_backfills_missing_icon_slug():
         "cfg", include_parent=True, include_metadata=True
     )
     assert code == 200
-    assert docs[0]["icon_slug"] == "simple-icons:sqlalchemy"
+    assert "icon_slug" not in docs[0]
     assert (
         meta["SQLALCHEMY_DATABASE_URI"]["iconSlug"]
         == "simple-icons:sqlalchemy"
     )
+
+    assert engine.repair_icons() == 1
+    assert docs[0]["icon_slug"] == "simple-icons:sqlalchemy"
     assert docs[0]["icon_source"] == SecretsV2.ICON_SOURCE_AUTO
 
 
@@ -322,3 +329,20 @@ def test_recompute_project_icon_slugs_updates_auto_and_skips_manual():
     assert docs[3]["icon_source"] == SecretsV2.ICON_SOURCE_MANUAL
     assert docs[4]["icon_slug"] == database_slug
     assert docs[4]["icon_source"] == SecretsV2.ICON_SOURCE_AUTO
+
+
+def test_icon_repair_keeps_manual_icons_set_after_export():
+    docs = [
+        {"_id": "1", "config_id": "cfg-a", "key": "API_KEY", "value_enc": "v"},
+        {"_id": "2", "config_id": "cfg-b", "key": "API_KEY", "value_enc": "v"},
+    ]
+    engine = _engine_with_project_docs(docs)
+    engine.export_config("cfg-a")
+    docs[1]["icon_slug"] = "lucide:lock"
+    docs[1]["icon_source"] = SecretsV2.ICON_SOURCE_MANUAL
+
+    engine.repair_icons()
+
+    assert docs[0]["icon_slug"] == resolve_icon_slug("API_KEY", None)
+    assert docs[1]["icon_slug"] == "lucide:lock"
+    assert engine.repair_icons() == 0
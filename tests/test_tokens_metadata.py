@@ -3,6 +3,7 @@ from datetime import datetime, timedelta, timezone
 from bson import ObjectId
 
 from Access.scopes import global_scopes
+from Access.session_tokens import RevocationSet
 from Access.tokens import Tokens
 
 
@@ -15,6 +16,10 @@ class FakeCursor:
         self.docs.sort(key=lambda item: item.get(key), reverse=reverse)
         return self
 
+    def limit(self, count):
+        self.docs = self.docs[:count]
+        return self
+
     def __iter__(self):
         return iter(self.docs)
 
@@ -38,10 +43,17 @@ class FakeCollection:
     def _match_value(self, doc, key, value):
         current = doc.get(key)
         if isinstance(value, dict):
-            if "$gt" in value:
-                return self._is_gt(current, value["$gt"])
-            if "$exists" in value:
-                return (key in doc) == bool(value["$exists"])
+            checks = {
+                "$gt": lambda target: self._is_gt(current, target),
+                "$gte": lambda target: (
+                    current == target or self._is_gt(current, target)
+                ),
+                "$lt": lambda target: current is not None and current < target,
+                "$ne": lambda target: current != target,
+                "$in": lambda target: current in target,
+                "$exists": lambda target: (key in doc) == bool(target),
+            }
+            return all(checks[op](target) for op, target in value.items())
         return current == value
 
     def _match(self, doc, query):
@@ -54,7 +66,7 @@ class FakeCollection:
                 return False
         return True
 
-    def find(self, query):
+    def find(self, query, _projection=None):
         return FakeCursor(
             [doc for doc in self.docs if self._match(doc, query)]
         )
@@ -76,8 +88,18 @@ class FakeCollection:
                 doc.update(update["$set"])
 
     def insert_one(self, doc):
+        doc.setdefault("_id", ObjectId())
         self.docs.append(doc)
 
+    def insert_many(self, docs, **_kwargs):
+        for doc in docs:
+            self.insert_one(doc)
+
+    def delete_many(self, query):
+        self.docs[:] = [
+            doc for doc in self.docs if not self._match(doc, query)
+        ]
+
 
 def test_list_tokens_serializes_metadata():
     token_id = ObjectId()
@@ -384,3 +406,321 @@ def test_authenticate_personal_token_fails_for_disabled_user():
 
     assert actor is None
     assert err == "disabled"
+
+
+class CountingCollection(FakeCollection):
+    def __init__(self, docs):
+        super().__init__(docs)
+        self.find_one_calls = 0
+
+    def find_one(self, query):
+        if "token_hash" in query:
+            self.find_one_calls += 1
+        return super().find_one(query)
+
+
+def _service_token_doc(token_hash):
+    return {
+        "_id": ObjectId(),
+        "type": "service",
+        "subject_service_name": "ci",
+        "scopes": [{"actions": ["secrets:read"]}],
+        "token_hash": token_hash,
+        "expires_at": datetime.utcnow() + timedelta(hours=1),
+        "revoked_at": None,
+        "created_at": datetime.now(timezone.utc),
+        "created_by": "system",
+    }
+
+
+def test_authenticate_caches_token_lookup():
+    collection = CountingCollection([])
+    tokens = Tokens(collection)
+    collection.docs.append(_service_token_doc(tokens._hash_token("svc")))
+
+    for _ in range(3):
+        actor, err = tokens.authenticate("svc")
+        assert err is None
+        assert actor["subject_service_name"] == "ci"
+
+    assert collection.find_one_calls == 1
+    stats = tokens.cache_stats()
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+
+
+def test_revoke_invalidates_cached_token():
+    collection = CountingCollection([])
+    tokens = Tokens(collection)
+    doc = _service_token_doc(tokens._hash_token("svc"))
+    collection.docs.append(doc)
+
+    assert tokens.authenticate("svc")[1] is None
+    tokens.revoke(token_id=str(doc["_id"]))
+
+    actor, err = tokens.authenticate("svc")
+    assert actor is None
+    assert err == "revoked"
+
+
+def test_session_rotation_invalidates_cached_session_token():
+    collection = FakeCollection([])
+    tokens = Tokens(collection)
+    first = tokens.generate(username="alice", max_ttl=300)
+    assert tokens.authenticate(first["token"])[1] is None
+
+    tokens.generate(username="alice", max_ttl=300)
+
+    actor, err = tokens.authenticate(first["token"])
+    assert actor is None
+    assert err == "revoked"
+
+
+class BulkCollection(FakeCollection):
+    def __init__(self, docs):
+        super().__init__(docs)
+        self.bulk_calls = []
+
+    def bulk_write(self, requests, ordered=True):
+        _ = ordered
+        self.bulk_calls.append(requests)
+
+
+def test_last_used_at_is_buffered_and_flushed_in_bulk(monkeypatch):
+    monkeypatch.setenv("TOKEN_LAST_USED_FLUSH_SECONDS", "3600")
+    collection = BulkCollection([])
+    tokens = Tokens(collection)
+    collection.docs.append(_service_token_doc(tokens._hash_token("svc")))
+
+    for _ in range(5):
+        assert tokens.authenticate("svc")[1] is None
+
+    assert collection.bulk_calls == []
+    assert tokens.stats()["lastUsed"]["pending"] == 1
+    assert tokens.flush_last_used() == 1
+    assert len(collection.bulk_calls) == 1
+    assert len(collection.bulk_calls[0]) == 1
+
+
+def test_list_tokens_flushes_pending_last_used_at(monkeypatch):
+    monkeypatch.setenv("TOKEN_LAST_USED_FLUSH_SECONDS", "3600")
+    collection = FakeCollection([])
+    tokens = Tokens(collection)
+    collection.docs.append(_service_token_doc(tokens._hash_token("svc")))
+
+    assert tokens.authenticate("svc")[1] is None
+    assert collection.docs[0].get("last_used_at") is None
+
+    listed = tokens.list_tokens()
+    assert listed[0]["last_used_at"] is not None
+
+
+def _retention_docs(now):
+    old = now - timedelta(days=45)
+    recent = now - timedelta(days=2)
+    return [
+        {"_id": "live", "token_hash": "h1", "revoked_at": None},
+        {"_id": "old-revoked", "token_hash": "h2", "revoked_at": old},
+        {"_id": "old-expired", "token_hash": "h3", "expires_at": old},
+        {"_id": "recent-revoked", "token_hash": "h4", "revoked_at": recent},
+    ]
+
+
+def test_retention_purges_tokens_past_grace_period(monkeypatch):
+    monkeypatch.setenv("TOKEN_RETENTION_DAYS", "30")
+    now = datetime.utcnow()
+    collection = FakeCollection(_retention_docs(now))
+    tokens = Tokens(collection)
+
+    assert tokens.purge_expired_tokens(now=now) == 2
+    assert [doc["_id"] for doc in collection.docs] == [
+        "live",
+        "recent-revoked",
+    ]
+    retention = tokens.stats()["retention"]
+    assert retention["reclaimed"] == 2
+    assert retention["sweeps"] == 1
+
+
+def test_retention_archive_mode_keeps_metadata_without_hash(monkeypatch):
+    monkeypatch.setenv("TOKEN_RETENTION_MODE", "archive")
+    now = datetime.utcnow()
+    collection = FakeCollection(_retention_docs(now))
+    archive = FakeCollection([])
+    tokens = Tokens(collection, archive_col=archive)
+
+    assert tokens.purge_expired_tokens(now=now) == 2
+    assert sorted(doc["_id"] for doc in archive.docs) == [
+        "old-expired",
+        "old-revoked",
+    ]
+    assert all("token_hash" not in doc for doc in archive.docs)
+    assert all("archived_at" in doc for doc in archive.docs)
+    assert tokens.stats()["retention"]["archived"] == 2
+
+
+def test_retention_off_keeps_everything(monkeypatch):
+    monkeypatch.setenv("TOKEN_RETENTION_MODE", "off")
+    now = datetime.utcnow()
+    collection = FakeCollection(_retention_docs(now))
+    tokens = Tokens(collection)
+
+    assert tokens.purge_expired_tokens(now=now) == 0
+    assert len(collection.docs) == 4
+
+
+def test_revoke_many_revokes_matching_tokens_and_evicts_cache():
+    collection = CountingCollection([])
+    tokens = Tokens(collection)
+    alice = tokens.create_token(
+        token_type="personal",
+        created_by="alice",
+        subject_user="alice",
+        scopes=[{"actions": ["secrets:read"]}],
+        expires_at=datetime.utcnow() + timedelta(hours=1),
+    )["token"]
+    tokens.create_token(
+        token_type="service",
+        created_by="alice",
+        subject_service_name="ci",
+        scopes=[{"actions": ["secrets:read"]}],
+    )
+    tokens.create_token(
+        token_type="personal",
+        created_by="bob",
+        subject_user="bob",
+        scopes=[{"actions": ["secrets:read"]}],
+    )
+    assert tokens.authenticate(alice)[1] is None
+
+    result, code = tokens.revoke_many(subject_user="alice")
+    assert code == 200
+    assert result["status"] == "OK"
+    assert tokens.authenticate(alice) == (None, "revoked")
+
+    tokens.revoke_many(created_by="alice")
+    revoked = {
+        doc.get("subject_user") or doc.get("subject_service_name")
+        for doc in collection.docs
+        if doc["revoked_at"] is not None
+    }
+    assert revoked == {"alice", "ci"}
+
+    _, code = tokens.revoke_many()
+    assert code == 400
+
+
+def test_signed_session_tokens_authenticate_without_reads(monkeypatch):
+    monkeypatch.setenv("SESSION_TOKEN_FORMAT", "signed")
+    monkeypatch.setenv("SESSION_TOKEN_SIGNING_KEY", "test-key")
+    monkeypatch.setenv("SESSION_REVOCATION_REFRESH_SECONDS", "0")
+    collection = CountingCollection([])
+    tokens = Tokens(collection)
+
+    issued = tokens.generate("alice")
+    token = issued["token"]
+    assert token.startswith("ssm1.")
+    doc = collection.docs[0]
+    assert doc["token_hash"] == tokens._hash_token(token)
+
+    actor, err = tokens.authenticate(token)
+    assert err is None
+    assert actor["token_id"] == str(doc["_id"])
+    assert actor["subject_user"] == "alice"
+    actor, err = tokens.authenticate(token)
+    assert err is None
+    assert collection.find_one_calls == 0
+
+    tampered = token[:-2] + ("AA" if not token.endswith("AA") else "BB")
+    assert tokens.authenticate(tampered) == (None, "invalid")
+
+    tokens.revoke(token_id=str(doc["_id"]))
+    assert tokens.authenticate(token) == (None, "revoked")
+
+
+def test_signed_session_rotation_revokes_previous_session(monkeypatch):
+    monkeypatch.setenv("SESSION_TOKEN_FORMAT", "signed")
+    monkeypatch.setenv("SESSION_TOKEN_SIGNING_KEY", "test-key")
+    monkeypatch.setenv("SESSION_REVOCATION_REFRESH_SECONDS", "0")
+    tokens = Tokens(CountingCollection([]))
+
+    first = tokens.generate("alice")["token"]
+    assert tokens.authenticate(first)[1] is None
+    second = tokens.generate("alice")["token"]
+
+    assert tokens.authenticate(first) == (None, "revoked")
+    assert tokens.authenticate(second)[1] is None
+
+
+def test_retention_sweep_does_not_run_at_exit(monkeypatch):
+    monkeypatch.setenv("TOKEN_RETENTION_DAYS", "30")
+    collection = FakeCollection(_retention_docs(datetime.utcnow()))
+    tokens = Tokens(collection)
+    tokens.start_retention_sweeper()
+
+    tokens._retention._worker.shutdown()
+
+    assert len(collection.docs) == 4
+    assert tokens.stats()["retention"]["sweeps"] == 0
+
+
+def _revoked_session(token_id, revoked_at):
+    return {
+        "_id": token_id,
+        "purpose": "session",
+        "revoked_at": revoked_at,
+        "expires_at": revoked_at + timedelta(days=1),
+    }
+
+
+def test_revocation_refresh_picks_up_late_commits():
+    now = datetime.utcnow()
+    collection = FakeCollection([])
+    revocations = RevocationSet(collection, refresh_interval_seconds=0)
+
+    assert "early" not in revocations
+    # Committed after the first load but stamped before it.
+    collection.docs.append(
+        _revoked_session("early", now - timedelta(seconds=5))
+    )
+    collection.docs.append(_revoked_session("newest", now))
+    revocations.refresh()
+    collection.docs.append(
+        _revoked_session("late", now - timedelta(seconds=30))
+    )
+    revocations.refresh()
+
+    assert "early" in revocations
+    assert "late" in revocations
+    assert revocations.stats()["size"] == 3
+
+
+def test_revocation_full_reload_catches_older_commits():
+    now = datetime.utcnow()
+    collection = FakeCollection([_revoked_session("newest", now)])
+    revocations = RevocationSet(
+        collection, refresh_interval_seconds=0, full_reload_seconds=0
+    )
+    revocations.refresh()
+
+    collection.docs.append(_revoked_session("old", now - timedelta(hours=2)))
+    revocations.refresh()
+
+    assert "old" in revocations
+    assert revocations.stats()["fullReloads"] == 2
+
+
+def test_every_bulk_revoke_field_has_a_revoked_at_index():
+    class IndexRecorder(FakeCollection):
+        def __init__(self):
+            super().__init__([])
+            self.indexes = []
+
+        def create_index(self, keys, **_kwargs):
+            self.indexes.append(keys)
+
+    collection = IndexRecorder()
+    Tokens(collection)
+
+    for field in Tokens.BULK_REVOKE_FIELDS:
+        assert [(field, 1), ("revoked_at", 1)] in collection.indexes
@@ -0,0 +1,69 @@
+from werkzeug.security import generate_password_hash
+
+from Access.userpass import User_Pass
+
+
+class UserpassCollection:
+    def __init__(self):
+        self.docs = {}
+        self.find_calls = 0
+
+    def find_one(self, query):
+        self.find_calls += 1
+        doc = self.docs.get(query.get("username"))
+        return dict(doc) if doc else None
+
+    def insert_one(self, doc):
+        self.docs[doc["username"]] = dict(doc)
+
+    def delete_one(self, query):
+        self.docs.pop(query.get("username"), None)
+
+
+def _engine(monkeypatch, workers="0"):
+    monkeypatch.setenv("USERPASS_HASH_WORKERS", workers)
+    col = UserpassCollection()
+    engine = User_Pass(col)
+    status, code = engine.register("alice", "Secr3t!pass")
+    assert code == 200, status
+    return engine, col
+
+
+def test_verified_credentials_are_cached(monkeypatch):
+    engine, col = _engine(monkeypatch)
+
+    assert engine.is_authorized("alice", "Secr3t!pass")
+    assert engine.is_authorized("alice", "Secr3t!pass")
+    assert col.find_calls == 2  # register lookup + first verification
+
+    assert not engine.is_authorized("alice", "wrong")
+    assert col.find_calls == 3
+    stats = engine.cache_stats()
+    assert stats["size"] == 1
+    assert stats["hits"] == 1
+
+
+def test_cache_keys_do_not_contain_plaintext(monkeypatch):
+    engine, _ = _engine(monkeypatch)
+    engine.is_authorized("alice", "Secr3t!pass")
+
+    keys = list(engine._verified._entries)
+    assert len(keys) == 1
+    assert b"Secr3t!pass" not in keys[0]
+
+
+def test_remove_and_reregister_invalidate_cached_credentials(monkeypatch):
+    engine, col = _engine(monkeypatch, workers="2")
+    assert engine.is_authorized("alice", "Secr3t!pass")
+
+    engine.remove("alice")
+    assert not engine.is_authorized("alice", "Secr3t!pass")
+
+    col.docs["alice"] = {
+        "username": "alice",
+        "password": generate_password_hash(
+            "N3w!password", method="pbkdf2:sha256"
+        ),
+    }
+    assert engine.is_authorized("alice", "N3w!password")
+    assert not engine.is_authorized("alice", "Secr3t!pass")